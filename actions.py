@@ -0,0 +1,187 @@
+"""
+The legal actions of the current player
+
+Every action has a number in a fixed action space, so the legal actions of
+a turn can be given as one bitmask where bit i is set when action i is
+legal. The mask is put together with a few bit operations on the bitmasks
+the game keeps up to date as cards, locations and stations change (see
+game.Player.hand, game.Player.loc and game.GameState.stations), so nothing
+is tried and no ValueError is raised to find out what is legal.
+
+The action space, for the 48 cities and up to 4 players:
+  DRIVE + city           drive to a city
+  DIRECT + city          direct flight to a city
+  CHARTER + city         charter flight to a city
+  SHUTTLE + city         shuttle flight to a city
+  BUILD                  build a research station
+  TREAT + color          treat a disease, colors in the order of game.COLORS
+  CURE + color           discover a cure
+  GIVE + 48 * p + card   give a city card to player p + 1
+  TAKE + 48 * p + card   take a city card from player p + 1
+  END_TURN               end the turn
+"""
+
+import game
+
+CITIES = game.CITY_CARDS
+PLAYERS = 4
+CURE_CARDS = 5
+MAX_RESEARCH_STATIONS = 6
+
+DRIVE = 0
+DIRECT = DRIVE + CITIES
+CHARTER = DIRECT + CITIES
+SHUTTLE = CHARTER + CITIES
+BUILD = SHUTTLE + CITIES
+TREAT = BUILD + 1
+CURE = TREAT + len(game.COLORS)
+GIVE = CURE + len(game.COLORS)
+TAKE = GIVE + PLAYERS * CITIES
+END_TURN = TAKE + PLAYERS * CITIES
+ACTION_COUNT = END_TURN + 1
+
+ALL_CITIES = (1 << CITIES) - 1
+
+def action_mask(gs):
+    """
+    Returns the bitmask of the legal actions of the current player
+    """
+    player = gs.current_player()
+    board = gs.board
+    loc = player.loc
+    here = 1 << loc
+    hand = player.hand
+    stations = gs.stations
+
+    mask = 1 << END_TURN
+    mask |= board.adjacency[loc] << DRIVE
+    mask |= (hand & ~here) << DIRECT
+
+    if hand & here:
+        mask |= (ALL_CITIES & ~here) << CHARTER
+        if not stations & here and gs.research_stations < MAX_RESEARCH_STATIONS:
+            mask |= 1 << BUILD
+
+    if stations & here:
+        mask |= (stations & ~here) << SHUTTLE
+
+    cubes = gs.cubes
+    for c, color in enumerate(game.COLORS):
+        if cubes[loc * 4 + c]:
+            mask |= 1 << (TREAT + c)
+        if stations & here and not gs.cures[color] \
+           and bin(hand & board.color_masks[c]).count('1') >= CURE_CARDS:
+            mask |= 1 << (CURE + c)
+
+    for pn, other in gs.player.items():
+        if other is not player and other.loc == loc:
+            mask |= hand << (GIVE + (pn - 1) * CITIES)
+            mask |= other.hand << (TAKE + (pn - 1) * CITIES)
+
+    return mask
+
+def decode(gs, index):
+    """
+    Turns an action number into an action tuple for the current player,
+    see engine.PandemicEnv.step
+    """
+    names = gs.board.names
+    if index < DIRECT:
+        return ('drive', names[index - DRIVE])
+    if index < CHARTER:
+        return ('direct_flight', names[index - DIRECT])
+    if index < SHUTTLE:
+        return ('charter_flight', names[index - CHARTER])
+    if index < BUILD:
+        return ('shuttle_flight', names[index - SHUTTLE])
+    if index == BUILD:
+        return ('build_research_station',)
+    if index < CURE:
+        return ('treat_disease', game.COLORS[index - TREAT])
+    if index < GIVE:
+        c = index - CURE
+        cards = gs.current_player().hand & gs.board.color_masks[c]
+        return ('discover_cure', game.COLORS[c], [names[i] for i in bits(cards)][:CURE_CARDS])
+    if index < TAKE:
+        pn, card = divmod(index - GIVE, CITIES)
+        return ('share_knowledge', 'give', pn + 1, names[card])
+    if index < END_TURN:
+        pn, card = divmod(index - TAKE, CITIES)
+        return ('share_knowledge', 'take', pn + 1, names[card])
+    if index == END_TURN:
+        return ('end_turn',)
+    raise ValueError("There isn't an action {0}".format(index))
+
+def encode(gs, action):
+    """
+    Turns an action tuple of the current player into its action number. A
+    cure is numbered by its color alone and decodes to the lowest numbered
+    cards of the color, so a cure that would discard other cards raises a
+    ValueError rather than being numbered as a different action, and so
+    does building a research station by moving one.
+    """
+    if isinstance(action, int):
+        return action
+    index = gs.board.index
+    name = action[0]
+    if name == 'drive':
+        return DRIVE + index[action[1]]
+    if name == 'direct_flight':
+        return DIRECT + index[action[1]]
+    if name == 'charter_flight':
+        return CHARTER + index[action[1]]
+    if name == 'shuttle_flight':
+        return SHUTTLE + index[action[1]]
+    if name == 'build_research_station':
+        # with the stations all built, building moves one, which BUILD can't say
+        if len(action) > 1 and action[1] and gs.research_stations >= MAX_RESEARCH_STATIONS:
+            raise ValueError('Moving a research station from {0} has no action number'
+                             .format(action[1]))
+        return BUILD
+    if name == 'treat_disease':
+        # no color is the color of the city, like Player.treat_disease
+        if len(action) < 2 or not action[1]:
+            return TREAT + gs.board.colors[gs.current_player().loc]
+        return TREAT + game.COLOR_INDEX[action[1]]
+    if name == 'discover_cure':
+        c = game.COLOR_INDEX[action[1]]
+        cards = gs.current_player().hand & gs.board.color_masks[c]
+        # the cards the cure would discard, picked like Player.discover_cure does
+        used = [card for card in dict.fromkeys(action[2])
+                if card in index and cards >> index[card] & 1][:CURE_CARDS]
+        if len(used) == CURE_CARDS and used != decode(gs, CURE + c)[2]:
+            raise ValueError('Only cures with the lowest numbered cards of their color have '
+                             'an action number, {0} would discard {1}'.format(action[1], used))
+        return CURE + c
+    if name == 'share_knowledge':
+        start = GIVE if action[1] == 'give' else TAKE
+        return start + (action[2] - 1) * CITIES + index[action[3]]
+    if name == 'end_turn':
+        return END_TURN
+    raise ValueError("I don't know the action '{0}'".format(name))
+
+def legal_actions(gs):
+    """
+    Yields the legal actions of the current player as action tuples
+    """
+    for index in bits(action_mask(gs)):
+        yield decode(gs, index)
+
+def bits(mask):
+    """
+    Yields the positions of the set bits of a mask, lowest first
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def unpack(mask):
+    """
+    Returns a mask as ACTION_COUNT bytes of 0 or 1, ready to be wrapped by
+    an array library to mask the logits of a policy
+    """
+    flags = bytearray(ACTION_COUNT)
+    for index in bits(mask):
+        flags[index] = 1
+    return flags
@@ -0,0 +1,329 @@
+"""
+Heuristic reference agents
+
+  GreedyPolicy   treats where it is, or drives toward the nearest cubes,
+                 the nearest city ready to outbreak first
+  CurePolicy     cures when it can, takes 5 cards of a color to the
+                 nearest research station (building one on the way if a
+                 card allows), and otherwise plays like GreedyPolicy
+
+An agent returns an action number (see actions.py) for the current player
+of a game when called with it, and `act(states)` does the same for a list
+of games, which is what play_batch steps its games in lockstep with:
+
+  agent = agents.GreedyPolicy(seed=0)
+  moves = agent.act(states)
+  results = list(agents.play_batch(1000, agent, batch=256, seed=1))
+
+Each game is decided on its own by `decide`, in Python. What makes that
+cheap is that nothing is tried and the board isn't scanned: it reads the
+bitmasks the game keeps up to date (a player's hand, the research
+stations, the infected and ready cities of every color, see
+game.GameState.set_cubes) and tables made once per board, of the cities at
+each drive distance from a city and of the neighbour to drive to on the
+way to any city.
+
+An agent that has the games as observation rows already, say because it
+encodes them for a network (see observation.py), can hand them to
+`act(states, rows)`, and the whole batch is decided with NumPy array
+operations on the rows by `decide_batch`, making the same moves. NumPy is
+only needed for that. Encoding rows just to decide over them costs more
+than deciding from the bitmasks, so play_batch doesn't. `explore` is the
+share of moves played by engine.RandomPolicy instead.
+
+  rows = numpy.frombuffer(encoder.encode_batch(states), numpy.uint8)
+  moves = agent.act(states, rows.reshape(-1, observation.SIZE))
+"""
+
+import functools
+import math
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import actions
+import engine
+import game
+import observation
+import routing
+
+@functools.lru_cache(maxsize=None)
+def rings(board):
+    """
+    For every city, a tuple of the bitmasks of the cities 0, 1, 2, ...
+    drives away from it
+    """
+    table = []
+    for row in routing.drive_distances(board):
+        masks = [0] * (max(d for d in row if d != 255) + 1)
+        for city, d in enumerate(row):
+            if d != 255:
+                masks[d] |= 1 << city
+        table.append(tuple(masks))
+    return tuple(table)
+
+@functools.lru_cache(maxsize=None)
+def hops(board):
+    """
+    For every city, bytes giving for each other city the neighbour to drive
+    to first on a shortest way there (the city itself for itself, and for
+    cities it can't drive to)
+    """
+    distances = routing.drive_distances(board)
+    table = []
+    for city in range(len(board)):
+        row = bytearray([city]) * len(board)
+        for target in range(len(board)):
+            if target != city and distances[city][target] != 255:
+                row[target] = min(n for n in board.neighbours[city]
+                                  if distances[n][target] < distances[city][target])
+        table.append(bytes(row))
+    return tuple(table)
+
+@functools.lru_cache(maxsize=None)
+def arrays(board):
+    """
+    The drive distances and hops of a board as NumPy arrays of cities by
+    cities, and the color of every city, for decide_batch
+    """
+    size = len(board)
+    distances = numpy.frombuffer(b''.join(routing.drive_distances(board)), numpy.uint8)
+    first = numpy.frombuffer(b''.join(hops(board)), numpy.uint8)
+    return (distances.reshape(size, size).astype(numpy.intp),
+            first.reshape(size, size).astype(numpy.intp), numpy.array(board.colors))
+
+# what decide_batch needs of a batch of games as NumPy arrays with a row per
+# game: the cubes as in GameState.cubes, the city of the current player, 0
+# or 1 for every city card in their hand and for every research station,
+# and whether every color is cured
+Batch = namedtuple('Batch', ['cubes', 'loc', 'hand', 'stations', 'cured'])
+
+def unpack(rows):
+    """
+    Returns the Batch of games given as observation rows, a NumPy array of
+    bytes with a row per game (see observation.py)
+    """
+    games = numpy.arange(len(rows))
+    player = _field(rows, 'turn').argmax(1)
+    at = observation.CUBES_AT
+    return Batch(rows[:, at:at + observation.CUBES],
+                 _field(rows, 'pawns')[games, player].argmax(1),
+                 _field(rows, 'hands')[games, player, :observation.CITIES],
+                 _field(rows, 'stations'), _field(rows, 'cures')[:, :, 0] == 0)
+
+def _lowest(mask):
+    return (mask & -mask).bit_length() - 1
+
+def _field(rows, name):
+    offset, shape = observation.FIELDS[name]
+    return rows[:, offset:offset + math.prod(shape)].reshape(len(rows), *shape)
+
+def _nearest(away, targets):
+    """
+    The nearest target of every game, the lowest numbered of those at the
+    same distance, and whether there is one it can drive to
+    """
+    targets = targets & (away != 255)
+    nearest = numpy.where(targets, away, 256).argmin(1)
+    return nearest, targets.any(1)
+
+class GreedyPolicy:
+
+    """
+    Treats the disease with the most cubes where the player is, or drives
+    toward the nearest cubes
+    """
+
+    def __init__(self, seed=None, explore=0.0):
+        if not 0 <= explore <= 1:
+            raise ValueError('explore must be between 0 and 1')
+        self.random = engine.RandomPolicy(seed)
+        self.explore = explore
+        self.board = None
+
+    def tables(self, board):
+        """
+        The drive rings and hops of a board, kept for the last board seen
+        """
+        if board is not self.board:
+            self._tables = rings(board), hops(board)
+            self.board = board
+        return self._tables
+
+    def act(self, states, rows=None):
+        """
+        Returns an action number for every game. Given the observation rows
+        of the games too, a NumPy array with a row for each (see
+        observation.py), the games are decided together with decide_batch.
+        """
+        if rows is not None:
+            moves = self.decide_batch(rows, states[0].board).tolist() if states else []
+        else:
+            decide = self.decide
+            moves = [decide(gs) for gs in states]
+        if self.explore:
+            draw = self.random.random.random
+            for i, gs in enumerate(states):
+                if draw() < self.explore:
+                    moves[i] = actions.encode(gs, self.random(gs))
+        return moves
+
+    def decide(self, gs):
+        """
+        Returns the action number of the heuristic for one game
+        """
+        loc = gs.current_player().loc
+        return self.treat(gs, loc) or self.toward_cubes(gs, loc)
+
+    def decide_batch(self, rows, board):
+        """
+        Returns the action numbers of the heuristic as a NumPy array, for
+        games on a board given as observation rows. Subclasses that change
+        decide change this to match.
+        """
+        batch = unpack(rows)
+        return self.treat_batch(batch, numpy.arange(len(rows)), board)
+
+    def treat_batch(self, batch, games, board):
+        """
+        treat, or else toward_cubes, for every game of a Batch
+        """
+        distances, first, _ = arrays(board)
+        loc = batch.loc
+        away = distances[loc]
+        here = batch.cubes.reshape(len(loc), -1, len(game.COLORS))[games, loc]
+        treating = here.any(1)
+        moves = numpy.where(treating, actions.TREAT + here.argmax(1), actions.END_TURN)
+        # the 4 bytes of cubes of a city read as one number, in which a city
+        # with MAX_CUBES (3) of a color has both low bits of its byte set
+        cities = batch.cubes.view(numpy.uint32)
+        ready = (cities & (cities >> 1) & 0x01010101) != 0
+        # the nearest ready city wins over the nearest infected one
+        for targets in (cities != 0, ready):
+            nearest, found = _nearest(away, targets)
+            moves = numpy.where(found & ~treating, actions.DRIVE + first[loc, nearest], moves)
+        return moves
+
+    def treat(self, gs, loc):
+        """
+        Treating the color with the most cubes here, or 0 if there aren't any
+        """
+        here = 1 << loc
+        infected = gs.infected
+        if not (infected[0] | infected[1] | infected[2] | infected[3]) & here:
+            return 0
+        cubes = gs.cubes
+        slot = loc * 4
+        c = max(range(4), key=lambda c: cubes[slot + c])
+        return actions.TREAT + c
+
+    def toward_cubes(self, gs, loc):
+        """
+        Driving toward the nearest city ready to outbreak, or else the
+        nearest city with cubes. Ends the turn if the board is clean.
+        """
+        ring_table, hop_table = self.tables(gs.board)
+        infected = gs.infected
+        ready = gs.ready
+        any_infected = infected[0] | infected[1] | infected[2] | infected[3]
+        any_ready = ready[0] | ready[1] | ready[2] | ready[3]
+        for targets in (any_ready, any_infected):
+            if targets:
+                for ring in ring_table[loc]:
+                    if ring & targets:
+                        return actions.DRIVE + hop_table[loc][_lowest(ring & targets)]
+        return actions.END_TURN
+
+    def __call__(self, gs):
+        return self.act([gs])[0]
+
+class CurePolicy(GreedyPolicy):
+
+    """
+    Works toward cures, treating cubes like GreedyPolicy in between
+    """
+
+    def decide(self, gs):
+        player = gs.current_player()
+        loc = player.loc
+        hand = player.hand
+        color_masks = gs.board.color_masks
+        colors = game.COLORS if bin(hand).count('1') >= actions.CURE_CARDS else ()
+        for c, color in enumerate(colors):
+            if gs.cures[color]:
+                continue
+            held = bin(hand & color_masks[c]).count('1')
+            if held < actions.CURE_CARDS:
+                continue
+            stations = gs.stations
+            if stations >> loc & 1:
+                return actions.CURE + c
+            # building here spends the card of this city, which may be one of the cure
+            if hand >> loc & 1 and gs.research_stations < actions.MAX_RESEARCH_STATIONS \
+               and (held > actions.CURE_CARDS or not color_masks[c] >> loc & 1):
+                return actions.BUILD
+            ring_table, hop_table = self.tables(gs.board)
+            for ring in ring_table[loc]:
+                if ring & stations:
+                    return actions.DRIVE + hop_table[loc][_lowest(ring & stations)]
+        return self.treat(gs, loc) or self.toward_cubes(gs, loc)
+
+    def decide_batch(self, rows, board):
+        batch = unpack(rows)
+        games = numpy.arange(len(rows))
+        loc = batch.loc
+        moves = self.treat_batch(batch, games, board)
+
+        distances, first, colors = arrays(board)
+        hand = batch.hand.astype(numpy.intp)
+        held = hand @ (colors == numpy.arange(len(game.COLORS))[:, None]).T
+        stations = batch.stations == 1
+        at_station = stations[games, loc]
+        can_build = (hand[games, loc] == 1) \
+            & (stations.sum(1) < actions.MAX_RESEARCH_STATIONS)
+        station, reachable = _nearest(distances[loc], stations)
+        drive = actions.DRIVE + first[loc, station]
+        # going backwards so that the first color to cure is the one left
+        for c in reversed(range(len(game.COLORS))):
+            # building here spends the card of this city, which may be one of the cure
+            build = can_build & ((held[:, c] > actions.CURE_CARDS) | (colors[loc] != c))
+            move = numpy.where(at_station, actions.CURE + c,
+                               numpy.where(build, actions.BUILD, drive))
+            curing = ~batch.cured[:, c] & (held[:, c] >= actions.CURE_CARDS) \
+                & (at_station | build | reachable)
+            moves = numpy.where(curing, move, moves)
+        return moves
+
+def play_batch(n, policy, batch=64, players=2, difficulty=4, seed=None, roles=None):
+    """
+    Plays n games, `batch` of them at a time in lockstep with one call to
+    policy.act per step (or a call of the policy per game, for policies
+    without act), yielding the result of each game as it finishes. With a
+    seed, game i is seeded by engine.game_seed(seed, i).
+    """
+    act = getattr(policy, 'act', None) or (lambda states: [policy(gs) for gs in states])
+    envs = []
+    started = 0
+    for _ in range(min(batch, n)):
+        env = engine.PandemicEnv(players, difficulty, roles=roles)
+        env.reset(None if seed is None else engine.game_seed(seed, started))
+        envs.append(env)
+        started += 1
+
+    while envs:
+        moves = act([env.gs for env in envs])
+        playing = []
+        for env, move in zip(envs, moves):
+            _, _, done = env.step(move)
+            if not done:
+                playing.append(env)
+                continue
+            yield env.result()
+            if started < n:
+                env.reset(None if seed is None else engine.game_seed(seed, started))
+                started += 1
+                playing.append(env)
+        envs = playing
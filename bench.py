@@ -0,0 +1,556 @@
+"""
+Benchmarks for the headless engine
+
+python bench.py games -n 1000
+python bench.py all --save baseline.json
+python bench.py all --compare baseline.json
+
+Every benchmark plays the same games each run, from fixed seeds. --save
+writes the results to a JSON baseline, and --compare checks a run against
+one: a rate (_per_sec) that drops or a size (bytes_) that grows by more
+than the tolerance is reported as a regression, and the exit status is 1.
+
+tests/test_bench.py times the same hot paths as pytest-benchmark tests,
+which run with the rest of the tests when pytest-benchmark is installed.
+This script doesn't need pytest, and measures sizes and whole workloads
+as well as timings.
+"""
+
+import argparse
+import copy
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import actions
+import agents
+import cli
+import engine
+import game
+import observation
+import record
+import replay
+import risk
+import rollout
+
+def bench_games(n, players=2, difficulty=4):
+    """
+    Plays n full games with the random policy
+    """
+    policy = engine.RandomPolicy(seed=0)
+    start = time.perf_counter()
+    results = list(engine.run_batch(n, policy, players, difficulty, seed=0))
+    elapsed = time.perf_counter() - start
+
+    return {'games': n,
+            'seconds': elapsed,
+            'games_per_sec': n / elapsed,
+            'actions_per_sec': sum(r.actions for r in results) / elapsed,
+            'wins': sum(r.won for r in results)}
+
+def bench_setup(n):
+    """
+    Sets up n fresh games for every number of players and difficulty
+    """
+    timings = {}
+    for players in (2, 3, 4):
+        for difficulty in (4, 5, 6):
+            start = time.perf_counter()
+            for i in range(n):
+                game.clean_setup(players, difficulty,
+                                 game.GameState(quiet=True, seed=i, fast=True))
+            elapsed = time.perf_counter() - start
+            timings['p{0}_d{1}_per_sec'.format(players, difficulty)] = n / elapsed
+    return timings
+
+def bench_load(n):
+    """
+    Loads the board n times by parsing the cities file and from
+    board_data.py, against the cached city_loader and infection_loader
+    """
+    with open(game.CITIES_CSV) as f:
+        text = f.read()
+    timings = {}
+    for name, load in [('parse', lambda: game.Board(game.parse_cities(text))),
+                       ('embedded', game.load_board.__wrapped__),
+                       ('city_loader', game.city_loader),
+                       ('infection_loader', game.infection_loader)]:
+        start = time.perf_counter()
+        for _ in range(n):
+            load()
+        timings[name + '_per_sec'] = n / (time.perf_counter() - start)
+    return timings
+
+def player_action(name):
+    """
+    Returns a game set up so the current player can take an action, and
+    the call taking it
+    """
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=0, fast=True))
+    player = gs.current_player()
+    other = gs.player[player.number % 2 + 1]
+    index = gs.board.index
+    here = player.location
+    player.cards = []
+
+    if name == 'drive':
+        return gs, lambda: player.drive(gs.cities[here].connections[0])
+    if name == 'direct_flight':
+        player.cards = ['paris']
+        return gs, lambda: player.direct_flight('paris')
+    if name == 'charter_flight':
+        player.cards = [here]
+        return gs, lambda: player.charter_flight('tokyo')
+    if name == 'shuttle_flight':
+        gs.set_research_station(index['tokyo'])
+        return gs, lambda: player.shuttle_flight('tokyo')
+    if name == 'build_research_station':
+        player.move_to(index['paris'])
+        player.cards = ['paris']
+        return gs, player.build_research_station
+    if name == 'treat_disease':
+        gs.set_cubes(player.loc, game.COLOR_INDEX['blue'], 3)
+        return gs, lambda: player.treat_disease('blue')
+    if name == 'share_knowledge':
+        other.move_to(player.loc)
+        player.cards = ['paris']
+        return gs, lambda: player.share_knowledge('give', other.number, 'paris')
+    if name == 'discover_cure':
+        cards = [city for city in gs.board.names
+                 if gs.board.cities[index[city]].color == 'black'][:5]
+        player.cards = cards
+        gs.set_research_station(player.loc)
+        return gs, lambda: player.discover_cure('black', cards)
+    raise ValueError("I don't know the action '{0}'".format(name))
+
+PLAYER_ACTIONS = ['drive', 'direct_flight', 'charter_flight', 'shuttle_flight',
+                  'build_research_station', 'treat_disease', 'share_knowledge', 'discover_cure']
+
+def bench_player(n):
+    """
+    Takes each Player action n times, restoring the game after each one,
+    against restoring alone
+    """
+    timings = {}
+    for name in PLAYER_ACTIONS:
+        gs, act = player_action(name)
+        snapshot = gs.snapshot()
+        start = time.perf_counter()
+        for _ in range(n):
+            act()
+            gs.restore(snapshot)
+        timings[name + '_per_sec'] = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        gs.restore(snapshot)
+    timings['restore_per_sec'] = n / (time.perf_counter() - start)
+    return timings
+
+def bench_memory(n, players=4, difficulty=6):
+    """
+    Measures the memory of n live games, and of n forks of one of them
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [game.clean_setup(players, difficulty,
+                              game.GameState(quiet=True, seed=i, fast=True))
+             for i in range(n)]
+    per_game = (tracemalloc.get_traced_memory()[0] - before) / n
+
+    before = tracemalloc.get_traced_memory()[0]
+    forks = [games[0].fork() for _ in range(n)]
+    per_fork = (tracemalloc.get_traced_memory()[0] - before) / n
+    tracemalloc.stop()
+
+    return {'games': n,
+            'bytes_per_game': per_game,
+            'bytes_per_fork': per_fork}
+
+def bench_actions(n, players=2, difficulty=4):
+    """
+    Finds the legal actions of a mid-game position n times
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        actions.action_mask(gs)
+    elapsed = time.perf_counter() - start
+
+    return {'masks': n,
+            'seconds': elapsed,
+            'masks_per_sec': n / elapsed}
+
+def bench_clone(n, players=2, difficulty=4):
+    """
+    Copies a mid-game position n times with copy.deepcopy, fork and
+    snapshot/restore
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+
+    timings = {}
+    for name, clone in [('deepcopy', lambda: copy.deepcopy(gs)),
+                        ('fork', gs.fork),
+                        ('snapshot', lambda: gs.restore(gs.snapshot()))]:
+        start = time.perf_counter()
+        for _ in range(n):
+            clone()
+        timings[name + '_per_sec'] = n / (time.perf_counter() - start)
+
+    return timings
+
+def bench_hash(n, players=2, difficulty=4):
+    """
+    Hashes a mid-game position n times from scratch, against reading the
+    incrementally kept hash
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        gs.rehash()
+    elapsed = time.perf_counter() - start
+
+    return {'rehashes': n,
+            'seconds': elapsed,
+            'rehash_per_sec': n / elapsed}
+
+def bench_outbreak(n):
+    """
+    Resolves an outbreak n times on a board with every city at 3 cubes of
+    the outbreaking color, with and without the outbreak limit
+
+    The board has 144 black cubes where a game has 24, which no game can
+    reach, and the cascade needs still more. So black gets a supply that
+    can't run out before the cubes go on the board: running out of cubes
+    never ends the outbreak, and storage stays the supply minus the cubes
+    on the board. Only eradication compares storage with CUBES_PER_COLOR,
+    and black isn't cured here.
+    """
+    timings = {}
+    for name, limit in [('capped', game.OUTBREAK_LIMIT), ('cascade', 1000)]:
+        gs = game.GameState(quiet=True)
+        gs.outbreak_limit = limit
+        gs.cubes_in_storage['black'] = 10**6
+        for city in range(len(gs.board)):
+            gs.set_cubes(city, game.COLOR_INDEX['black'], 3)
+        start_snapshot = gs.snapshot()
+
+        elapsed = 0.0
+        for _ in range(n):
+            gs.restore(start_snapshot)
+            start = time.perf_counter()
+            gs.outbreak('cairo', 'black')
+            elapsed += time.perf_counter() - start
+
+        timings[name + '_outbreaks'] = gs.outbreaks
+        timings[name + '_per_sec'] = n / elapsed
+    return timings
+
+def bench_observe(n, players=2, difficulty=4, batch=256):
+    """
+    Encodes n observations of mid-game positions, a batch at a time
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+    states = [gs.fork() for _ in range(batch)]
+    encoder = observation.Encoder(batch)
+
+    start = time.perf_counter()
+    for _ in range(max(n // batch, 1)):
+        encoder.encode_batch(states)
+    elapsed = time.perf_counter() - start
+
+    encoded = max(n // batch, 1) * batch
+    return {'observations': encoded,
+            'seconds': elapsed,
+            'obs_per_sec': encoded / elapsed}
+
+def bench_agents(n, players=2, difficulty=4, sizes=(1, 8, 64, 512)):
+    """
+    Asks the agents of agents.py for about n decisions on mid-game
+    positions, in batches of each size (and over observation rows too with
+    NumPy installed), then plays n // 10 games with the greedy agent one at
+    a time and in batches of 64
+    """
+    policy = engine.RandomPolicy(seed=0)
+    env = engine.PandemicEnv(players, difficulty)
+    states = []
+    for seed in itertools.count():
+        if len(states) == max(sizes):
+            break
+        gs = env.reset(seed=seed)
+        for _ in range(seed % 40):
+            gs, _, done = env.step(policy(gs))
+            if done:
+                break
+        else:
+            states.append(gs.fork())
+
+    timings = {'decisions': max(n // len(states), 1) * len(states)}
+    for name, agent in (('greedy', agents.GreedyPolicy), ('cure', agents.CurePolicy)):
+        for size in sizes:
+            # every size decides the same positions, only split differently
+            act = agent(seed=0).act
+            batches = [states[i:i + size] for i in range(0, len(states), size)]
+            rounds = max(n // len(states), 1)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for batch in batches:
+                    act(batch)
+            timings['{0}_{1}_per_sec'.format(name, size)] = \
+                rounds * len(states) / (time.perf_counter() - start)
+
+            if agents.numpy is None:
+                continue
+            # the same positions again, decided over observation rows made beforehand
+            rows = [agents.numpy.frombuffer(observation.Encoder(len(batch)).encode_batch(batch),
+                                            agents.numpy.uint8).reshape(-1, observation.SIZE)
+                    for batch in batches]
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for batch, batch_rows in zip(batches, rows):
+                    act(batch, batch_rows)
+            timings['{0}_rows_{1}_per_sec'.format(name, size)] = \
+                rounds * len(states) / (time.perf_counter() - start)
+
+    games = max(n // 10, 1)
+    for size in (1, 64):
+        start = time.perf_counter()
+        for _ in agents.play_batch(games, agents.GreedyPolicy(seed=0), size, players,
+                                   difficulty, seed=0):
+            pass
+        timings['games_{0}_per_sec'.format(size)] = games / (time.perf_counter() - start)
+    return timings
+
+def bench_rollout(n, players=2, difficulty=4):
+    """
+    Plays n rollouts from the start of a game
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    gs = env.reset(seed=0)
+
+    start = time.perf_counter()
+    estimate = rollout.evaluate(gs, accuracy=0.0, batch=n, max_rollouts=n, seed=0)
+    elapsed = time.perf_counter() - start
+
+    return {'rollouts': n,
+            'seconds': elapsed,
+            'rollouts_per_sec': n / elapsed,
+            'pruned': estimate.pruned}
+
+def bench_risk(n, players=2, difficulty=4):
+    """
+    Works out the infection odds of a mid-game position n times, against
+    reading them from the cache
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+
+    start = time.perf_counter()
+    for _ in range(n):
+        risk.card_odds(gs)
+    exact = time.perf_counter() - start
+
+    odds = risk.InfectionRisk(gs)
+    start = time.perf_counter()
+    for _ in range(n):
+        odds.outbreaks()
+    cached = time.perf_counter() - start
+
+    return {'odds_per_sec': n / exact,
+            'cached_per_sec': n / cached}
+
+def bench_record(n, players=2, difficulty=4):
+    """
+    Plays and records n games, then reads them all back and replays the
+    last one
+    """
+    policy = engine.RandomPolicy(seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'games.pdr')
+        start = time.perf_counter()
+        with record.Writer(path) as writer:
+            for _ in record.record_batch(writer, n, policy, players, difficulty, seed=0):
+                pass
+        written = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with record.Reader(path) as reader:
+            events = sum(played.count for played in reader)
+            reader[len(reader) - 1].replay()
+        read = time.perf_counter() - start
+
+        return {'games': n,
+                'bytes_per_game': os.path.getsize(path) / n,
+                'records': events,
+                'recorded_per_sec': n / written,
+                'read_per_sec': n / read}
+
+def bench_replay(n, players=2, difficulty=4):
+    """
+    Replays a game to its end n times, checked and fast, and jumps to
+    n random moves of it with snapshots
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    moves = []
+    done = False
+    while not done:
+        action = policy(gs)
+        moves.append(actions.encode(gs, action))
+        gs, _, done = env.step(action)
+
+    timings = {'moves': len(moves)}
+    for name, fast in [('checked', False), ('fast', True)]:
+        start = time.perf_counter()
+        for _ in range(n):
+            replay.Replay(gs.seed, moves, players, difficulty, fast=fast).seek(len(moves))
+        timings[name + '_per_sec'] = n / (time.perf_counter() - start)
+
+    replayer = replay.Replay(gs.seed, moves, players, difficulty, fast=True)
+    replayer.seek(len(moves))
+    targets = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(n):
+        replayer.seek(targets.randrange(len(moves) + 1))
+    timings['seeks_per_sec'] = n / (time.perf_counter() - start)
+    return timings
+
+def command(action):
+    """
+    The terminal game's command for an action tuple
+    """
+    if action[0] == 'discover_cure':
+        return 'discover_cure {0} {1}'.format(action[1], ', '.join(action[2]))
+    return ' '.join(str(a) for a in action)
+
+def bench_script(n, players=2, difficulty=4):
+    """
+    Plays n games of random actions as scripts through the terminal game in
+    batch mode, with every kind of rendering
+    """
+    env = engine.PandemicEnv(players, difficulty)
+    policy = engine.RandomPolicy(seed=0)
+    scripts = []
+    for i in range(n):
+        gs = env.reset(seed=i)
+        lines = []
+        done = False
+        while not done:
+            action = policy(gs)
+            lines.append(command(action))
+            gs, _, done = env.step(action)
+        scripts.append((i, '\n'.join(lines) + '\n'))
+
+    timings = {'commands': sum(script.count('\n') for _, script in scripts)}
+    for render in ['full', 'diff', 'none']:
+        out = io.StringIO()
+        start = time.perf_counter()
+        for seed, script in scripts:
+            gs = game.clean_setup(players, difficulty, game.GameState(quiet=True, seed=seed))
+            cli.PandemicCmd(gs, stdin=io.StringIO(script), stdout=out, batch=True,
+                            render=render).cmdloop()
+        timings[render + '_per_sec'] = timings['commands'] / (time.perf_counter() - start)
+    return timings
+
+BENCHMARKS = {'actions': bench_actions,
+              'agents': bench_agents,
+              'clone': bench_clone,
+              'hash': bench_hash,
+              'load': bench_load,
+              'memory': bench_memory,
+              'observe': bench_observe,
+              'outbreak': bench_outbreak,
+              'record': bench_record,
+              'replay': bench_replay,
+              'risk': bench_risk,
+              'rollout': bench_rollout,
+              'script': bench_script,
+              'games': bench_games,
+              'player': bench_player,
+              'setup': bench_setup}
+
+def regressions(results, baseline, tolerance):
+    """
+    Yields (benchmark, metric, baseline value, value) for every rate that
+    got slower and every size that got bigger by more than the tolerance
+    """
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old:
+                continue
+            if metric.endswith('_per_sec') and value < old * (1 - tolerance):
+                yield name, metric, old, value
+            elif metric.startswith('bytes_') and value > old * (1 + tolerance):
+                yield name, metric, old, value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the Pandemic engine.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ['all'])
+    parser.add_argument("-n", help="number of iterations", type=int, default=1000)
+    parser.add_argument("--save", metavar="PATH", help="write the results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="check the results against a baseline")
+    parser.add_argument("--tolerance", help="the slowdown allowed by --compare",
+                        type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    results = {}
+    for name in names:
+        if len(names) > 1:
+            print(name)
+        results[name] = BENCHMARKS[name](args.n)
+        for k, v in results[name].items():
+            print('{0:>30} : {1:.6g}'.format(k, v) if isinstance(v, float) else
+                  '{0:>30} : {1}'.format(k, v))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'n': args.n,
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        slower = list(regressions(results, baseline, args.tolerance))
+        for name, metric, old, value in slower:
+            print('REGRESSION {0}.{1}: {2:.6g} -> {3:.6g} ({4:+.1%})'.format(
+                name, metric, old, value, value / old - 1))
+        if slower:
+            return 1
+        print('No regressions against {0}'.format(args.compare))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+The cities of data/cities.csv, written by game.write_board_data so
+load_board doesn't have to parse the file
+"""
+
+CSV_CRC = 1426682444
+
+CITIES = (
+    ('algiers', 'black', 2946000,
+     ('cairo', 'istanbul', 'paris', 'madrid')),
+    ('baghdad', 'black', 6204000,
+     ('istanbul', 'cairo', 'riyadh', 'karachi', 'tehran')),
+    ('cairo', 'black', 14718000,
+     ('algiers', 'istanbul', 'baghdad', 'riyadh', 'khartoum')),
+    ('chennai', 'black', 8865000,
+     ('mumbai', 'delhi', 'kolkata', 'bangkok', 'jakarta')),
+    ('delhi', 'black', 22242000,
+     ('kolkata', 'chennai', 'mumbai', 'karachi', 'tehran')),
+    ('istanbul', 'black', 13576000,
+     ('cairo', 'baghdad', 'moscow', 'st. petersburg', 'milan', 'algiers')),
+    ('karachi', 'black', 20711000,
+     ('mumbai', 'delhi', 'tehran', 'baghdad', 'riyadh')),
+    ('kolkata', 'black', 14374000,
+     ('delhi', 'chennai', 'bangkok', 'hong kong')),
+    ('moscow', 'black', 15512000,
+     ('st. petersburg', 'istanbul', 'tehran')),
+    ('mumbai', 'black', 16910000,
+     ('karachi', 'delhi', 'chennai')),
+    ('riyadh', 'black', 5037000,
+     ('cairo', 'baghdad', 'karachi')),
+    ('tehran', 'black', 7419000,
+     ('moscow', 'baghdad', 'karachi', 'delhi')),
+    ('atlanta', 'blue', 4715000,
+     ('miami', 'washington', 'chicago')),
+    ('chicago', 'blue', 9121000,
+     ('atlanta', 'montreal', 'san francisco', 'los angeles', 'mexico city')),
+    ('essen', 'blue', 575000,
+     ('london', 'paris', 'milan', 'st. petersburg')),
+    ('london', 'blue', 8586000,
+     ('new york', 'madrid', 'paris', 'essen')),
+    ('madrid', 'blue', 5427000,
+     ('new york', 'sao paulo', 'algiers', 'paris', 'london')),
+    ('milan', 'blue', 5232000,
+     ('paris', 'istanbul', 'essen')),
+    ('montreal', 'blue', 3429000,
+     ('chicago', 'washington', 'new york')),
+    ('new york', 'blue', 20464000,
+     ('montreal', 'washington', 'madrid', 'london')),
+    ('paris', 'blue', 10755000,
+     ('london', 'madrid', 'algiers', 'milan', 'essen')),
+    ('san francisco', 'blue', 5864000,
+     ('tokyo', 'manila', 'los angeles', 'chicago')),
+    ('st. petersburg', 'blue', 4879000,
+     ('moscow', 'istanbul', 'essen')),
+    ('washington', 'blue', 4679000,
+     ('montreal', 'atlanta', 'miami', 'new york')),
+    ('bangkok', 'red', 7151000,
+     ('kolkata', 'chennai', 'jakarta', 'ho chi minh city', 'hong kong')),
+    ('beijing', 'red', 17311000,
+     ('seoul', 'shanghai')),
+    ('ho chi minh city', 'red', 8314000,
+     ('hong kong', 'bangkok', 'jakarta', 'manila')),
+    ('hong kong', 'red', 7106000,
+     ('shanghai', 'kolkata', 'bangkok', 'ho chi minh city', 'manila', 'taipei')),
+    ('jakarta', 'red', 26063000,
+     ('bangkok', 'chennai', 'sydney', 'ho chi minh city')),
+    ('manila', 'red', 20767000,
+     ('taipei', 'hong kong', 'ho chi minh city', 'sydney', 'san francisco')),
+    ('osaka', 'red', 2871000,
+     ('tokyo', 'taipei')),
+    ('seoul', 'red', 22547000,
+     ('beijing', 'shanghai', 'tokyo')),
+    ('shanghai', 'red', 13482000,
+     ('beijing', 'hong kong', 'taipei', 'tokyo', 'seoul')),
+    ('sydney', 'red', 3785000,
+     ('manila', 'jakarta', 'los angeles')),
+    ('taipei', 'red', 8338000,
+     ('shanghai', 'hong kong', 'manila', 'osaka')),
+    ('tokyo', 'red', 13189000,
+     ('seoul', 'shanghai', 'osaka', 'san francisco')),
+    ('bogota', 'yellow', 8702000,
+     ('lima', 'buenos aires', 'sao paulo', 'miami', 'mexico city')),
+    ('buenos aires', 'yellow', 13639000,
+     ('sao paulo', 'bogota')),
+    ('johannesburg', 'yellow', 3888000,
+     ('kinshasa', 'khartoum')),
+    ('khartoum', 'yellow', 4887000,
+     ('lagos', 'kinshasa', 'johannesburg', 'cairo')),
+    ('kinshasa', 'yellow', 9046000,
+     ('lagos', 'khartoum', 'johannesburg')),
+    ('lagos', 'yellow', 11547000,
+     ('kinshasa', 'khartoum', 'sao paulo')),
+    ('lima', 'yellow', 9121000,
+     ('santiago', 'bogota', 'mexico city')),
+    ('los angeles', 'yellow', 14900000,
+     ('sydney', 'mexico city', 'chicago', 'san francisco')),
+    ('mexico city', 'yellow', 19463000,
+     ('los angeles', 'chicago', 'miami', 'bogota', 'lima')),
+    ('miami', 'yellow', 5582000,
+     ('bogota', 'mexico city', 'atlanta', 'washington')),
+    ('santiago', 'yellow', 6015000,
+     ('lima',)),
+    ('sao paulo', 'yellow', 20186000,
+     ('bogota', 'buenos aires', 'lagos', 'madrid')),
+)
@@ -0,0 +1,341 @@
+"""
+The terminal game: the command loop, what it prints and the command line
+
+The engine in game.py doesn't import any of this, so processes that only
+play headless games don't pay for it. `python game.py` runs main from here.
+"""
+
+import argparse
+import cmd
+import contextlib
+import io
+import logging
+import os
+import sys
+
+import engine
+import game
+
+# SCREEN
+SCREEN_WIDTH = 80
+LOGO = """
+|||||||||||||||||||||||||||||||||||
+||                               ||
+||  |¯_) /\ |\ ||¯¯\|_¯|\/||/¯¯  ||
+||  |   /--\| \||__/|__|  ||\__  ||
+||                               ||
+|||||||||||||||||||||||||||||||||||
+"""
+
+
+def print_welcome_message(gs, d3, d2, d1):
+    """
+    Prints the welcome message to a clean game
+    """
+    print(LOGO, '\n')
+    print('WELCOME TO PANDEMIC!\n')
+    print('Do you have what it takes to save humanity? Let\'s find out!')
+    print('Here\'s everything you need to get started:\n')
+    print(' The infected cities:\n\n  3 cubes : {d3}\n  2 cubes : {d2}\n  1 cube  : {d1}\n'
+          .format(d3=d3, d2=d2, d1=d1))
+    print('Here are the player hands:\n')
+    for i in gs.player:
+        print('  Player {i}:'.format(i=i))
+        print('    Role : {role}'.format(role=gs.player[i].role))
+        print('    Cards: {cards}\n'.format(cards=gs.player[i].cards))
+    print('Player {first} goes first. Good luck!'.format(first=gs.player_turn))
+
+def print_end_turn(gs, file=None):
+    """
+    Prints the gameboard and stuff
+    """
+    print(LOGO, '\n', file=file)
+    print("Player {}'s turn ".format(gs.player_turn), file=file)
+    print(' Here are the player hands:\n', file=file)
+    for i in gs.player:
+        print('  Player {i}:'.format(i=i), file=file)
+        print('    Role : {role}'.format(role=gs.player[i].role), file=file)
+        print('    Cards: {cards}\n'.format(cards=gs.player[i].cards), file=file)
+
+def board_lines(gs):
+    """
+    The board as a line of text per thing that can change, keyed by what
+    it describes, for printing just what changed between two turns
+    """
+    lines = {'turn': "Player {0}'s turn".format(gs.player_turn),
+             'outbreaks': 'Outbreaks: {0}'.format(gs.outbreaks),
+             'infection rate': 'Infection rate: {0}'.format(gs.infection_rate),
+             'cures': 'Cures: {0}'.format(', '.join(c for c in game.COLORS if gs.cures[c])
+                                          or 'none'),
+             'research stations': 'Research stations: {0}'.format(
+                 ', '.join(name for n, name in enumerate(gs.board.names)
+                           if gs.stations >> n & 1))}
+    for pn, p in gs.player.items():
+        lines['player {0}'.format(pn)] = 'Player {0} ({1}) at {2}: {3}'.format(
+            pn, p.role, p.location, ', '.join(p.cards))
+    names = gs.board.names
+    for slot, n in enumerate(gs.cubes):
+        if n:
+            city, c = divmod(slot, 4)
+            cubes = '{0} {1}'.format(n, game.COLORS[c])
+            name = names[city]
+            lines[name] = lines[name] + ', ' + cubes if name in lines else name + ': ' + cubes
+    return lines
+
+def print_board_changes(before, after, file=None):
+    """
+    Prints the lines of board_lines that changed, and the cities that have
+    been cleared of cubes
+    """
+    for key, line in after.items():
+        if before.get(key) != line:
+            print(' ', line, file=file)
+    for key in before.keys() - after.keys():
+        print('  {0}: no cubes'.format(key), file=file)
+
+
+def clear_screen():
+    """Helper function that clears the screen using either program"""
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+class PandemicCmd(cmd.Cmd):
+
+    """
+    The terminal game
+
+    With batch=True the commands are read from stdin, a file of commands a
+    line each, without prompting or clearing the screen, and everything is
+    written to stdout in blocks of BATCH_BUFFER characters. render is what
+    is printed after a turn ends: 'full' prints the board as print_end_turn
+    does, 'diff' just what changed (see board_lines) and 'none' nothing.
+    """
+
+    prompt = '\n> '
+    BATCH_BUFFER = 1 << 16
+
+    def __init__(self, gs, stdin=None, stdout=None, batch=False, render='full'):
+        super().__init__(stdin=stdin, stdout=stdout)
+        if render not in ('full', 'diff', 'none'):
+            raise ValueError("render must be 'full', 'diff' or 'none', not {0}".format(render))
+        self.gs = gs
+        self.batch = batch
+        self.render = render
+        self.lines = board_lines(gs) if render == 'diff' else None
+        if batch:
+            self.prompt = ''
+            self.use_rawinput = False
+            self.output = self.stdout
+            self.stdout = io.StringIO()
+
+    def say(self, *args):
+        print(*args, file=self.stdout)
+
+    def flush(self):
+        """
+        Writes out what batch mode has buffered
+        """
+        if self.batch:
+            self.output.write(self.stdout.getvalue())
+            self.output.flush()
+            self.stdout.seek(0)
+            self.stdout.truncate()
+
+    # The default() method is called when none of the other do_*() command methods match.
+    def default(self, arg):
+        self.say('I do not understand that command. Type "help" for a list of commands.')
+
+    def emptyline(self):
+        pass
+
+    def precmd(self, line):
+        # clear_screen()
+        return line
+
+    def postcmd(self, stop, line):
+        if self.batch and self.stdout.tell() >= self.BATCH_BUFFER:
+            self.flush()
+        if not stop and self.gs.game_over():
+            self.say('You won!' if self.gs.won else 'You lost.')
+            return True
+        return stop
+
+    def postloop(self):
+        self.flush()
+
+    def do_quit(self, arg):
+        """Quit the game."""
+        return True # this exits the Cmd application loop in TextAdventureCmd.cmdloop()
+
+    def do_EOF(self, arg):
+        """Quit the game at the end of the commands."""
+        return True
+
+    def act(self, *action):
+        """
+        Plays an action for the current player like engine.apply_action,
+        printing why it can't be played. Returns whether it was played.
+        """
+        before = self.gs.player_turn
+        try:
+            ended = engine.apply_action(self.gs, action)
+        except ValueError as msg:
+            self.say(' '.join(str(msg).split()))
+            return False
+        if ended and not self.gs.game_over():
+            self.show_turn(before)
+        return True
+
+    def show_turn(self, before):
+        """
+        Prints the board after the turn of player `before` has ended
+        """
+        if self.render == 'full':
+            print_end_turn(self.gs, self.stdout)
+        elif self.render == 'diff':
+            lines = board_lines(self.gs)
+            self.say("Player {0}'s turn is over:".format(before))
+            print_board_changes(self.lines, lines, self.stdout)
+            self.lines = lines
+
+    """
+    These are the commands used to control the current player
+    """
+    def do_drive(self, loc):
+        """Drive to a connected location"""
+        if self.act('drive', loc):
+            self.say("You're now at {0}.".format(self.gs.current_player().location))
+
+    def do_direct_flight(self, loc):
+        """Fly to the city of a card in your hand, discarding it"""
+        self.act('direct_flight', loc)
+
+    def do_charter_flight(self, loc):
+        """Fly anywhere, discarding the card of the city you're in"""
+        self.act('charter_flight', loc)
+
+    def do_shuttle_flight(self, loc):
+        """Fly from a research station to another one"""
+        self.act('shuttle_flight', loc)
+
+    def do_build_research_station(self, arg):
+        """Build a research station, naming one to move when all 6 are built"""
+        self.act('build_research_station', *([arg] if arg else []))
+
+    def do_treat_disease(self, arg):
+        """Remove a disease cube of a color, the color of the city by default"""
+        self.act('treat_disease', arg)
+
+    def do_share_knowledge(self, arg):
+        """share_knowledge give|take <player> <city>: Share a city card"""
+        words = arg.split(maxsplit=2)
+        if len(words) != 3 or not words[1].isdigit():
+            self.say('Usage: share_knowledge give|take <player> <city>')
+            return
+        if int(words[1]) not in self.gs.player:
+            self.say("There isn't a player {0}".format(words[1]))
+            return
+        self.act('share_knowledge', words[0], int(words[1]), words[2])
+
+    def do_discover_cure(self, arg):
+        """discover_cure <color> <city>, <city>, ...: Discovers a cure, if possible."""
+        color, _, cards = arg.partition(' ')
+        self.act('discover_cure', color, [c.strip() for c in cards.split(',') if c.strip()])
+
+    def do_end_turn(self, arg):
+        """Ends turn"""
+        self.act('end_turn')
+
+    def do_connections(self, city=''):
+        """Prints the current connections the current player is in, or for a city"""
+        if city:
+            try:
+                self.say(self.gs.cities[city].connections)
+            except:
+                self.say("I can't find the city '{0}'. :(".format(city))
+
+        else:
+            self.say(self.gs.cities[self.gs.current_player().location].connections)
+
+    def do_whereami(self, arg):
+        """Prints the current location"""
+        self.say(self.gs.current_player().location)
+
+    def help_combat(self):
+        self.say('Combat is not implemented in this program.')
+
+def main(argv=None):
+
+    """
+    Sets up conditions for game
+    """
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['simulate']:
+        # headless tournament, see simulate.py
+        import simulate
+        return simulate.main(argv[1:])
+    if argv[:1] == ['sweep']:
+        # win rates over players, difficulties, roles and agents, see sweep.py
+        import sweep
+        return sweep.main(argv[1:])
+    if argv[:1] == ['serve']:
+        # game server for remote agents, see server.py
+        import server
+        return server.main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="The board game Pandemic made in Python.",
+                                     epilog="""Run 'pandemic simulate -h' to play headless
+                                     tournaments, 'pandemic sweep -h' to sweep win rates
+                                     and 'pandemic serve -h' to host games.
+                                     Made by unnamedplay-r, August 2017:\n
+                                     github.com/unnamedplay-r""",
+                                     prog='pandemic')
+    parser.add_argument("players", help="the number of players",
+                        type=int, choices=[2, 3, 4])
+    parser.add_argument("difficulty",
+                        help="""the difficulty of the game corresponding to the
+                        number of epidemic cards in the player deck""",
+                        type=int, choices=[4, 5, 6])
+    parser.add_argument("--verbose", help="increase output verbosity", type=int, choices=[1, 2])
+    parser.add_argument('--version', action='version', version='%(prog)s 1.0')
+    parser.add_argument("--script", metavar="PATH",
+                        help="""play the commands in PATH, or stdin for '-', without
+                        prompting and with buffered output""")
+    parser.add_argument("--render", help="what to print after each turn of a script",
+                        choices=['full', 'diff', 'none'], default='full')
+    parser.add_argument("--seed", help="seed of the game, for replaying scripts", type=int)
+    import profiling
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # check for optionals
+    logging.basicConfig(stream=sys.stderr) # , level=logging.DEBUG
+    if args.verbose == 1:
+        print("Verbose logging turned on.\n")
+        game.logger.setLevel('INFO')
+    elif args.verbose == 2:
+        print("Verbose logging turned on.\n")
+        game.logger.setLevel('DEBUG')
+
+    with profiling.session(args):
+        if args.script:
+            # scripted games are quiet, the command loop prints what render asks for
+            gs = game.clean_setup(args.players, args.difficulty,
+                                  game.GameState(quiet=True, seed=args.seed))
+            # stdin is left open, only a script opened here is closed
+            script = contextlib.nullcontext(sys.stdin) if args.script == '-' \
+                else open(args.script)
+            with script as script:
+                PandemicCmd(gs, stdin=script, batch=True, render=args.render).cmdloop()
+            return
+
+        # create clean board
+        clear_screen()
+        gs = game.clean_setup(args.players, args.difficulty, game.GameState(seed=args.seed))
+
+        # start the loop
+        PandemicCmd(gs).cmdloop()
+        print('\nThanks for playing!')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Lets the tests in tests/ import the game's modules, which live at the top
+of the repository rather than in a package
+"""
@@ -0,0 +1,215 @@
+"""
+Headless engine for playing games of Pandemic without a terminal
+
+Nothing in here prints or reads from the screen, so it can be used as an
+environment for training agents. A game is driven through `PandemicEnv`
+with `reset` and `step`, and whole batches of games are played by
+`run_batch`, which streams a `GameResult` for every finished game.
+
+`VecEnv` steps many games in lockstep so their observations can be batched.
+
+Actions are tuples of the `Player` method name followed by its arguments:
+  ('drive', 'chicago')
+  ('treat_disease', 'blue')
+  ('discover_cure', 'blue', ['atlanta', 'chicago', ...])
+  ('end_turn',)
+
+or an action number from actions.py, whose legal_actions and action_mask
+give what the current player can do.
+"""
+
+import random
+from collections import namedtuple
+
+import actions
+import game
+
+# the Player methods that can be used as actions
+PLAYER_ACTIONS = {'drive',
+                  'direct_flight',
+                  'charter_flight',
+                  'shuttle_flight',
+                  'build_research_station',
+                  'treat_disease',
+                  'share_knowledge',
+                  'discover_cure'}
+END_TURN = ('end_turn',)
+
+GameResult = namedtuple('GameResult', ['won', 'turns', 'actions', 'outbreaks', 'cures', 'roles'])
+
+class PandemicEnv:
+
+    """
+    A single headless game with a step/reset interface
+
+    Games are made in fast mode unless fast is False, so the engine doesn't
+    log even when the logger is turned up. Roles are dealt at random unless
+    given, see game.clean_setup.
+    """
+
+    def __init__(self, players=2, difficulty=4, fast=True, roles=None):
+        self.players = players
+        self.difficulty = difficulty
+        self.fast = fast
+        self.roles = roles
+        self.gs = None
+        self.turns = 0
+        self.actions = 0
+
+    def reset(self, seed=None):
+        """
+        Starts a new game and returns the game state
+        """
+        self.gs = game.clean_setup(self.players, self.difficulty,
+                                   game.GameState(quiet=True, seed=seed, fast=self.fast),
+                                   self.roles)
+        self.turns = 0
+        self.actions = 0
+        return self.gs
+
+    def step(self, action):
+        """
+        Plays an action for the current player. The turn is ended once the
+        player runs out of actions.
+
+        Returns (state, reward, done) where reward is 1 for a win, -1 for a
+        loss and 0 otherwise. Illegal actions raise a ValueError.
+        """
+        gs = self.gs
+        if isinstance(action, int):
+            action = actions.decode(gs, action)
+
+        ended = apply_action(gs, action)
+        self.actions += action[0] != 'end_turn'
+        self.turns += ended
+
+        if gs.won:
+            return gs, 1, True
+        if gs.lost:
+            return gs, -1, True
+        return gs, 0, False
+
+    def result(self):
+        """
+        Summarises the current game
+        """
+        gs = self.gs
+        return GameResult(won=gs.won,
+                          turns=self.turns,
+                          actions=self.actions,
+                          outbreaks=gs.outbreaks,
+                          cures=sum(1 for v in gs.cures.values() if v),
+                          roles=tuple(gs.player[pn].role for pn in sorted(gs.player)))
+
+class VecEnv:
+
+    """
+    Steps k independent games in lockstep. A game that finishes is recorded
+    in `results` and replaced by a new one, so every step has k live games.
+    """
+
+    def __init__(self, k, players=2, difficulty=4):
+        self.envs = [PandemicEnv(players, difficulty) for _ in range(k)]
+        self.results = []
+
+    def reset(self):
+        """
+        Starts k new games and returns their game states
+        """
+        return [env.reset() for env in self.envs]
+
+    def step(self, actions):
+        """
+        Plays one action in each game, returns lists of
+        (states, rewards, dones) in the order of the games
+        """
+        states, rewards, dones = [], [], []
+        for env, action in zip(self.envs, actions):
+            gs, reward, done = env.step(action)
+            if done:
+                self.results.append(env.result())
+                gs = env.reset()
+            states.append(gs)
+            rewards.append(reward)
+            dones.append(done)
+        return states, rewards, dones
+
+class RandomPolicy:
+
+    """
+    Picks uniformly between driving, treating diseases and curing
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def __call__(self, gs):
+        player = gs.current_player()
+        board = gs.board
+        loc = player.loc
+
+        moves = [('drive', board.names[n]) for n in board.neighbours[loc]]
+        moves += [('treat_disease', color) for c, color in enumerate(game.COLORS)
+                  if gs.cubes[loc * 4 + c]]
+
+        if gs.stations >> loc & 1:
+            for c, color in enumerate(game.COLORS):
+                cards = player.hand & board.color_masks[c]
+                if not gs.cures[color] and bin(cards).count('1') >= 5:
+                    moves.append(('discover_cure', color,
+                                  [board.names[n] for n in range(len(board)) if cards >> n & 1]))
+
+        return self.random.choice(moves)
+
+def apply_action(gs, action):
+    """
+    Plays an action for the current player of a game, ending the turn once
+    the player runs out of actions. Returns whether the turn was ended.
+
+    Search agents can use this on forks of a game, see GameState.fork.
+    """
+    if isinstance(action, int):
+        action = actions.decode(gs, action)
+
+    name = action[0]
+    if name == 'end_turn':
+        gs.end_turn()
+        return True
+    if name in PLAYER_ACTIONS:
+        getattr(gs.current_player(), name)(*action[1:])
+        if not gs.game_over() and gs.current_player().actions_left <= 0:
+            gs.end_turn()
+            return True
+        return False
+    raise ValueError("I don't know the action '{0}'".format(name))
+
+def game_seed(seed, index):
+    """
+    Derives the seed of the index-th game from a master seed, so a batch
+    plays the same games however it is split up
+    """
+    # imported here, as hashlib loads OpenSSL, which takes longer than
+    # importing the engine and isn't needed by games that aren't seeded
+    from hashlib import blake2b
+    digest = blake2b('{0}:{1}'.format(seed, index).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def play_game(env, policy, seed=None):
+    """
+    Plays a game to the end with a policy, a callable taking the game
+    state and returning an action
+    """
+    gs = env.reset(seed)
+    done = False
+    while not done:
+        gs, _, done = env.step(policy(gs))
+    return env.result()
+
+def run_batch(n, policy, players=2, difficulty=4, seed=None, start=0, roles=None):
+    """
+    Plays n games, yielding the result of each one as it finishes. With a
+    seed, game i of the batch is seeded by game_seed(seed, start + i).
+    """
+    env = PandemicEnv(players, difficulty, roles=roles)
+    for i in range(start, start + n):
+        yield play_game(env, policy, None if seed is None else game_seed(seed, i))
@@ -3,36 +3,56 @@ This script builds a game of Pandemic
 
 use this to open this script in the interactive shell:
 exec( open( 'game.py', 'r' ).read() )
+
+This is the engine alone, which is all headless games need. The terminal
+game is in cli.py, and is what `python game.py` runs.
 """
 
-import argparse
-import cmd
-import csv
-import logging
+import functools
+import itertools
 import os
 import random
-import sys
-import textwrap
+import zlib
+from array import array
+from collections import deque, namedtuple
+from collections.abc import Mapping, MutableMapping
+
+import zobrist
 
 # LOGGER
-logging.basicConfig(stream=sys.stderr) # , level=logging.DEBUG
-logger = logging.getLogger(__name__)
-
-# SCREEN
-SCREEN_WIDTH = 80
-LOGO = """
-|||||||||||||||||||||||||||||||||||
-||                               ||
-||  |¯_) /\ |\ ||¯¯\|_¯|\/||/¯¯  ||
-||  |   /--\| \||__/|__|  ||\__  ||
-||                               ||
-|||||||||||||||||||||||||||||||||||
-"""
+class _Logger:
+
+    """
+    Stands in for the logger of this module until it is first used, so
+    games that never log don't import logging
+    """
+
+    def __getattr__(self, name):
+        global logger
+        import logging
+        logger = logging.getLogger(__name__)
+        return getattr(logger, name)
+
+logger = _Logger()
+# the levels of logging, without importing it
+DEBUG = 10
+INFO = 20
 
 # GAME ENGINE
+CITIES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities.csv')
+BOARD_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'board_data.py')
 CITY_CARDS = 48
+# the order disease cubes are stored in for each city
+COLORS = ('red', 'blue', 'black', 'yellow')
+COLOR_INDEX = {color: i for i, color in enumerate(COLORS)}
 EPIDEMIC = 'epidemic'
 HAND_LIMIT = 7
+ACTIONS_PER_TURN = 4
+MAX_CUBES = 3 # per city and color, one more causes an outbreak
+CUBES_PER_COLOR = 24
+OUTBREAK_LIMIT = 8 # the game is lost on this many outbreaks
+# infection rate for each position of the infection rate track
+INFECTION_RATES = [2, 2, 2, 3, 3, 4, 4]
 ROLES = ['contingency planner',
          'operations expert',
          'dispatcher',
@@ -46,27 +66,142 @@ EVENT_CARDS = ['government grant',
                'airlift',
                'forecast']
 
-gs = {} # holds the global game state
+# engine events, (kind, city, color, cubes) with the city and color by number
+INFECTION = 0 # cubes were added to a city
+OUTBREAK = 1 # a city outbroke, cubes is the outbreak count after it
+EPIDEMIC_CITY = 2 # an epidemic hit a city, cubes is 0
+PLAYER_DRAW = 3 # (kind, player, card number, 0), a player card was drawn
+INFECTION_DRAW = 4 # an infection card was drawn, cubes is 0
+
+# the parts of a city that never change during a game
+CityInfo = namedtuple('CityInfo', ['name', 'color', 'population', 'connections'])
+
+class Board:
+
+    """
+    The map shared read-only by every game
+
+    Cities are numbered in the order of the cities file. Connections are
+    kept as tuples of city numbers and as bitmasks, where bit n is set when
+    city n is connected.
+    """
+
+    __slots__ = ('cities', 'names', 'index', 'colors', 'color_masks', 'neighbours', 'adjacency',
+                 'card_ids', 'card_names', 'infection_ids')
+
+    def __init__(self, cities):
+        self.cities = tuple(cities)
+        self.names = tuple(info.name for info in self.cities)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.colors = tuple(COLOR_INDEX[info.color] for info in self.cities)
+        self.color_masks = tuple(sum(1 << i for i, c in enumerate(self.colors) if c == color)
+                                 for color in range(len(COLORS)))
+        self.neighbours = tuple(tuple(self.index[name] for name in info.connections)
+                                for info in self.cities)
+        self.adjacency = tuple(sum(1 << n for n in neighbours) for neighbours in self.neighbours)
+        # numbers for every player card, cities first
+        self.card_ids = dict(self.index)
+        for card in EVENT_CARDS + [EPIDEMIC]:
+            self.card_ids[card] = len(self.card_ids)
+        self.card_names = tuple(self.card_ids)
+        # infection cards are (city name, color)
+        self.infection_ids = {(info.name, info.color): i for i, info in enumerate(self.cities)}
+
+    def __len__(self):
+        return len(self.cities)
+
+    def mask(self, names):
+        """
+        Returns the bitmask of the given cities, anything that isn't a city
+        (like event cards) is left out
+        """
+        mask = 0
+        for name in names:
+            if name in self.index:
+                mask |= 1 << self.index[name]
+        return mask
+
+class DiseaseCubes(MutableMapping):
+
+    """
+    The disease cubes of a city by color, a view onto GameState.cubes
+    """
+
+    __slots__ = ('gs', 'index')
+
+    def __init__(self, gs, index):
+        self.gs = gs
+        self.index = index
+
+    def __getitem__(self, color):
+        return self.gs.cubes[self.index * 4 + COLOR_INDEX[color]]
+
+    def __setitem__(self, color, cubes):
+        self.gs.set_cubes(self.index, COLOR_INDEX[color], cubes)
+
+    def __delitem__(self, color):
+        raise TypeError("Disease cubes can't be removed, set them to 0")
+
+    def __iter__(self):
+        return iter(COLORS)
+
+    def __len__(self):
+        return len(COLORS)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 class City:
 
     """
     Foundation class of a city
+
+    A city is a view onto the arrays of a game: the name, color, population
+    and connections come from the shared Board, and the disease cubes and
+    research station from the GameState.
     """
 
-    def __init__(self, data):
-        self.name = data[0]
-        self.color = data[1]
-        self.population = data[2]
-        self.connections = data[3]
-        self.disease_cubes = {
-            'red' : 0,
-            'blue' : 0,
-            'black' : 0,
-            'yellow' : 0
-        }
-        self.pawns = []
-        self.research_station = False
+    __slots__ = ('gs', 'index')
+
+    def __init__(self, gs, index):
+        self.gs = gs
+        self.index = index
+
+    @property
+    def info(self):
+        return self.gs.board.cities[self.index]
+
+    @property
+    def name(self):
+        return self.info.name
+
+    @property
+    def color(self):
+        return self.info.color
+
+    @property
+    def population(self):
+        return self.info.population
+
+    @property
+    def connections(self):
+        return self.info.connections
+
+    @property
+    def disease_cubes(self):
+        return DiseaseCubes(self.gs, self.index)
+
+    @property
+    def research_station(self):
+        return bool(self.gs.stations >> self.index & 1)
+
+    @research_station.setter
+    def research_station(self, station):
+        self.gs.set_research_station(self.index, station)
+
+    @property
+    def pawns(self):
+        return [pn for pn, player in self.gs.player.items() if player.loc == self.index]
 
     def __repr__(self):
         # need to fix indenting, but this works
@@ -82,47 +217,245 @@ class City:
                     rstation=self.research_station, pop=self.population)
         return text
 
+class CityMap(Mapping):
+
+    """
+    The cities of a game by name, handing out City views on demand
+    """
+
+    __slots__ = ('gs',)
+
+    def __init__(self, gs):
+        self.gs = gs
+
+    def __getitem__(self, name):
+        return City(self.gs, self.gs.board.index[name])
+
+    def __contains__(self, name):
+        return name in self.gs.board.index
+
+    def __iter__(self):
+        return iter(self.gs.board.names)
+
+    def __len__(self):
+        return len(self.gs.board)
+
+class Deck:
+
+    """
+    A pile of cards with O(1) draws from the top and the bottom
+
+    The top of the deck is the left end of a deque. Cards put on top
+    together make up a segment: which cards are in a segment is known, but
+    not their order. The piles with an epidemic each that make the player
+    deck are segments, and so are the infection cards an epidemic shuffles
+    back on top. `segments` holds their lengths from the bottom up, and
+    `segment_cards` looks into one without copying the deck.
+
+    The deck keeps a zobrist hash of its cards in `hash`. Cards are keyed
+    by their number (from `ids`) and slot, where the bottom card is in slot
+    `base` and slots count up to the top, so a draw from either end only
+    changes the key of the card drawn. A pile whose order doesn't matter,
+    like a discard pile, keys cards by number alone.
+    """
+
+    __slots__ = ('cards', 'segments', 'base', 'hash', 'keys', 'ids', 'ordered')
+
+    def __init__(self, cards=(), keys=None, ids=None, ordered=True):
+        self.cards = deque(cards)
+        self.segments = [len(self.cards)] if self.cards and ordered else []
+        self.base = 0
+        self.keys = keys
+        self.ids = ids
+        self.ordered = ordered
+        self.rehash()
+
+    @classmethod
+    def from_segments(cls, piles, keys=None, ids=None):
+        """
+        Stacks piles of cards into a deck, the first pile on top
+        """
+        deck = cls(itertools.chain.from_iterable(piles), keys, ids)
+        deck.segments = [len(pile) for pile in reversed(piles) if pile]
+        return deck
+
+    def _key(self, card, slot):
+        if self.ordered:
+            return self.keys[self.ids[card]][slot]
+        return self.keys[self.ids[card]]
+
+    def rehash(self):
+        """
+        Works out the hash of the deck from scratch
+        """
+        h = 0
+        if self.keys is not None:
+            for slot, card in enumerate(reversed(self.cards), self.base):
+                h ^= self._key(card, slot)
+        self.hash = h
+        return h
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        """
+        Goes through the cards from the top
+        """
+        return iter(self.cards)
+
+    def __repr__(self):
+        return 'Deck({0})'.format(list(self.cards))
+
+    def draw(self):
+        """
+        Takes the top card
+        """
+        card = self.cards.popleft()
+        if self.keys is not None:
+            self.hash ^= self._key(card, self.base + len(self.cards))
+        if self.ordered:
+            self.segments[-1] -= 1
+            if not self.segments[-1]:
+                self.segments.pop()
+        return card
+
+    def draw_bottom(self):
+        """
+        Takes the bottom card
+        """
+        card = self.cards.pop()
+        if self.keys is not None:
+            self.hash ^= self._key(card, self.base)
+        if self.ordered:
+            self.base += 1
+            self.segments[0] -= 1
+            if not self.segments[0]:
+                self.segments.pop(0)
+        return card
+
+    def put_on_top(self, cards):
+        """
+        Puts cards on top as one segment, the first of them on top
+        """
+        slot = self.base + len(self.cards) + len(cards)
+        if self.keys is not None:
+            for card in cards:
+                slot -= 1
+                self.hash ^= self._key(card, slot)
+        self.cards.extendleft(reversed(cards))
+        if self.ordered and cards:
+            self.segments.append(len(cards))
+
+    def take_all(self):
+        """
+        Empties the deck, returning its cards from the top
+        """
+        cards = list(self.cards)
+        self.cards.clear()
+        self.segments = []
+        self.base = 0
+        self.hash = 0
+        return cards
+
+    def segment_cards(self, i):
+        """
+        Iterates over the cards of segment i, counted from the top
+        """
+        start = sum(self.segments[len(self.segments) - i:])
+        return itertools.islice(self.cards, start, start + self.segments[-1 - i])
+
+    def shuffle_segments(self, random):
+        """
+        Shuffles each segment on its own, keeping which cards it holds
+        """
+        cards = list(self.cards)
+        start = 0
+        for length in reversed(self.segments):
+            segment = cards[start:start + length]
+            random.shuffle(segment)
+            cards[start:start + length] = segment
+            start += length
+        self.cards = deque(cards)
+        self.rehash()
+
+    def state(self):
+        """
+        Everything about the deck that changes, as a tuple
+        """
+        return tuple(self.cards), tuple(self.segments), self.base, self.hash
+
+    def set_state(self, state):
+        cards, segments, self.base, self.hash = state
+        self.cards = deque(cards)
+        self.segments = list(segments)
+
+    def copy(self):
+        clone = Deck.__new__(Deck)
+        clone.cards = self.cards.copy()
+        clone.segments = self.segments[:]
+        clone.base = self.base
+        clone.hash = self.hash
+        clone.keys = self.keys
+        clone.ids = self.ids
+        clone.ordered = self.ordered
+        return clone
+
 class GameState:
 
     """
     Maintains the board state and controls the game state
     """
 
-    def __init__(self):
+    def __init__(self, quiet=False, seed=None, fast=False):
         """
-        Builds the board state
+        Builds the board state, games made with the same seed are shuffled
+        the same way. A fast game never logs from the engine, whatever the
+        level of the logger.
         """
 
+        # every shuffle in this game is drawn from here, see random. A game
+        # made without a seed gets a random one, so any game can be replayed
+        if seed is None:
+            seed = random.randrange(2**64)
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._random_state = None
+
         # Player tracking
         self.player = {} # stores information about each player
         self.player_turn = None
-        self.current_player = lambda: self.player[self.player_turn]
-        self.dt = lambda: self.cities[self.current_player().location].connections
 
         # controls
         self.difficulty = None # the number of epidemics shuffled into the player deck
         self.player_count = None
 
         # board state
-        self.cities = {} # will be loaded with city information by city_loader
-        self.research_stations = 1 # Atlanta initially
+        self.board = load_board()
+        self.cities = CityMap(self) # city views by name onto the arrays below
+        # disease cubes of every city, 4 per city in the order of COLORS
+        self.cubes = array('B', bytes(len(self.board) * len(COLORS)))
+        self.stations = 0 # bitmask of the cities with a research station
+        self.research_stations = 0 # how many there are, see set_research_station
+        # bitmasks per color of the cities with cubes of it, and with
+        # MAX_CUBES of it so the next cube causes an outbreak
+        self.infected = [0] * len(COLORS)
+        self.ready = [0] * len(COLORS)
         self.epidemic_cards_left = None
         self.event_cards_left = None
 
         # player deck
-        self.player_deck = []
-        self.player_discard_deck = []
-        self.pds = lambda: len(self.player_deck) # player_deck_size
-        self.pdds = lambda: len(self.player_discard_deck) # player_discard_deck_size
+        self.player_deck = Deck(keys=zobrist.PLAYER_DECK_KEYS, ids=self.board.card_ids)
+        self.player_discard_deck = Deck(keys=zobrist.PLAYER_DISCARD_KEYS,
+                                        ids=self.board.card_ids, ordered=False)
 
         # infection cards
-        self.infection_deck = []
-        self.infection_discard_deck = []
-        self.ids = lambda: len(self.infection_deck) # infection deck size
-        self.idds = lambda: len(self.infection_discard_deck) # infection discard deck size
+        self.infection_deck = Deck(keys=zobrist.INFECTION_DECK_KEYS, ids=self.board.infection_ids)
+        self.infection_discard_deck = Deck(keys=zobrist.INFECTION_DISCARD_KEYS,
+                                           ids=self.board.infection_ids, ordered=False)
 
-        # These numbers change based on the board state
-        self.cubes_in_storage = {'blue': 24, 'red': 24, 'yellow': 24, 'black': 24}
+        # cubes not on the board, kept up to date by set_cubes
+        self.cubes_in_storage = {color: CUBES_PER_COLOR for color in COLORS}
 
         # Current infection rate, and position of it
         self.infection_rate = 2
@@ -133,10 +466,345 @@ class GameState:
 
         # how many outbreaks are there?
         self.outbreaks = 0
+        self.outbreak_limit = OUTBREAK_LIMIT
 
-        # 0 = no cure, 1 = cure, 2 = eradicated
+        # 0 = no cure, 1 = cure, 2 = eradicated (cured with no cubes on the
+        # board), kept up to date by set_cure and set_cubes
         self.cures = {'red': 0, 'blue': 0, 'yellow': 0, 'black': 0}
 
+        # end of game
+        self.won = False
+        self.lost = False
+
+        # suppresses all terminal output, used when playing headless
+        self.quiet = quiet
+        self.fast = fast
+
+        # snapshots to go back to with undo
+        self.undo_log = []
+
+        # callbacks for the engine events of draws, epidemics and
+        # infections, see subscribe. emit is None while there aren't any so
+        # the engine only has one attribute to check.
+        self.subscribers = []
+        self.emit = None
+
+        # zobrist hash of everything above that changes, see rehash
+        self.hash = 0
+
+    @property
+    def random(self):
+        """
+        The random generator of this game. Forks and snapshots share its
+        state until the next shuffle, which is when it is copied.
+        """
+        if self._random is None:
+            self._random = random.Random.__new__(random.Random)
+            self._random.setstate(self._random_state)
+        return self._random
+
+    def _freeze_random(self):
+        """
+        Returns the state of the random generator, which is shared from now
+        on by whatever takes it
+        """
+        if self._random is not None:
+            self._random_state = self._random.getstate()
+            self._random = None
+        return self._random_state
+
+    def current_player(self):
+        return self.player[self.player_turn]
+
+    def dt(self):
+        return self.cities[self.current_player().location].connections
+
+    def pds(self):
+        return len(self.player_deck) # player_deck_size
+
+    def pdds(self):
+        return len(self.player_discard_deck) # player_discard_deck_size
+
+    def ids(self):
+        return len(self.infection_deck) # infection deck size
+
+    def idds(self):
+        return len(self.infection_discard_deck) # infection discard deck size
+
+    def game_over(self):
+        """
+        Whether the game has been won or lost
+        """
+        return self.won or self.lost
+
+    """
+    Snapshots
+      For search, a game can be forked into an independent copy, or saved
+      and restored in place. Both copy only what changes during a game: the
+      board and city names are shared, and so is the state of the random
+      generator until one of them shuffles.
+    """
+
+    def snapshot(self):
+        """
+        Returns everything that changes during a game as a tuple
+        """
+        return (bytes(self.cubes), self.stations, self.research_stations, self.player_turn,
+                tuple((p.loc, tuple(p.cards), p.hand, p.actions_left)
+                      for p in self.player.values()),
+                self.player_deck.state(), self.player_discard_deck.state(),
+                self.infection_deck.state(), self.infection_discard_deck.state(),
+                tuple(self.cubes_in_storage.values()), tuple(self.cures.values()),
+                tuple(self.infected), tuple(self.ready), self.infection_rate,
+                self.infection_rate_position, self.outbreaks,
+                self.epidemic_cards_left, self.won, self.lost, self.hash,
+                self._freeze_random())
+
+    def restore(self, snapshot):
+        """
+        Puts the game back to a snapshot taken from it
+        """
+        (cubes, self.stations, self.research_stations, self.player_turn, players,
+         player_deck, player_discard_deck, infection_deck, infection_discard_deck,
+         storage, cures, infected, ready, self.infection_rate, self.infection_rate_position,
+         self.outbreaks,
+         self.epidemic_cards_left, self.won, self.lost, self.hash,
+         self._random_state) = snapshot
+
+        self.cubes[:] = array('B', cubes)
+        for player, (player.loc, cards, player.hand, player.actions_left) in \
+                zip(self.player.values(), players):
+            player._cards = list(cards)
+        self.player_deck.set_state(player_deck)
+        self.player_discard_deck.set_state(player_discard_deck)
+        self.infection_deck.set_state(infection_deck)
+        self.infection_discard_deck.set_state(infection_discard_deck)
+        self.cubes_in_storage = dict(zip(self.cubes_in_storage, storage))
+        self.cures = dict(zip(self.cures, cures))
+        self.infected = list(infected)
+        self.ready = list(ready)
+        self._random = None
+
+    def checkpoint(self):
+        """
+        Saves the game so the next undo comes back here
+        """
+        self.undo_log.append(self.snapshot())
+
+    def undo(self):
+        """
+        Goes back to the last checkpoint
+        """
+        self.restore(self.undo_log.pop())
+
+    def fork(self):
+        """
+        Returns an independent copy of the game, without its undo log
+        """
+        clone = GameState.__new__(GameState)
+        clone.__dict__.update(self.__dict__)
+        clone.cities = CityMap(clone)
+        clone.cubes = self.cubes[:]
+        clone.player = {pn: player.fork(clone) for pn, player in self.player.items()}
+        clone.player_deck = self.player_deck.copy()
+        clone.player_discard_deck = self.player_discard_deck.copy()
+        clone.infection_deck = self.infection_deck.copy()
+        clone.infection_discard_deck = self.infection_discard_deck.copy()
+        clone.cubes_in_storage = self.cubes_in_storage.copy()
+        clone.cures = self.cures.copy()
+        clone.infected = self.infected[:]
+        clone.ready = self.ready[:]
+        clone._random = None
+        clone._random_state = self._freeze_random()
+        clone.undo_log = []
+        clone.subscribers = []
+        clone.emit = None
+        return clone
+
+    def rehash(self):
+        """
+        Works out the zobrist hash of the game from scratch: the cubes,
+        research stations, cures, outbreaks, infection rate, whose turn it
+        is, every player's actions left, location and hand, and the order
+        of every deck.
+        """
+        h = 0
+        for slot, cubes in enumerate(self.cubes):
+            h ^= zobrist.CUBE_KEYS[slot][cubes]
+        for city in range(len(self.board)):
+            if self.stations >> city & 1:
+                h ^= zobrist.STATION_KEYS[city]
+        for color, cure in self.cures.items():
+            h ^= zobrist.CURE_KEYS[COLOR_INDEX[color]][cure]
+        h ^= zobrist.OUTBREAK_KEYS[self.outbreaks]
+        h ^= zobrist.RATE_KEYS[self.infection_rate_position]
+        if self.player_turn:
+            h ^= zobrist.TURN_KEYS[self.player_turn]
+        for pn, player in self.player.items():
+            h ^= zobrist.ACTION_KEYS[pn][player.actions_key()]
+            h ^= zobrist.PAWN_KEYS[pn][player.loc]
+            for card in player.cards:
+                h ^= zobrist.HAND_KEYS[pn][self.board.card_ids[card]]
+        for deck in (self.player_deck, self.player_discard_deck,
+                     self.infection_deck, self.infection_discard_deck):
+            h ^= deck.rehash()
+
+        self.hash = h
+        return h
+
+    """
+    Board changes
+      Every change to the cubes, research stations and cures of the board
+      goes through these, cities and colors are given by number. Like the
+      deck changes below, they keep the zobrist hash up to date, and with
+      it the totals that would otherwise take a scan of the board: cubes in
+      storage, infected and ready, the number of research stations and
+      which cures are eradicated.
+    """
+
+    def set_cubes(self, city, color, cubes):
+        """
+        Sets the number of disease cubes of a color in a city, taking them
+        from storage or putting them back
+        """
+        slot = city * 4 + color
+        current = self.cubes[slot]
+        self.hash ^= zobrist.CUBE_KEYS[slot][current] ^ zobrist.CUBE_KEYS[slot][cubes]
+        self.cubes[slot] = cubes
+
+        name = COLORS[color]
+        storage = self.cubes_in_storage[name] - cubes + current
+        self.cubes_in_storage[name] = storage
+        bit = 1 << city
+        if cubes:
+            self.infected[color] |= bit
+        else:
+            self.infected[color] &= ~bit
+        if cubes >= MAX_CUBES:
+            self.ready[color] |= bit
+        else:
+            self.ready[color] &= ~bit
+
+        cure = self.cures[name]
+        if cure and cure != (2 if storage == CUBES_PER_COLOR else 1):
+            self.set_cure(name, 1)
+
+    def set_research_station(self, city, station=True):
+        """
+        Builds or removes the research station of a city
+        """
+        if bool(self.stations >> city & 1) != bool(station):
+            self.hash ^= zobrist.STATION_KEYS[city]
+            self.research_stations += 1 if station else -1
+        if station:
+            self.stations |= 1 << city
+        else:
+            self.stations &= ~(1 << city)
+
+    def set_cure(self, color, cure):
+        """
+        Sets a color to 0 = no cure or 1 = cure. A cured color is eradicated
+        (2) while it has no cubes on the board.
+        """
+        if cure and self.cubes_in_storage[color] == CUBES_PER_COLOR:
+            cure = 2
+        c = COLOR_INDEX[color]
+        self.hash ^= zobrist.CURE_KEYS[c][self.cures[color]] ^ zobrist.CURE_KEYS[c][cure]
+        self.cures[color] = cure
+
+    def cubes_on_board(self, color):
+        """
+        The number of cubes of a color on the board
+        """
+        return CUBES_PER_COLOR - self.cubes_in_storage[color]
+
+    """
+    Deck changes
+      These keep the zobrist hash up to date with the hashes of the decks.
+    """
+
+    def draw_player_card(self):
+        """
+        Takes the top card of the player deck
+        """
+        deck = self.player_deck
+        h = deck.hash
+        card = deck.draw()
+        self.hash ^= h ^ deck.hash
+        return card
+
+    def discard_player_card(self, card):
+        deck = self.player_discard_deck
+        h = deck.hash
+        deck.put_on_top((card,))
+        self.hash ^= h ^ deck.hash
+
+    def draw_infection_card(self, bottom=False):
+        """
+        Takes the top card of the infection deck, or the bottom one
+        """
+        deck = self.infection_deck
+        h = deck.hash
+        card = deck.draw_bottom() if bottom else deck.draw()
+        self.hash ^= h ^ deck.hash
+        return card
+
+    def discard_infection_card(self, card):
+        deck = self.infection_discard_deck
+        h = deck.hash
+        deck.put_on_top((card,))
+        self.hash ^= h ^ deck.hash
+
+    def intensify(self):
+        """
+        Shuffles the infection discard pile back on top of the infection deck
+        """
+        h = self.infection_deck.hash ^ self.infection_discard_deck.hash
+        cards = self.infection_discard_deck.take_all()
+        self.random.shuffle(cards)
+        self.infection_deck.put_on_top(cards)
+        self.hash ^= h ^ self.infection_deck.hash
+
+    def redeal(self, seed=None):
+        """
+        Shuffles the player and infection decks within their segments and
+        reseeds the random generator. What the players know is kept, only
+        the unseen order of the cards changes, so a fork can be redealt to
+        sample a different future of the game.
+        """
+        self._random = random.Random(seed)
+        self._random_state = None
+        for deck in (self.player_deck, self.infection_deck):
+            h = deck.hash
+            deck.shuffle_segments(self._random)
+            self.hash ^= h ^ deck.hash
+
+    """
+    Events
+      Engine events are tuples, see INFECTION and the kinds after it. They
+      are only made when something has subscribed to them, and are sent as
+      they happen: a draw or epidemic card comes before the infections and
+      outbreaks it causes.
+    """
+
+    def subscribe(self, callback):
+        """
+        Calls callback with every engine event from now on
+        """
+        self.subscribers.append(callback)
+        self.emit = callback if len(self.subscribers) == 1 else self._publish
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+        if not self.subscribers:
+            self.emit = None
+        elif len(self.subscribers) == 1:
+            self.emit = self.subscribers[0]
+
+    def _publish(self, event):
+        for callback in self.subscribers:
+            callback(event)
+
     """
     These are general actions players can make to impact the global state.
     """
@@ -146,7 +814,10 @@ class GameState:
         """
         self.draw_player_cards()
         # we + 1 at the end to ensure we're 1 indexed
-        self.player_turn += (self.player_turn + 1 % len(self.player)) + 1
+        self.hash ^= zobrist.TURN_KEYS[self.player_turn]
+        self.player_turn = self.player_turn % len(self.player) + 1
+        self.hash ^= zobrist.TURN_KEYS[self.player_turn]
+        self.current_player().set_actions_left(ACTIONS_PER_TURN)
         self.draw_infection_cards()
 
     def draw_player_cards(self):
@@ -156,12 +827,20 @@ class GameState:
 
         if len(self.player_deck) < 2:
             self.lose_game()
+            return
 
         # draws
-        draw1 = self.player_deck.pop(0)
-        draw2 = self.player_deck.pop(0)
+        draw1 = self.draw_player_card()
+        draw2 = self.draw_player_card()
 
-        print(draw1, draw2)
+        if not self.quiet:
+            print(draw1, draw2)
+
+        emit = self.emit
+        if emit is not None:
+            ids = self.board.card_ids
+            emit((PLAYER_DRAW, self.player_turn, ids[draw1], 0))
+            emit((PLAYER_DRAW, self.player_turn, ids[draw2], 0))
 
         # Check for any conditions
         if draw1 == EPIDEMIC:
@@ -172,70 +851,167 @@ class GameState:
             self.epidemic()
             draw2 = ''
 
-        if 2 + len(self.current_player().cards) > HAND_LIMIT:
-            # prompt user to pick a card to remove, including 1 just picked up
-            # or if there is an event card, can use it
-            pass
-
         # Save cards
+        player = self.current_player()
         if draw1:
-            self.current_player().cards.append(draw1)
+            player.add_card(draw1)
         if draw2:
-            self.current_player().cards.append(draw2)
+            player.add_card(draw2)
+
+        while len(player.cards) > HAND_LIMIT:
+            # TODO: prompt user to pick a card to remove, including 1 just
+            #       picked up or if there is an event card, can use it.
+            #       Until then the oldest cards are discarded.
+            card = player.cards[0]
+            player.remove_card(card)
+            self.discard_player_card(card)
 
     def draw_infection_cards(self):
-        # TODO: Make it pull out as many infection cards as the infection
-        #       rate specifies, and infect those cities, causing outbreaks
-        #       if needed.
-        pass
+        """
+        Pulls out as many infection cards as the infection rate specifies
+        and infects those cities
+        """
+        for _ in range(self.infection_rate):
+            if not self.infection_deck or self.game_over():
+                break
+            card = self.draw_infection_card()
+            self.discard_infection_card(card)
+            emit = self.emit
+            if emit is not None:
+                emit((INFECTION_DRAW, self.board.infection_ids[card], COLOR_INDEX[card[1]], 0))
+            # card[0] is city name, card[1] is city color
+            self.infect_city(card[0], card[1], 1)
 
 
     def infect_city(self, city, color='', cubes=1):
         """
-        Infects a city
+        Infects a city, the city outbreaks if it goes over MAX_CUBES. An
+        eradicated color isn't placed at all.
         """
 
-        if city in self.cities:
-            city = self.cities[city]
-        else:
+        index = self.board.index.get(city)
+        if index is None:
             raise ValueError('Can\'t find the city : {0}'.format(city))
 
-        logger.debug('Before Infection: %s : %s', city.name, city.disease_cubes)
+        debug = not self.fast and logger.isEnabledFor(DEBUG)
+        if debug:
+            logger.debug('Before Infection: %s : %s', city, self.cities[city].disease_cubes)
 
-        # print(city)
-        if color:
-            if city.disease_cubes[color] + cubes > 3:
-                self.outbreak(city, color)
-            else:
-                city.disease_cubes[color] += cubes
-        else:
-            if city.disease_cubes[city.color] + cubes > 3:
-                self.outbreak(city, city.color)
-            else:
-                city.disease_cubes[city.color] += cubes
+        color = color or self.board.cities[index].color
+        if self.cures[color] == 2:
+            return
+        c = COLOR_INDEX[color]
+        current = self.cubes[index * 4 + c]
+        added = min(cubes, MAX_CUBES - current)
 
-        logger.debug('After Infection : %s : %s', city.name, city.disease_cubes)
+        if added > self.cubes_in_storage[color]:
+            # ran out of disease cubes
+            self.lose_game(city, color)
+            return
+
+        if added:
+            self.set_cubes(index, c, current + added)
+            if self.emit is not None:
+                self.emit((INFECTION, index, c, added))
+
+        if current + cubes > MAX_CUBES:
+            self.outbreak(city, color)
+
+        if debug:
+            logger.debug('After Infection : %s : %s', city, self.cities[city].disease_cubes)
 
     def outbreak(self, city='', color=''):
         """
-        Causes an outbreak in a given city
+        Causes an outbreak in a given city, and the chain reaction from it.
+
+        The chain is resolved in waves rather than by recursion: every city
+        of a wave adds a cube to each of its neighbours, and the neighbours
+        pushed over MAX_CUBES make up the next wave. A city outbreaks at
+        most once per chain and gets no more cubes after it has. The chain
+        stops as soon as the game is lost. An eradicated color doesn't
+        outbreak.
         """
-        # TODO
-        pass
+        index = self.board.index[city]
+        color = color or self.board.cities[index].color
+        if self.cures[color] == 2:
+            return
+        c = COLOR_INDEX[color]
+        neighbours = self.board.neighbours
+        cubes = self.cubes
+        emit = self.emit
+
+        outbroken = 1 << index
+        wave = [index]
+        while wave:
+            # cubes each neighbour gets from this wave
+            hits = {}
+            for o in wave:
+                self.hash ^= zobrist.OUTBREAK_KEYS[self.outbreaks]
+                self.outbreaks += 1
+                self.hash ^= zobrist.OUTBREAK_KEYS[self.outbreaks]
+                if emit is not None:
+                    emit((OUTBREAK, o, c, self.outbreaks))
+                if self.outbreaks >= self.outbreak_limit:
+                    self.lose_game(self.board.names[o], color)
+                    return
+                for n in neighbours[o]:
+                    if not outbroken >> n & 1:
+                        hits[n] = hits.get(n, 0) + 1
+
+            wave = []
+            for n, count in hits.items():
+                current = cubes[n * 4 + c]
+                added = min(count, MAX_CUBES - current)
+                if added > self.cubes_in_storage[color]:
+                    self.lose_game(self.board.names[n], color)
+                    return
+                if added:
+                    self.set_cubes(n, c, current + added)
+                    if emit is not None:
+                        emit((INFECTION, n, c, added))
+                if current + count > MAX_CUBES:
+                    outbroken |= 1 << n
+                    wave.append(n)
 
     def epidemic(self, city='', color=''):
         """
-        Causes an epidemic in a given city
+        Causes an epidemic in a given city, the bottom card of the infection
+        deck is used if no city is given
+        """
+        self.epidemic_cards_left -= 1
+
+        # increase
+        self.hash ^= zobrist.RATE_KEYS[self.infection_rate_position]
+        self.infection_rate_position = min(self.infection_rate_position + 1,
+                                           len(INFECTION_RATES))
+        self.hash ^= zobrist.RATE_KEYS[self.infection_rate_position]
+        self.infection_rate = INFECTION_RATES[self.infection_rate_position - 1]
+
+        # infect
+        if not city:
+            city, color = self.draw_infection_card(bottom=True)
+        color = color or self.cities[city].color
+        emit = self.emit
+        if emit is not None:
+            emit((EPIDEMIC_CITY, self.board.index[city], COLOR_INDEX[color], 0))
+        self.infect_city(city, color, 3)
+        self.discard_infection_card((city, color))
+
+        # intensify
+        self.intensify()
+
+    def win_game(self):
         """
-        # TODO
-        pass
+        Every disease has been cured
+        """
+        self.won = True
 
     def lose_game(self, city='', color=''):
         """
         Shows last remainding cards and any screens
         """
-        # TODO
-        pass
+        # TODO: screens
+        self.lost = True
 
     def where_to(self):
         """
@@ -247,13 +1023,22 @@ class Player:
 
     """
     Maintains the state of each character and controls
+
+    The location is kept as a city number in `loc` and the city cards in
+    hand as a bitmask in `hand`. Cards should only be changed through
+    add_card and remove_card so `hand` stays in step with `cards`.
     """
 
-    def __init__(self, location='atlanta', cards=[], role='', actions_left=4, turn_position=1):
+    def __init__(self, location='atlanta', cards=[], role='', actions_left=4, turn_position=1,
+                 gs=None, number=None):
+        self.gs = None
+        self.board = load_board()
         self.location = location
         self.cards = cards
         self.role = role
         self.actions_left = actions_left
+        self.gs = gs # the game this player belongs to
+        self.number = number # the key of this player in GameState.player
 
         """ TODO : Describe the turn positions & logic for them
         - 1 = waiting
@@ -261,6 +1046,68 @@ class Player:
         """
         self.turn_position = turn_position
 
+    def fork(self, gs):
+        """
+        Returns a copy of this player for a forked game
+        """
+        clone = Player.__new__(Player)
+        clone.__dict__.update(self.__dict__)
+        clone.gs = gs
+        clone._cards = self._cards[:]
+        return clone
+
+    @property
+    def location(self):
+        return self.board.names[self.loc]
+
+    @location.setter
+    def location(self, name):
+        if name not in self.board.index:
+            raise ValueError('Can\'t find the city : {0}'.format(name))
+        if self.gs is None:
+            self.loc = self.board.index[name]
+        else:
+            self.move_to(self.board.index[name])
+
+    @property
+    def cards(self):
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards):
+        if self.gs is not None:
+            self.gs.hash ^= self._hand_hash()
+        self._cards = list(cards)
+        self.hand = self.board.mask(self._cards)
+        if self.gs is not None:
+            self.gs.hash ^= self._hand_hash()
+
+    def _hand_hash(self):
+        h = 0
+        for card in self._cards:
+            h ^= zobrist.HAND_KEYS[self.number][self.board.card_ids[card]]
+        return h
+
+    def move_to(self, city):
+        """
+        Puts the pawn on a city by number
+        """
+        keys = zobrist.PAWN_KEYS[self.number]
+        self.gs.hash ^= keys[self.loc] ^ keys[city]
+        self.loc = city
+
+    def actions_key(self):
+        """
+        The actions left, within the range of the zobrist keys
+        """
+        return min(max(self.actions_left, 0), ACTIONS_PER_TURN)
+
+    def set_actions_left(self, actions_left):
+        keys = zobrist.ACTION_KEYS[self.number]
+        self.gs.hash ^= keys[self.actions_key()]
+        self.actions_left = actions_left
+        self.gs.hash ^= keys[self.actions_key()]
+
     """
     Movement Actions
       These functions control how the player moves from space to space. They
@@ -274,20 +1121,26 @@ class Player:
         """
         This drives a player to a location
         """
+        to = self.board.index.get(_to)
         # is it connected to the city i'm in?
-        if _to in gs.cities[self.location].connections:
-            self.location = _to
+        if to is not None and self.board.adjacency[self.loc] >> to & 1:
+            self.move_to(to)
             self.reduce_action()
         else:
-            return "{0} isn\'t connected to {1}.".format(self.location, _to)
+            raise ValueError("{0} isn't connected to {1}.".format(self.location, _to))
 
     def charter_flight(self, _to):
         """
         """
         # is your location in any of the cards you're holding?
-        if self.location in self.cards:
-            self.remove_card(_to)
-            self.location = _to
+        if self.hand >> self.loc & 1:
+            to = self.board.index.get(_to)
+            if to is None:
+                raise ValueError('Can\'t find the city : {0}'.format(_to))
+            if to == self.loc:
+                raise ValueError("You're already in {0}".format(_to))
+            self.remove_card(self.location)
+            self.move_to(to)
             self.reduce_action()
         else:
             raise ValueError("You don't have {0} to use charter flight.".format(self.location))
@@ -295,10 +1148,13 @@ class Player:
     def direct_flight(self, _to):
         """
         """
+        to = self.board.index.get(_to)
         # is desired location in any of the cards you're holding?
-        if _to in self.cards:
+        if to == self.loc:
+            raise ValueError("You're already in {0}".format(_to))
+        if to is not None and self.hand >> to & 1:
             self.remove_card(_to)
-            self.location = _to
+            self.move_to(to)
             self.reduce_action()
         else:
             raise ValueError("You don't have {0} to use direct flight.".format(_to))
@@ -306,11 +1162,14 @@ class Player:
     def shuttle_flight(self, _to):
         """
         """
+        to = self.board.index.get(_to)
 
         # does my location and the desired location have a research station?
-        if gs.cities[self.location].research_station:
-            if gs.cities[_to].research_station:
-                self.location = _to
+        if self.gs.stations >> self.loc & 1:
+            if to == self.loc:
+                raise ValueError("You're already in {0}".format(_to))
+            if to is not None and self.gs.stations >> to & 1:
+                self.move_to(to)
                 self.reduce_action()
             else:
                 raise ValueError("{0} doesn't have a research station".format(_to))
@@ -328,47 +1187,49 @@ class Player:
         """
         """
 
-        for card in self.cards:
-            if card == self.location:
-                if gs.cities[self.location].research_station != True:
-                    if gs['research_stations'] < 6:
-                        gs.cities[self.location].research_station = True
-                        self.remove_card(self.location)
-                        self.reduce_action()
-                    elif move_from:
-                        gs.cities[move_from].research_station = False
-                        gs.cities[self.location].research_station = True
-                        self.remove_card(self.location)
-                        self.reduce_action()
-                    else:
-                        raise ValueError("""This game has reached it's max limit of research
-                                         stations. Give me a location to remove a research
-                                         station.""")
+        if self.hand >> self.loc & 1:
+            if not self.gs.stations >> self.loc & 1:
+                if self.gs.research_stations < 6:
+                    self.gs.set_research_station(self.loc)
+                    self.remove_card(self.location)
+                    self.reduce_action()
+                elif move_from:
+                    # the station is moved, so there are never more than 6
+                    if move_from not in self.board.index:
+                        raise ValueError("I can't find the city '{0}'".format(move_from))
+                    if not self.gs.stations >> self.board.index[move_from] & 1:
+                        raise ValueError("{0} doesn't have a research station".format(move_from))
+                    self.gs.set_research_station(self.board.index[move_from], False)
+                    self.gs.set_research_station(self.loc)
+                    self.remove_card(self.location)
+                    self.reduce_action()
                 else:
-                    raise ValueError("This location already has a research station")
+                    raise ValueError("""This game has reached it's max limit of research
+                                     stations. Give me a location to remove a research
+                                     station.""")
             else:
-                raise ValueError("""You don't have the {0} city card to build a research station
-                                 here""".format(self.location))
+                raise ValueError("This location already has a research station")
+        else:
+            raise ValueError("""You don't have the {0} city card to build a research station
+                             here""".format(self.location))
 
     def treat_disease(self, color=''):
         """
         """
-        # can I treat?
-        # _total = 0
-        # for i in cities[self.location].disease_cubes:
-        #     if i > 0:
-        #         break
-
+        if color and color not in COLOR_INDEX:
+            raise ValueError("There isn't a {0} disease".format(color))
         if color:
-            if gs.cities[self.location].disease_cubes[color] > 1:
-                gs.cities[self.location].disease_cubes[color] -= 1
+            slot = self.loc * 4 + COLOR_INDEX[color]
+            if self.gs.cubes[slot] > 0:
+                self.gs.set_cubes(self.loc, COLOR_INDEX[color], self.gs.cubes[slot] - 1)
                 self.reduce_action()
             else:
                 raise ValueError("There aren't any {0} disease cubes here".format(color))
         else:
-            color = gs.cities[self.location].color
-            if gs.cities[self.location].disease_cubes[color] > 1:
-                gs.cities[self.location].disease_cubes[color] -= 1
+            color = COLORS[self.board.colors[self.loc]]
+            slot = self.loc * 4 + COLOR_INDEX[color]
+            if self.gs.cubes[slot] > 0:
+                self.gs.set_cubes(self.loc, COLOR_INDEX[color], self.gs.cubes[slot] - 1)
                 self.reduce_action()
             else:
                 raise ValueError("""There aren't any {0} disease cubes here, specify which color
@@ -383,9 +1244,11 @@ class Player:
         """
 
         # namespace easers
-        player = gs.player[pn]
+        player = self.gs.player[pn]
 
-        if self.location == player.location:
+        if player is self:
+            raise ValueError("You can't share knowledge with yourself")
+        if self.loc == player.loc:
             if action == 'give':
                 if card in self.cards:
                     self.remove_card(card)
@@ -411,89 +1274,130 @@ class Player:
         Searches the current player's cards and determines if they can discover a cure.
         If they can, the cards are discarded and a cure is added.
         """
-        if gs.cities[self.location].research_station is True:
-            if gs['cures'][color] != 1 or gs['cures'][color] != 2:
-                # do I have 5 city cards?
-                if len(self.cards) >= 5:
-                    # do I have 5 city cards of same color?
-                    _total = 0
-                    _cards = []
-                    for card in self.cards:
-                        if gs.cities[card].color == color:
-                            _cards.append(card)
-                            _total += 1
-
-                    if _total >= 5:
-                        if set(_cards).issubset(set(self.cards)):
-                            gs['cures'][color] = 1
-                            self.reduce_action()
-                            for card in discards:
-                                self.remove_card(card)
+        if color not in COLOR_INDEX:
+            raise ValueError("There isn't a {0} disease".format(color))
+        if self.gs.stations >> self.loc & 1:
+            if self.gs.cures[color] == 0:
+                # do I have 5 city cards of same color?
+                _cards = self.board.mask(discards) & self.hand \
+                         & self.board.color_masks[COLOR_INDEX[color]]
+
+                if bin(_cards).count('1') >= 5:
+                    self.gs.set_cure(color, 1)
+                    self.reduce_action()
+                    discarded = [card for card in dict.fromkeys(discards)
+                                 if card in self.board.index
+                                 and _cards >> self.board.index[card] & 1]
+                    for card in discarded[:5]:
+                        self.remove_card(card)
+                        self.gs.discard_player_card(card)
+
+                    if all(self.gs.cures.values()):
+                        self.gs.win_game()
+                else:
+                    raise ValueError("You need 5 {0} city cards to discover a cure".format(color))
+            else:
+                raise ValueError("The {0} disease has already been cured".format(color))
+        else:
+            raise ValueError("You're not on a research station")
 
     # Player Controls
     def add_card(self, card):
-        self.cards.append(card)
+        self._cards.append(card)
+        if card in self.board.index:
+            self.hand |= 1 << self.board.index[card]
+        self.gs.hash ^= zobrist.HAND_KEYS[self.number][self.board.card_ids[card]]
 
     def remove_card(self, card):
-        self.cards.remove(card)
+        self._cards.remove(card)
+        if card in self.board.index:
+            self.hand &= ~(1 << self.board.index[card])
+        self.gs.hash ^= zobrist.HAND_KEYS[self.number][self.board.card_ids[card]]
 
     def reduce_action(self):
-        self.actions_left -= 1
+        self.set_actions_left(self.actions_left - 1)
 
-def city_loader():
+@functools.lru_cache(maxsize=None)
+def load_board(path=CITIES_CSV):
     """
-    Returns a dict of all the cities
+    Loads the cities file once per process and returns the Board, which is
+    shared by every game. The cities of CITIES_CSV are taken from
+    board_data.py instead of parsing the file, as long as it was made from
+    the file as it is now (see write_board_data).
     """
-    logger.info('Started: City Loader')
-    cities = {}
-
-    # open csv file of cities and load into memory
-    with open('data/cities.csv', 'r') as csvfile:
-        cityreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-        # reads each new line
-        for data in cityreader:
-            # splits the connecting cities data point into a list
-            data[3] = data[3].split(',')
-            # stores the object into the dict
-            cities[data[0]] = City(data)
-
-    # removes the header
-    cities.pop('city', None)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path == CITIES_CSV:
+        import board_data
+        if board_data.CSV_CRC == zlib.crc32(data):
+            return Board(CityInfo(*city) for city in board_data.CITIES)
+    return Board(parse_cities(data.decode()))
+
+def parse_cities(text):
+    """
+    Returns the CityInfo of every city of the text of a cities file
+    """
+    import csv
+    logger.info('Started: Board Loader')
+    cities = []
+
+    cityreader = csv.reader(text.splitlines(), delimiter=',', quotechar='"')
+    next(cityreader) # removes the header
+    for name, color, population, connections in cityreader:
+        # splits the connecting cities data point into a tuple
+        cities.append(CityInfo(name, color, int(population),
+                               tuple(connections.split(','))))
+    return cities
 
-    ## DEBUGGING
-    for i in cities:
-        logger.debug(i)
+def write_board_data(path=CITIES_CSV, out=BOARD_DATA):
+    """
+    Writes the cities of a cities file out as a Python module for
+    load_board, run it again whenever the file changes
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(out, 'w') as f:
+        f.write('"""\nThe cities of data/cities.csv, written by game.write_board_data so\n'
+                'load_board doesn\'t have to parse the file\n"""\n\n')
+        f.write('CSV_CRC = {0}\n\nCITIES = (\n'.format(zlib.crc32(data)))
+        for info in parse_cities(data.decode()):
+            f.write('    ({0!r}, {1!r}, {2!r},\n     {3!r}),\n'.format(*info))
+        f.write(')\n')
 
-    return cities
+def city_loader():
+    """
+    Returns a dict of all the cities' static information by name
+    """
+    logger.info('Started: City Loader')
+    return {info.name: info for info in load_board().cities}
 
 def infection_loader():
     """
     Returns a list of tuples of all the cities:
     (city name, color)
     """
+    return [(info.name, info.color) for info in load_board().cities]
 
-    infection_cities = []
-
-    # open csv file of cities and load into memory
-    with open('data/cities.csv', 'r') as csvfile:
-        cityreader = csv.reader(csvfile, delimiter=',', quotechar='"')
-        for data in cityreader:
-            # clean the data
-            data[3] = data[3].split(',')
-            # 0 = city name, 1 = city color
-            infection_cities.append((data[0], data[1]))
-
-    # removes the header
-    infection_cities.pop(0)
 
-    return infection_cities
-
-
-def clean_setup(players, difficulty):
+def clean_setup(players, difficulty, gs=None, roles=None):
     """
-    Creates a new game by overwriting all the variables in the game state
+    Sets up a new game on a fresh game state, one is made if none is given.
+    A game state can't be set up twice, since its decks, players and cubes
+    would carry over, so make a new GameState for every game. Roles are
+    dealt at random unless a role is given for every player, in which case
+    the game is shuffled as it would have been with dealt roles.
     """
-    logger.info('Started: arg check')
+    if gs is None:
+        gs = GameState()
+    elif gs.player_turn is not None:
+        raise ValueError('This game state has already been set up, make a new one')
+
+    # the logging below is only done when it would be seen
+    info = not gs.fast and logger.isEnabledFor(INFO)
+    debug = not gs.fast and logger.isEnabledFor(DEBUG)
+
+    if info:
+        logger.info('Started: arg check')
 
     # make sure players and difficulty is correct
     if players > 4 or players < 2:
@@ -509,34 +1413,42 @@ def clean_setup(players, difficulty):
     """
     Role distribution
     """
-    logger.info('Started: Role distribution')
+    if info:
+        logger.info('Started: Role distribution')
 
     # get a sample from the roles and distribute it to the players
-    player_roles = random.sample(ROLES, players)
+    player_roles = gs.random.sample(ROLES, players)
+    if roles is not None:
+        if len(roles) != players or len(set(roles)) != players \
+           or not set(roles) <= set(ROLES):
+            raise ValueError('Give {0} different roles out of {1}'.format(players, ROLES))
+        player_roles = list(roles)
     for i in range(players):
         i_1 = i+1 # 1 index the player numbers
-        gs.player[i_1] = Player()
+        gs.player[i_1] = Player(gs=gs, number=i_1)
         gs.player[i_1].role = player_roles[i]
 
     ## DEBUGGING
-    for i in range(players):
-        logger.info(' Player %s\'s Role: %s', i+1, gs.player[i+1].role)
+    if info:
+        for i in range(players):
+            logger.info(' Player %s\'s Role: %s', i+1, gs.player[i+1].role)
 
     """
     Building the city tracker
     """
-    logger.info('Started: Build cities dict')
-
-    gs.cities = city_loader()
+    if info:
+        logger.info('Started: Build cities dict')
 
-    for i in gs.cities:
-        logger.debug('%s\n  population:  %s\n  connections: %s\n',
-                     i, gs.cities[i].population, gs.cities[i].connections)
+    if debug:
+        for i in gs.cities:
+            logger.debug('%s\n  population:  %s\n  connections: %s\n',
+                         i, gs.cities[i].population, gs.cities[i].connections)
 
     """
     Player city card distribution
     """
-    logger.info('Started: Player city card distribution')
+    if info:
+        logger.info('Started: Player city card distribution')
 
     if players == 2:
         cards_per_player = 4
@@ -546,7 +1458,7 @@ def clean_setup(players, difficulty):
         cards_per_player = 2
 
     # get random samples of cards
-    player_cards = random.sample(list(gs.cities) + list(EVENT_CARDS), cards_per_player*players)
+    player_cards = gs.random.sample(list(gs.cities) + list(EVENT_CARDS), cards_per_player*players)
 
     # store which cards remain left in the main player deck
     remaining_cards = [x for x in gs.cities if x not in player_cards]
@@ -560,15 +1472,17 @@ def clean_setup(players, difficulty):
         gs.player[index+1].cards = deck
 
     ## DEBUGGING
-    for k,v in gs.player.items():
-        logger.debug(' Player %s Cards: %s', k, v.cards)
-    logger.debug(' Should be empty if nothing went wrong: %s',
-                 set(player_cards).intersection(set(remaining_cards)))
+    if debug:
+        for k,v in gs.player.items():
+            logger.debug(' Player %s Cards: %s', k, v.cards)
+        logger.debug(' Should be empty if nothing went wrong: %s',
+                     set(player_cards).intersection(set(remaining_cards)))
 
     """
     Who goes first?
     """
-    logger.info('Started: Determine who goes first')
+    if info:
+        logger.info('Started: Determine who goes first')
 
     player_pops = []
 
@@ -576,9 +1490,10 @@ def clean_setup(players, difficulty):
         pops = []
         for city in gs.player[pn].cards:
             # build list of populations for each player's cards
-            if city in gs.cities: # make sure it's not an event card
-                pops.append(int(gs.cities[city].population))
-        logger.debug('Population for player %s: %s', pn, pops)
+            if city in gs.board.index: # make sure it's not an event card
+                pops.append(int(gs.board.cities[gs.board.index[city]].population))
+        if debug:
+            logger.debug('Population for player %s: %s', pn, pops)
         # default to 0 just in case a player has all event cards
         player_pops.append(max(pops, default=0))
 
@@ -587,21 +1502,24 @@ def clean_setup(players, difficulty):
     gs.player_turn = goes_first
 
     ## DEBUGGING
-    logger.info(' Player %s goes first', goes_first)
-    logger.debug('Populations that were maxed: %s', player_pops)
+    if info:
+        logger.info(' Player %s goes first', goes_first)
+    if debug:
+        logger.debug('Populations that were maxed: %s', player_pops)
 
     """
     Build infection deck
     """
-    logger.info('Started: Build infection deck')
+    if info:
+        logger.info('Started: Build infection deck')
 
     # build infection deck
     infection_deck = infection_loader()
-    gs.infection_deck = random.sample(infection_deck, len(infection_deck)) # save state
+    infection_deck = gs.random.sample(infection_deck, len(infection_deck)) # save state
 
     # disease disribution - disease chosen cities from infection pile
-    # get first 3 of infection deck
-    a, b, c = gs.infection_deck[:3], gs.infection_deck[4:7], gs.infection_deck[8:11]
+    # get first 9 of infection deck
+    a, b, c = infection_deck[:3], infection_deck[3:6], infection_deck[6:9]
     for i in a:
         # i[0] is city name, i[1] is city color
         gs.infect_city(i[0], i[1], 3)
@@ -610,16 +1528,18 @@ def clean_setup(players, difficulty):
     for i in c:
         gs.infect_city(i[0], i[1], 1)
 
-    gs.infection_discard_deck = gs.infection_deck[:11]
-    del gs.infection_deck[:11]
+    gs.infection_discard_deck.put_on_top(infection_deck[:9])
+    gs.infection_deck.put_on_top(infection_deck[9:])
 
     ## DEBUGGING
-    logger.info(' Infected Cities with 3: %s', a)
-    logger.info(' Infected Cities with 2: %s', b)
-    logger.info(' Infected Cities with 1: %s', c)
-    logger.debug(' Infected City Deck: %s %s', len(gs.infection_deck), gs.infection_deck)
-    logger.debug(' Infected Discard Deck: %s %s',
-                 len(gs.infection_discard_deck), gs.infection_discard_deck)
+    if info:
+        logger.info(' Infected Cities with 3: %s', a)
+        logger.info(' Infected Cities with 2: %s', b)
+        logger.info(' Infected Cities with 1: %s', c)
+    if debug:
+        logger.debug(' Infected City Deck: %s %s', len(gs.infection_deck), gs.infection_deck)
+        logger.debug(' Infected Discard Deck: %s %s',
+                     len(gs.infection_discard_deck), gs.infection_discard_deck)
 
     """
     Put research station on Atlanta
@@ -631,7 +1551,8 @@ def clean_setup(players, difficulty):
     Player deck prep:
     Based on difficulty, it shuffles chunks of the player deck evenly
     """
-    logger.info('Started: Player deck prep')
+    if info:
+        logger.info('Started: Player deck prep')
 
     # get n nearly equal chunks
     partitions = partition(remaining_cards, difficulty)
@@ -639,35 +1560,37 @@ def clean_setup(players, difficulty):
 
     for i, d in enumerate(partitions):
         d.append(EPIDEMIC) # add epidemic card
-        logger.debug(' Before Epidemic: %s %s', len(d), d)
-        epi_partitions.append(random.sample(d, len(d))) # shuffle this deck
-        logger.debug(' After  Epidemic: %s %s', len(epi_partitions), epi_partitions[i])
+        if debug:
+            logger.debug(' Before Epidemic: %s %s', len(d), d)
+        epi_partitions.append(gs.random.sample(d, len(d))) # shuffle this deck
+        if debug:
+            logger.debug(' After  Epidemic: %s %s', len(epi_partitions), epi_partitions[i])
 
-    # concat to form player deck
-    player_deck = []
-    for i in epi_partitions:
-        player_deck += i
-
-    # store deck
-    gs.player_deck = player_deck
+    # stack them to form player deck, every pile keeps its epidemic
+    gs.player_deck = Deck.from_segments(epi_partitions, gs.player_deck.keys, gs.player_deck.ids)
 
     ## DEBUGGING
-    logger.debug(' Original Partitions :')
-    for i in partitions:
-        logger.debug('  %s %s', len(i), i)
+    if debug:
+        logger.debug(' Original Partitions :')
+        for i in partitions:
+            logger.debug('  %s %s', len(i), i)
 
-    logger.debug(' Epidemic Partitions :')
-    for i in epi_partitions:
-        logger.debug('  %s %s', len(i), i)
+        logger.debug(' Epidemic Partitions :')
+        for i in epi_partitions:
+            logger.debug('  %s %s', len(i), i)
 
-    logger.debug(' Player_deck')
-    logger.debug('  %s', player_deck)
+        logger.debug(' Player_deck')
+        logger.debug('  %s', gs.player_deck)
 
     """
     We made it home boys, say hi.
     """
 
-    print_welcome_message(a, b, c)
+    gs.rehash()
+
+    if not gs.quiet:
+        import cli
+        cli.print_welcome_message(gs, a, b, c)
 
     return gs
 
@@ -682,163 +1605,15 @@ def partition(lst, n):
     division = len(lst) / n
     return [lst[round(division * i):round(division * (i + 1))] for i in range(n)]
 
-def print_welcome_message(d3, d2, d1):
+def main(argv=None):
     """
-    Prints the welcome message to a clean game
+    Plays the terminal game, see cli.main
     """
-    print(LOGO, '\n')
-    print('WELCOME TO PANDEMIC!\n')
-    print('Do you have what it takes to save humanity? Let\'s find out!')
-    print('Here\'s everything you need to get started:\n')
-    print(' The infected cities:\n\n  3 cubes : {d3}\n  2 cubes : {d2}\n  1 cube  : {d1}\n'
-          .format(d3=d3, d2=d2, d1=d1))
-    print('Here are the player hands:\n')
-    for i in gs.player:
-        print('  Player {i}:'.format(i=i))
-        print('    Role : {role}'.format(role=gs.player[i].role))
-        print('    Cards: {cards}\n'.format(cards=gs.player[i].cards))
-    print('Player {first} goes first. Good luck!'.format(first=gs.player_turn))
-
-def print_end_turn():
-    """
-    Prints the gameboard and stuff
-    """
-    print(LOGO, '\n')
-    print("Player {}'s turn ".format(gs.player_turn))
-    print(' Here are the player hands:\n')
-    for i in gs.player:
-        print('  Player {i}:'.format(i=i))
-        print('    Role : {role}'.format(role=gs.player[i].role))
-        print('    Cards: {cards}\n'.format(cards=gs.player[i].cards))
-
-
-def clear_screen():
-    """Helper function that clears the screen using either program"""
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-class PandemicCmd(cmd.Cmd):
-    prompt = '\n> '
-
-    # The default() method is called when none of the other do_*() command methods match.
-    def default(self, arg):
-        print('I do not understand that command. Type "help" for a list of commands.')
-
-    def emptyline(self):
-        pass
-
-    def precmd(self, line):
-        # clear_screen()
-        return line
-
-    # def postcmd(self, stop, line):
-    #     return line
-
-
-    def do_quit(self, arg):
-        """Quit the game."""
-        return True # this exits the Cmd application loop in TextAdventureCmd.cmdloop()
-
-    """
-    These are the commands used to control the current player
-    """
-    def do_drive(self, loc):
-        """Drive to a connected location"""
-        msg = gs.current_player().drive(loc)
-        if msg:
-            print(msg)
-        else:
-            print("You're now at {0}.".format(gs.current_player().location))
-        self.do_connections()
-
-    def do_direct_flight(self, loc):
-        """Go to the area to the south, if possible."""
-        gs.current_player().direct_flight(loc)
-
-    def do_charter_flight(self, loc):
-        """Go to the area to the east, if possible."""
-        gs.current_player().charter_flight(loc)
-
-    def do_shuttle_flight(self, loc):
-        """Go to the area to the west, if possible."""
-        gs.current_player().shuttle_flight(loc)
-
-    def do_build_research_station(self):
-        """Go to the area upwards, if possible."""
-        gs.current_player().build_research_station()
-
-    def do_treat_disease(self, arg):
-        """Go to the area downwards, if possible."""
-        gs.current_player().treat_disease()
-
-    def do_share_knowledge(self, arg):
-        """Go to the area downwards, if possible."""
-        gs.current_player().share_knowledge()
-
-    def do_discover_cure(self, arg):
-        """Discovers a cure, if possible."""
-        gs.current_player().discover_cure()
-
-    def do_end_turn(self, arg):
-        """Ends turn"""
-        # TODO
-        print_end_turn()
-        pass
-
-    def do_connections(self, city=''):
-        """Prints the current connections the current player is in, or for a city"""
-        if city:
-            try:
-                print(gs.cities[city].connections)
-            except:
-                print("I can't find the city '{0}'. :(".format(city))
-            
-        else:
-            print(gs.cities[gs.current_player().location].connections)
-
-    def do_whereami(self, arg):
-        """Prints the current location"""
-        print(gs.current_player().location)
-
-    def help_combat(self):
-        print('Combat is not implemented in this program.')
-
-def main():
-
-    """
-    Sets up conditions for game
-    """
-
-    parser = argparse.ArgumentParser(description="The board game Pandemic made in Python.",
-                                     epilog="""Made by unnamedplay-r, August 2017:\n
-                                     github.com/unnamedplay-r""",
-                                     prog='pandemic')
-    parser.add_argument("players", help="the number of players",
-                        type=int, choices=[2, 3, 4])
-    parser.add_argument("difficulty",
-                        help="""the difficulty of the game corresponding to the
-                        number of epidemic cards in the player deck""",
-                        type=int, choices=[4, 5, 6])
-    parser.add_argument("--verbose", help="increase output verbosity", type=int, choices=[1, 2])
-    parser.add_argument('--version', action='version', version='%(prog)s 1.0')
-    args = parser.parse_args()
-
-    # check for optionals
-    if args.verbose == 1:
-        print("Verbose logging turned on.\n")
-        logger.setLevel('INFO')
-    elif args.verbose == 2:
-        print("Verbose logging turned on.\n")
-        logger.setLevel('DEBUG')
-
-    # create clean board
-    global gs
-    gs = GameState()
-    clear_screen()
-    clean_setup(args.players, args.difficulty)
-
-    # start the loop
-    PandemicCmd().cmdloop()
-    print('\nThanks for playing!')
+    import cli
+    return cli.main(argv)
 
 if __name__ == '__main__':
-    main()
+    # run main from the game module rather than this copy of it, so the
+    # game shares its classes with the engine modules (and their profiler)
+    import game
+    game.main()
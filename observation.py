@@ -0,0 +1,170 @@
+"""
+Fixed-shape observations of a game for neural network agents
+
+An observation is a flat row of SIZE unsigned bytes, made of the fields
+below in order. Every field is a count or a 0/1 flag, cities are in the
+order of game.Board and colors in the order of game.COLORS:
+
+  cubes              48 x 4   disease cubes per city and color, 0 to 3
+  stations           48       1 where there is a research station
+  pawns              4 x 48   1 where player p + 1 is
+  hands              4 x 53   1 for each city and event card player p + 1 holds
+  cures              4 x 3    one-hot of no cure, cured and eradicated
+  turn               4        one-hot of the current player
+  counters           6        outbreaks, infection rate position, infection rate,
+                              actions left, player deck size, epidemics left
+  infection_discard  48       1 for the cities in the infection discard pile
+
+Players that aren't in the game are left at zero. FIELDS gives the offset
+and shape of each field, so a batch can be split into tensors without
+copying, e.g. with NumPy:
+
+  buffer = Encoder(256).encode_batch(states)
+  batch = numpy.frombuffer(buffer, numpy.uint8).reshape(-1, SIZE)
+  offset, shape = FIELDS['cubes']
+  cubes = batch[:, offset:offset + CUBES].reshape(-1, *shape)
+
+Encoding doesn't allocate per game beyond a few small temporaries: the
+cubes are copied straight from GameState.cubes, and bitmasks are spread
+into bytes with a lookup table a byte at a time.
+"""
+
+from array import array
+
+import game
+
+CITIES = game.CITY_CARDS
+COLORS = len(game.COLORS)
+PLAYERS = 4
+HAND_CARDS = CITIES + len(game.EVENT_CARDS) # epidemics are never held
+CURE_STATES = 3
+COUNTERS = 6
+
+# sizes of the fields
+CUBES = CITIES * COLORS
+STATIONS = CITIES
+PAWNS = PLAYERS * CITIES
+HANDS = PLAYERS * HAND_CARDS
+CURES = COLORS * CURE_STATES
+TURN = PLAYERS
+INFECTION_DISCARD = CITIES
+
+FIELDS = {}
+SIZE = 0
+for _name, _shape in [('cubes', (CITIES, COLORS)),
+                      ('stations', (CITIES,)),
+                      ('pawns', (PLAYERS, CITIES)),
+                      ('hands', (PLAYERS, HAND_CARDS)),
+                      ('cures', (COLORS, CURE_STATES)),
+                      ('turn', (PLAYERS,)),
+                      ('counters', (COUNTERS,)),
+                      ('infection_discard', (CITIES,))]:
+    FIELDS[_name] = (SIZE, _shape)
+    _size = 1
+    for _n in _shape:
+        _size *= _n
+    SIZE += _size
+del _name, _shape, _size, _n
+
+CUBES_AT = FIELDS['cubes'][0]
+STATIONS_AT = FIELDS['stations'][0]
+PAWNS_AT = FIELDS['pawns'][0]
+HANDS_AT = FIELDS['hands'][0]
+CURES_AT = FIELDS['cures'][0]
+TURN_AT = FIELDS['turn'][0]
+COUNTERS_AT = FIELDS['counters'][0]
+INFECTION_DISCARD_AT = FIELDS['infection_discard'][0]
+
+# the 8 bytes of 0 or 1 for each value of a byte, lowest bit first
+BYTE_BITS = tuple(bytes(b >> i & 1 for i in range(8)) for b in range(256))
+MASK_BYTES = CITIES // 8
+
+def spread(mask):
+    """
+    Returns a city bitmask as CITIES bytes of 0 or 1
+    """
+    return b''.join([BYTE_BITS[b] for b in mask.to_bytes(MASK_BYTES, 'little')])
+
+ZEROS = bytes(SIZE)
+
+def encode_into(gs, out, offset=0):
+    """
+    Writes the observation of a game into out, an array('B'), bytearray or
+    byte memoryview, starting at offset
+    """
+    card_ids = gs.board.card_ids
+    view = memoryview(out)
+    view[offset:offset + SIZE] = ZEROS
+
+    at = offset + CUBES_AT
+    view[at:at + CUBES] = gs.cubes
+    at = offset + STATIONS_AT
+    view[at:at + STATIONS] = spread(gs.stations)
+
+    for pn, player in gs.player.items():
+        p = pn - 1
+        view[offset + PAWNS_AT + p * CITIES + player.loc] = 1
+        at = offset + HANDS_AT + p * HAND_CARDS
+        view[at:at + CITIES] = spread(player.hand)
+        for card in player.cards:
+            i = card_ids[card]
+            if i >= CITIES:
+                view[at + i] = 1
+
+    at = offset + CURES_AT
+    for c, color in enumerate(game.COLORS):
+        view[at + c * CURE_STATES + gs.cures[color]] = 1
+
+    if gs.player_turn:
+        view[offset + TURN_AT + gs.player_turn - 1] = 1
+        actions_left = gs.current_player().actions_key()
+    else:
+        actions_left = 0
+
+    at = offset + COUNTERS_AT
+    view[at] = min(gs.outbreaks, 255)
+    view[at + 1] = gs.infection_rate_position
+    view[at + 2] = gs.infection_rate
+    view[at + 3] = actions_left
+    view[at + 4] = len(gs.player_deck)
+    view[at + 5] = gs.epidemic_cards_left or 0
+
+    at = offset + INFECTION_DISCARD_AT
+    infection_ids = gs.board.infection_ids
+    for card in gs.infection_discard_deck:
+        view[at + infection_ids[card]] = 1
+    return out
+
+def encode(gs):
+    """
+    Returns the observation of a game as a new array('B') of SIZE bytes
+    """
+    return encode_into(gs, array('B', ZEROS))
+
+class Encoder:
+
+    """
+    Encodes batches of games into one buffer that is allocated once
+
+    The buffer holds `capacity` rows of SIZE bytes. encode_batch returns a
+    memoryview of the rows it filled, which stays valid until the next
+    call, so it can be handed to an inference library without a copy.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = array('B', bytes(capacity * SIZE))
+        self.view = memoryview(self.buffer)
+
+    def encode_batch(self, states):
+        """
+        Encodes games into consecutive rows of the buffer
+        """
+        n = 0
+        view = self.view
+        for gs in states:
+            if n == self.capacity:
+                raise ValueError('The encoder only has room for {0} games'.format(self.capacity))
+            encode_into(gs, view, n * SIZE)
+            n += 1
+        return view[:n * SIZE]
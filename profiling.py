@@ -0,0 +1,255 @@
+"""
+Where the engine spends its time
+
+A Profiler times the phases of the engine while it runs: setting games up,
+applying actions through the engine, drawing player and infection cards,
+and resolving outbreaks. It does so by swapping timed wrappers in for the
+functions of those phases, so nothing is added to the engine while no
+Profiler runs.
+
+  with profiling.Profiler() as profiler:
+      list(engine.run_batch(1000, engine.RandomPolicy(seed=0)))
+  profiler.print_report()
+
+Phases nest (an action can end the turn and draw cards, which can cause
+outbreaks), so each phase's time includes the phases it calls. The time of
+every nesting of phases without the phases inside it is kept too, which is
+what `folded` writes out as folded stacks for flamegraph tools.
+
+The command lines of game.py, simulate.py and sweep.py take --profile and
+the other options of add_arguments.
+"""
+
+import contextlib
+import cProfile
+import functools
+import json
+import time
+import tracemalloc
+
+import engine
+import game
+
+class Profiler:
+
+    """
+    Per-phase timings and counters of the engine
+    """
+
+    def __init__(self):
+        self.phases = [('setup', game, 'clean_setup'),
+                       ('action', engine, 'apply_action'),
+                       ('draw_player_cards', game.GameState, 'draw_player_cards'),
+                       ('draw_infection_cards', game.GameState, 'draw_infection_cards'),
+                       ('outbreak', game.GameState, 'outbreak')]
+        self.calls = {name: 0 for name, _, _ in self.phases}
+        self.seconds = {name: 0.0 for name, _, _ in self.phases}
+        self.stacks = {} # seconds spent in each nesting of phases, without its inner phases
+        self.outbreaks = 0
+        self.wall = 0.0
+        self._running = [] # [phase, start, seconds in inner phases]
+        self._originals = []
+        self._started = None
+
+    def _timed(self, name, function):
+        calls = self.calls
+        seconds = self.seconds
+        stacks = self.stacks
+        running = self._running
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            frame = [name, clock(), 0.0]
+            running.append(frame)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - frame[1]
+                running.pop()
+                calls[name] += 1
+                seconds[name] += elapsed
+                path = ';'.join(f[0] for f in running) + ';' + name if running else name
+                stacks[path] = stacks.get(path, 0.0) + elapsed - frame[2]
+                if running:
+                    running[-1][2] += elapsed
+        return timed
+
+    def _counted_outbreak(self, function):
+        @functools.wraps(function)
+        def outbreak(gs, *args, **kwargs):
+            before = gs.outbreaks
+            try:
+                return function(gs, *args, **kwargs)
+            finally:
+                self.outbreaks += gs.outbreaks - before
+        return outbreak
+
+    def patch(self):
+        """
+        Swaps the timed wrappers in
+        """
+        for name, owner, attr in self.phases:
+            original = owner.__dict__[attr]
+            self._originals.append((owner, attr, original))
+            wrapper = self._timed(name, original)
+            if name == 'outbreak':
+                wrapper = self._counted_outbreak(wrapper)
+            setattr(owner, attr, wrapper)
+
+    def unpatch(self):
+        """
+        Puts the engine back the way it was
+        """
+        while self._originals:
+            owner, attr, original = self._originals.pop()
+            setattr(owner, attr, original)
+
+    def start(self):
+        self.patch()
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.unpatch()
+        if self._started is not None:
+            self.wall += time.perf_counter() - self._started
+            self._started = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """
+        Takes the wrappers out for a while, for example while worker
+        processes are forked that keep their own Profiler
+        """
+        self.unpatch()
+        try:
+            yield
+        finally:
+            self.patch()
+
+    def state(self):
+        """
+        The timings and counters as plain data, to send between processes
+        """
+        return {'calls': self.calls, 'seconds': self.seconds, 'stacks': self.stacks,
+                'outbreaks': self.outbreaks}
+
+    def merge(self, state):
+        """
+        Adds the timings and counters of another Profiler's state
+        """
+        for name, n in state['calls'].items():
+            self.calls[name] = self.calls.get(name, 0) + n
+        for name, s in state['seconds'].items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + s
+        for path, s in state['stacks'].items():
+            self.stacks[path] = self.stacks.get(path, 0.0) + s
+        self.outbreaks += state['outbreaks']
+
+    def report(self):
+        """
+        Returns the timings and counters as a dict ready for JSON
+        """
+        games = self.calls['setup']
+        actions = self.calls['action']
+        wall = self.wall or 1e-9
+        return {'wall_seconds': self.wall,
+                'phases': {name: {'calls': self.calls[name],
+                                  'seconds': self.seconds[name],
+                                  'mean_us': 1e6 * self.seconds[name] / self.calls[name]
+                                             if self.calls[name] else 0.0}
+                           for name, _, _ in self.phases},
+                'counters': {'games': games,
+                             'actions': actions,
+                             'outbreaks': self.outbreaks,
+                             'games_per_sec': games / wall,
+                             'actions_per_sec': actions / wall,
+                             'outbreaks_per_game': self.outbreaks / games if games else 0.0}}
+
+    def print_report(self, file=None):
+        report = self.report()
+        print('\n{0:<22} {1:>10} {2:>10} {3:>10}'.format('phase', 'calls', 'seconds', 'mean us'),
+              file=file)
+        for name, phase in report['phases'].items():
+            print('{0:<22} {1:>10} {2:>10.3f} {3:>10.1f}'.format(
+                name, phase['calls'], phase['seconds'], phase['mean_us']), file=file)
+        print(file=file)
+        for name, value in report['counters'].items():
+            print('{0:<22} {1:>10.6g}'.format(name, value), file=file)
+
+    def folded(self):
+        """
+        The time of every nesting of phases as folded stacks, a line of
+        'outer;inner microseconds' each
+        """
+        return ''.join('{0} {1}\n'.format(path, round(s * 1e6))
+                       for path, s in sorted(self.stacks.items()))
+
+def add_arguments(parser):
+    """
+    Adds the profiling options to a command line parser
+    """
+    group = parser.add_argument_group('profiling')
+    group.add_argument("--profile", action="store_true",
+                       help="time the phases of the engine and print them at the end")
+    group.add_argument("--profile-out", metavar="PATH",
+                       help="""write the timings to PATH, as folded stacks for flamegraph
+                       tools if it ends in .folded and as JSON otherwise""")
+    group.add_argument("--cprofile", metavar="PATH", help="dump cProfile stats to PATH")
+    group.add_argument("--tracemalloc", action="store_true",
+                       help="trace memory and print the biggest allocations at the end")
+
+def in_process(args):
+    """
+    Whether the profiling asked for only sees the current process
+    """
+    return bool(args.cprofile or args.tracemalloc)
+
+@contextlib.contextmanager
+def session(args):
+    """
+    Profiles what runs inside it as the options of add_arguments ask,
+    yielding the running Profiler or None
+    """
+    profiler = Profiler() if args.profile or args.profile_out else None
+    stats = cProfile.Profile() if args.cprofile else None
+    if args.tracemalloc:
+        tracemalloc.start()
+    if stats is not None:
+        stats.enable()
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        yield profiler
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(args.cprofile)
+
+        if profiler is not None:
+            profiler.print_report()
+            if args.profile_out:
+                with open(args.profile_out, 'w') as f:
+                    if args.profile_out.endswith('.folded'):
+                        f.write(profiler.folded())
+                    else:
+                        json.dump(profiler.report(), f, indent=2)
+
+        if args.tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('\nmemory: {0:.1f} KiB now, {1:.1f} KiB at peak'.format(current / 1024,
+                                                                         peak / 1024))
+            for stat in snapshot.statistics('lineno')[:10]:
+                print(' ', stat)
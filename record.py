@@ -0,0 +1,315 @@
+"""
+Compact binary records of played games
+
+A record file is written append-only by a Writer one game at a time, and
+read back by a Reader that maps the file into memory, so any game can be
+found and replayed without reading the rest of the file.
+
+  with record.Writer('games.pdr') as writer:
+      for result in record.record_batch(writer, 1000, engine.RandomPolicy(seed=0), seed=1):
+          pass
+
+  with record.Reader('games.pdr') as reader:
+      gs = reader[42].replay()
+
+Everything is little endian. The file starts with MAGIC and VERSION, then
+every game is:
+
+  header      GAME_HEADER: b'GAME', bytes of the game after the header,
+              seed, flags, players, difficulty, first player, outbreaks,
+              turns, number of records
+  roles       a byte per player, the role's position in game.ROLES
+  hands       for each player a count byte, then a byte per card number
+  decks       a count byte, then a byte per card from the top, for the
+              player deck, the lengths of its segments from the bottom, the
+              infection deck and the infection discard pile
+  cubes       a count byte, then (cube slot, cubes) for every slot with cubes
+  records     RECORD for every action and engine event, in the order they
+              happened
+
+Player cards are numbered as in game.Board.card_ids, infection cards and
+cities by city number. A record is (kind, a, b, c): the engine events of
+game.py keep their kind and fields (with the outbreak count capped at
+255), and an action is (ACTION, player, low byte, high byte) of its
+action number in actions.py. Each action comes before the events it
+caused.
+"""
+
+import mmap
+import struct
+
+import actions
+import engine
+import game
+import replay
+
+MAGIC = b'PNDR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+GAME_HEADER = struct.Struct('<4sIQBBBBBHI')
+RECORD = struct.Struct('<BBBB')
+
+ACTION = 16
+
+# flags of a game
+SEEDED = 1
+WON = 2
+LOST = 4
+
+def _counted(values):
+    return bytes([len(values)]) + bytes(values)
+
+def setup_bytes(gs):
+    """
+    Packs the roles, hands, decks and cubes of a game that has just been
+    set up
+    """
+    board = gs.board
+    players = [gs.player[pn] for pn in sorted(gs.player)]
+    data = bytearray(game.ROLES.index(p.role) for p in players)
+    for p in players:
+        data += _counted([board.card_ids[card] for card in p.cards])
+    data += _counted([board.card_ids[card] for card in gs.player_deck])
+    data += _counted(gs.player_deck.segments)
+    data += _counted([board.infection_ids[card] for card in gs.infection_deck])
+    data += _counted([board.infection_ids[card] for card in gs.infection_discard_deck])
+    cubes = [(slot, n) for slot, n in enumerate(gs.cubes) if n]
+    data.append(len(cubes))
+    for slot, n in cubes:
+        data += bytes((slot, n))
+    return bytes(data)
+
+class Writer:
+
+    """
+    Appends games to a record file
+
+    A game is recorded by calling begin with the game once it is set up,
+    action before playing each action and end once it is over. Engine
+    events are collected by subscribing to the game in between, and the
+    game is written out in one piece by end.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.gs = None
+        self.games = 0
+
+    def begin(self, gs):
+        """
+        Starts recording a game
+        """
+        self.gs = gs
+        self.first_player = gs.player_turn
+        self.setup = setup_bytes(gs)
+        self.records = bytearray()
+        self.count = 0
+        self.events = []
+        gs.subscribe(self.events.append)
+
+    def _flush_events(self):
+        events = self.events
+        for kind, a, b, c in events:
+            self.records += RECORD.pack(kind, a, b, min(c, 255))
+        self.count += len(events)
+        events.clear()
+
+    def action(self, action):
+        """
+        Records the action the current player is about to play
+        """
+        gs = self.gs
+        if gs is None:
+            raise ValueError('No game is being recorded')
+        self._flush_events()
+        index = actions.encode(gs, action)
+        self.records += RECORD.pack(ACTION, gs.player_turn, index & 0xff, index >> 8)
+        self.count += 1
+
+    def end(self, turns=0):
+        """
+        Writes out the game being recorded
+        """
+        gs = self.gs
+        if gs is None:
+            raise ValueError('No game is being recorded')
+        self._flush_events()
+        gs.unsubscribe(self.events.append)
+
+        # only seeds that fit the header can be replayed
+        seeded = isinstance(gs.seed, int) and 0 <= gs.seed < 2**64
+        flags = (SEEDED if seeded else 0) | (WON if gs.won else 0) | (LOST if gs.lost else 0)
+        size = GAME_HEADER.size - 8 + len(self.setup) + len(self.records)
+        self.file.write(GAME_HEADER.pack(b'GAME', size, gs.seed if seeded else 0, flags,
+                                         len(gs.player), gs.difficulty, self.first_player,
+                                         min(gs.outbreaks, 255), turns, self.count))
+        self.file.write(self.setup)
+        self.file.write(self.records)
+        self.gs = None
+        self.games += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class GameRecord:
+
+    """
+    One game of a record file, with its setup unpacked
+    """
+
+    def __init__(self, data):
+        (_, _, seed, flags, self.players, self.difficulty, self.first_player,
+         self.outbreaks, self.turns, self.count) = GAME_HEADER.unpack_from(data)
+        self.seed = seed if flags & SEEDED else None
+        self.won = bool(flags & WON)
+        self.lost = bool(flags & LOST)
+
+        board = game.load_board()
+        at = GAME_HEADER.size
+        self.roles = [game.ROLES[r] for r in data[at:at + self.players]]
+        at += self.players
+
+        def counted():
+            nonlocal at
+            values = data[at + 1:at + 1 + data[at]]
+            at += 1 + data[at]
+            return values
+
+        self.hands = [[board.card_names[i] for i in counted()] for _ in range(self.players)]
+        self.player_deck = [board.card_names[i] for i in counted()]
+        self.player_deck_segments = list(counted())
+        infection_cards = [(info.name, info.color) for info in board.cities]
+        self.infection_deck = [infection_cards[i] for i in counted()]
+        self.infection_discard = [infection_cards[i] for i in counted()]
+        pairs = data[at + 1:at + 1 + 2 * data[at]]
+        self.cubes = dict(zip(pairs[::2], pairs[1::2]))
+        at += 1 + 2 * data[at]
+        self.data = data[at:at + self.count * RECORD.size]
+
+    def records(self):
+        """
+        Yields the (kind, a, b, c) records of the game
+        """
+        return RECORD.iter_unpack(self.data)
+
+    def actions(self):
+        """
+        Yields (player, action number) for every action of the game
+        """
+        for kind, a, low, high in RECORD.iter_unpack(self.data):
+            if kind == ACTION:
+                yield a, low | high << 8
+
+    def events(self):
+        """
+        Yields the engine events of the game
+        """
+        for record in RECORD.iter_unpack(self.data):
+            if record[0] != ACTION:
+                yield record
+
+    def replay(self, moves=None):
+        """
+        Sets the game up again from its seed and plays its first moves
+        actions, or all of them. Returns the game state.
+        """
+        replayer = self.replayer()
+        return replayer.seek(len(replayer) if moves is None else moves)
+
+    def replayer(self, every=50):
+        """
+        Returns a fast replay.Replay of the game, with its recorded roles
+        """
+        if self.seed is None:
+            raise ValueError('Only games with a seed can be replayed')
+        return replay.Replay(self.seed, [index for _, index in self.actions()],
+                             self.players, self.difficulty, every, fast=True,
+                             roles=self.roles)
+
+class Reader:
+
+    """
+    Reads a record file mapped into memory
+
+    Iterating goes through the games in order. Indexing finds the start of
+    every game once, by hopping from header to header, and then unpacks
+    just the game asked for.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError("{0} isn't a record file".format(path))
+        if version != VERSION:
+            raise ValueError("Can't read version {0} record files".format(version))
+        self.offsets = None
+
+    def _games(self):
+        """
+        Yields (offset, size) of every game
+        """
+        at = FILE_HEADER.size
+        end = len(self.map)
+        while at + GAME_HEADER.size <= end:
+            tag, size = struct.unpack_from('<4sI', self.map, at)
+            if tag != b'GAME':
+                raise ValueError('Bad game header at byte {0}'.format(at))
+            yield at, size + 8
+            at += size + 8
+
+    def __len__(self):
+        if self.offsets is None:
+            self.offsets = list(self._games())
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        len(self)
+        offset, size = self.offsets[i]
+        return GameRecord(self.map[offset:offset + size])
+
+    def __iter__(self):
+        for offset, size in self._games():
+            yield GameRecord(self.map[offset:offset + size])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def record_game(writer, env, policy, seed=None):
+    """
+    Plays a game to the end with a policy like engine.play_game, recording
+    it with a writer
+    """
+    gs = env.reset(seed)
+    writer.begin(gs)
+    done = False
+    while not done:
+        action = policy(gs)
+        writer.action(action)
+        gs, _, done = env.step(action)
+    writer.end(env.turns)
+    return env.result()
+
+def record_batch(writer, n, policy, players=2, difficulty=4, seed=None, start=0, roles=None):
+    """
+    Plays and records n games like engine.run_batch, yielding their results
+    """
+    env = engine.PandemicEnv(players, difficulty, roles=roles)
+    for i in range(start, start + n):
+        yield record_game(writer, env, policy, None if seed is None else engine.game_seed(seed, i))
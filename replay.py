@@ -0,0 +1,127 @@
+"""
+Rebuilding any position of a game from its seed and action log
+
+Every shuffle of a game comes from its own random generator (see
+GameState.random), so the seed, the number of players and the difficulty
+set a game up again exactly, and playing the same action numbers after
+that goes through the same positions:
+
+  replay = Replay(seed, moves, players=2, difficulty=4)
+  gs = replay.seek(200)
+
+A Replay keeps a snapshot every `every` moves as it goes, so going back to
+an earlier move or forward to a later one only replays from the nearest
+snapshot. With fast=True the actions are played without checking they are
+legal, for logs that are known to be, like those of record.py.
+"""
+
+import actions
+import engine
+import game
+
+def play_unchecked(gs, index):
+    """
+    Plays an action number for the current player without checking it is
+    legal, ending the turn once the player runs out of actions like
+    engine.apply_action. Returns whether the turn was ended.
+    """
+    if index == actions.END_TURN:
+        gs.end_turn()
+        return True
+
+    player = gs.current_player()
+    names = gs.board.names
+    if index < actions.DIRECT:
+        player.move_to(index - actions.DRIVE)
+    elif index < actions.CHARTER:
+        to = index - actions.DIRECT
+        player.remove_card(names[to])
+        player.move_to(to)
+    elif index < actions.SHUTTLE:
+        player.remove_card(names[player.loc])
+        player.move_to(index - actions.CHARTER)
+    elif index < actions.BUILD:
+        player.move_to(index - actions.SHUTTLE)
+    elif index == actions.BUILD:
+        gs.set_research_station(player.loc)
+        player.remove_card(names[player.loc])
+    elif index < actions.CURE:
+        c = index - actions.TREAT
+        gs.set_cubes(player.loc, c, gs.cubes[player.loc * 4 + c] - 1)
+    elif index < actions.GIVE:
+        # which cards a cure uses is worked out by decode
+        return engine.apply_action(gs, index)
+    elif index < actions.TAKE:
+        pn, card = divmod(index - actions.GIVE, actions.CITIES)
+        player.remove_card(names[card])
+        gs.player[pn + 1].add_card(names[card])
+    else:
+        pn, card = divmod(index - actions.TAKE, actions.CITIES)
+        gs.player[pn + 1].remove_card(names[card])
+        player.add_card(names[card])
+
+    player.reduce_action()
+    if not gs.game_over() and player.actions_left <= 0:
+        gs.end_turn()
+        return True
+    return False
+
+class Replay:
+
+    """
+    Plays a game's action log forward from its seed, to any move
+
+    `moves` are action numbers, or action tuples which are played as they
+    are through engine.apply_action even when fast, since a tuple cure may
+    discard other cards than its action number. `position` is the number
+    of moves played so far. A game set up with fixed roles needs the same
+    roles to replay, see game.clean_setup.
+    """
+
+    def __init__(self, seed, moves, players=2, difficulty=4, every=50, fast=False, roles=None):
+        if every < 1:
+            raise ValueError('Snapshots must be at least 1 move apart')
+        self.seed = seed
+        self.moves = list(moves)
+        self.every = every
+        self.fast = fast
+        self.gs = game.clean_setup(players, difficulty,
+                                   game.GameState(quiet=True, seed=seed, fast=True), roles)
+        self.position = 0
+        self.snapshots = {0: self.gs.snapshot()}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def seek(self, move):
+        """
+        Goes to the position after the first `move` moves, returns the game
+        """
+        if not 0 <= move <= len(self.moves):
+            raise ValueError("There isn't a move {0}, the log has {1}".format(move,
+                                                                              len(self.moves)))
+        nearest = move - move % self.every
+        while nearest not in self.snapshots:
+            nearest -= self.every
+        if move < self.position or nearest > self.position:
+            self.gs.restore(self.snapshots[nearest])
+            self.position = nearest
+        return self.forward(move - self.position)
+
+    def forward(self, n=1):
+        """
+        Plays the next n moves, returns the game
+        """
+        gs = self.gs
+        for _ in range(n):
+            if self.position == len(self.moves):
+                break
+            move = self.moves[self.position]
+            if self.fast and isinstance(move, int):
+                play_unchecked(gs, move)
+            else:
+                engine.apply_action(gs, move)
+            self.position += 1
+            if self.position % self.every == 0 and self.position not in self.snapshots:
+                self.snapshots[self.position] = gs.snapshot()
+        return gs
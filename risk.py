@@ -0,0 +1,218 @@
+"""
+Exact odds of every city being infected or outbreaking next turn
+
+When the current player ends their turn they draw two player cards, any
+epidemic among them infects the bottom card of the infection deck with 3
+cubes and shuffles the infection discard pile back on top, and then as
+many infection cards are drawn as the infection rate says.
+
+Nothing is sampled. The player deck and the infection deck are made of
+segments whose cards are known but whose order isn't (see game.Deck), so
+every card of a segment is equally likely to be at any position in it.
+The chance of 0, 1 or 2 epidemics comes from the epidemics left in the top
+segments of the player deck, and for each number of epidemics every
+possible epidemic city is gone through, with the odds of each card being
+drawn worked out from the segments the infection deck ends up with.
+
+Outbreaks are those of a city going over game.MAX_CUBES from its own
+infection card or an epidemic, chain reactions are left out. Running out
+of cubes or reaching the outbreak limit part way through isn't taken into
+account either. The cities of an eradicated color have no risk, since it
+gets no more cubes.
+"""
+
+from collections import namedtuple
+
+import game
+
+# for each city, the chance of being the city of an epidemic, of having
+# its card drawn without being an epidemic city, and of both
+CardOdds = namedtuple('CardOdds', ['epidemic', 'drawn', 'redrawn'])
+
+def epidemic_odds(deck, draws=2):
+    """
+    Returns the chances of drawing 0, 1, ... draws epidemics from the top
+    of the player deck
+    """
+    segments = []
+    for i in range(len(deck.segments)):
+        if sum(size for size, _ in segments) >= draws:
+            break
+        cards = list(deck.segment_cards(i))
+        segments.append((len(cards), cards.count(game.EPIDEMIC)))
+
+    odds = [0.0] * (draws + 1)
+
+    def draw(i, size, epidemics, left, found, p):
+        if not left or i == len(segments):
+            odds[found] += p
+            return
+        if not size:
+            if i + 1 < len(segments):
+                draw(i + 1, segments[i + 1][0], segments[i + 1][1], left, found, p)
+            else:
+                odds[found] += p
+            return
+        if epidemics:
+            draw(i, size - 1, epidemics - 1, left - 1, found + 1, p * epidemics / size)
+        if size > epidemics:
+            draw(i, size - 1, epidemics, left - 1, found, p * (size - epidemics) / size)
+
+    if segments:
+        draw(0, segments[0][0], segments[0][1], draws, 0, 1.0)
+    else:
+        odds[0] = 1.0
+    return odds
+
+def draw_odds(segments, draws):
+    """
+    Returns the chance of every card being among the top draws of a deck
+    given as lists of cards for its segments from the top
+    """
+    odds = {}
+    for cards in segments:
+        if draws <= 0:
+            break
+        p = min(draws, len(cards)) / len(cards)
+        for card in cards:
+            odds[card] = odds.get(card, 0.0) + p
+        draws -= len(cards)
+    return odds
+
+def bottom_cases(segments):
+    """
+    Yields (card, chance, segments left) for every card that can be the
+    bottom card of a deck
+    """
+    if not segments:
+        return
+    bottom = segments[-1]
+    for i, card in enumerate(bottom):
+        rest = bottom[:i] + bottom[i + 1:]
+        yield card, 1 / len(bottom), segments[:-1] + ([rest] if rest else [])
+
+def card_odds(gs):
+    """
+    Returns the CardOdds of every city next turn, by city number
+    """
+    ids = gs.board.infection_ids
+    epidemic = [0.0] * len(gs.board)
+    drawn = [0.0] * len(gs.board)
+    redrawn = [0.0] * len(gs.board)
+
+    if len(gs.player_deck) < 2:
+        # the game is lost before anything is infected
+        return CardOdds(epidemic, drawn, redrawn)
+
+    deck = gs.infection_deck
+    segments = [list(deck.segment_cards(i)) for i in range(len(deck.segments))]
+    discard = list(gs.infection_discard_deck)
+    position = gs.infection_rate_position
+
+    def add(p, epidemic_cards, segments, rate_position):
+        rate = game.INFECTION_RATES[rate_position - 1]
+        for card, q in draw_odds(segments, rate).items():
+            if card in epidemic_cards:
+                redrawn[ids[card]] += p * q
+            else:
+                drawn[ids[card]] += p * q
+        for card in epidemic_cards:
+            epidemic[ids[card]] += p
+
+    none, one, two = epidemic_odds(gs.player_deck)
+    if none:
+        add(none, (), segments, position)
+    for first, p, after in bottom_cases(segments):
+        # the epidemic city goes in the discard pile before the shuffle
+        after = [discard + [first]] + after
+        position1 = min(position + 1, len(game.INFECTION_RATES))
+        if one:
+            add(one * p, (first,), after, position1)
+        if two:
+            for second, q, after2 in bottom_cases(after):
+                position2 = min(position1 + 1, len(game.INFECTION_RATES))
+                add(two * p * q, (first, second), [[second]] + after2, position2)
+
+    return CardOdds(epidemic, drawn, redrawn)
+
+class InfectionRisk:
+
+    """
+    The infection and outbreak odds of a game's cities next turn
+
+    The card odds only depend on the decks and the infection rate, so they
+    are kept until one of those changes, which is told by the decks'
+    zobrist hashes. A zobrist.TranspositionTable can be given to share
+    them between the forks of a search.
+    """
+
+    def __init__(self, gs, table=None):
+        self.gs = gs
+        self.table = table
+        self.key = None
+        self.odds = None
+
+    def card_odds(self):
+        """
+        The CardOdds of the game as it is now
+        """
+        gs = self.gs
+        key = (gs.player_deck.hash, gs.infection_deck.hash, gs.infection_discard_deck.hash,
+               gs.infection_rate_position)
+        if key == self.key:
+            return self.odds
+
+        odds = None
+        if self.table is not None:
+            odds = self.table.get(hash(key))
+        if odds is None:
+            odds = card_odds(gs)
+            if self.table is not None:
+                self.table.store(hash(key), odds)
+        self.key = key
+        self.odds = odds
+        return odds
+
+    def eradicated(self, city):
+        """
+        Whether the color of a city by number is eradicated, so it gets no
+        cubes, see game.GameState.infect_city
+        """
+        return self.gs.cures[game.COLORS[self.gs.board.colors[city]]] == 2
+
+    def infection(self, city):
+        """
+        The chance of a city by number getting cubes of its color, none
+        once the color is eradicated
+        """
+        if self.eradicated(city):
+            return 0.0
+        odds = self.card_odds()
+        return odds.epidemic[city] + odds.drawn[city]
+
+    def outbreak(self, city):
+        """
+        The chance of a city by number outbreaking in its color
+        """
+        if self.eradicated(city):
+            return 0.0
+        odds = self.card_odds()
+        cubes = self.gs.cubes[city * 4 + self.gs.board.colors[city]]
+        if not cubes:
+            # 3 cubes from an epidemic, then the card comes up again
+            return odds.redrawn[city]
+        if cubes < game.MAX_CUBES:
+            return odds.epidemic[city]
+        return odds.epidemic[city] + odds.drawn[city]
+
+    def infections(self):
+        """
+        The chances of infection of every city, by number
+        """
+        return [self.infection(city) for city in range(len(self.gs.board))]
+
+    def outbreaks(self):
+        """
+        The chances of an outbreak of every city, by number
+        """
+        return [self.outbreak(city) for city in range(len(self.gs.board))]
@@ -0,0 +1,102 @@
+"""
+Monte Carlo estimates of the chance of winning from a game
+
+A rollout forks the game, redeals the cards nobody has seen (see
+GameState.redeal) and plays it out with a policy. Rollouts are played in
+batches until the confidence interval of the win rate is narrow enough:
+
+  estimate = rollout.evaluate(gs, accuracy=0.02)
+  print(estimate.win_rate, estimate.low, estimate.high)
+
+A rollout stops as soon as the game is lost, which the game itself checks
+on every outbreak, infection and draw, or as soon as it can't be won any
+more because a disease can no longer get the cards for its cure.
+"""
+
+import math
+import random
+import statistics
+from collections import namedtuple
+
+import engine
+import game
+
+CURE_CARDS = 5
+
+Estimate = namedtuple('Estimate', ['win_rate', 'low', 'high', 'rollouts', 'wins', 'pruned'])
+
+def unwinnable(gs):
+    """
+    Whether a disease without a cure has fewer than CURE_CARDS of its city
+    cards left in the hands and the player deck, so the game can't be won
+    """
+    board = gs.board
+    left = board.mask(gs.player_deck)
+    for player in gs.player.values():
+        left |= player.hand
+    for c, color in enumerate(game.COLORS):
+        if not gs.cures[color] and bin(left & board.color_masks[c]).count('1') < CURE_CARDS:
+            return True
+    return False
+
+def rollout(gs, policy, seed=None):
+    """
+    Plays a redealt fork of a game to the end with a policy, returns
+    (won, pruned) where pruned is whether it was stopped because the game
+    couldn't be won any more
+    """
+    gs = gs.fork()
+    gs.redeal(seed)
+    if unwinnable(gs):
+        return False, True
+
+    while not gs.game_over():
+        if engine.apply_action(gs, policy(gs)) and unwinnable(gs):
+            return False, True
+    return gs.won, False
+
+def interval(wins, n, z):
+    """
+    The Wilson score interval of a win rate, for a z of the normal
+    distribution
+    """
+    if not n:
+        return 0.0, 1.0
+    p = wins / n
+    centre = p + z * z / (2 * n)
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    scale = 1 + z * z / n
+    # with no wins or only wins one end is exactly 0 or 1, which rounding can miss
+    low = (centre - spread) / scale if wins else 0.0
+    high = (centre + spread) / scale if wins < n else 1.0
+    return max(0.0, low), min(1.0, high)
+
+def evaluate(gs, policy=None, accuracy=0.05, confidence=0.95, batch=32, max_rollouts=10000,
+             seed=None):
+    """
+    Estimates the chance of winning a game, playing rollouts in batches
+    until the confidence interval is at most 2 * accuracy wide or
+    max_rollouts have been played. Rollout i is dealt from
+    engine.game_seed(seed, i), so the same seed gives the same estimate.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError('The confidence must be between 0 and 1')
+    if seed is None:
+        seed = random.randrange(2**32)
+    if policy is None:
+        policy = engine.RandomPolicy(seed=engine.game_seed(seed, 'policy'))
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+    n = wins = pruned = 0
+    low, high = 0.0, 1.0
+    while n < max_rollouts:
+        for i in range(n, min(n + batch, max_rollouts)):
+            won, cut = rollout(gs, policy, engine.game_seed(seed, i))
+            wins += won
+            pruned += cut
+            n += 1
+        low, high = interval(wins, n, z)
+        if (high - low) / 2 <= accuracy:
+            break
+
+    return Estimate(wins / n if n else 0.0, low, high, n, wins, pruned)
@@ -0,0 +1,119 @@
+"""
+How many actions it takes to get from one city to another
+
+The drive distances between every pair of cities are found once per board
+with a breadth first search from each city. A Router then answers queries
+for one game, taking shuttle flights between its research stations and
+flights from a hand of cards into account. Cities are given by number, see
+game.Board.
+"""
+
+import functools
+
+@functools.lru_cache(maxsize=None)
+def drive_distances(board):
+    """
+    Returns the number of drives between every pair of cities, as a tuple
+    with a row of bytes for each city
+    """
+    rows = []
+    for start in range(len(board)):
+        row = bytearray([255]) * len(board)
+        row[start] = 0
+        frontier = [start]
+        while frontier:
+            following = []
+            for city in frontier:
+                for n in board.neighbours[city]:
+                    if row[n] == 255:
+                        row[n] = row[city] + 1
+                        following.append(n)
+            frontier = following
+        rows.append(bytes(row))
+    return tuple(rows)
+
+class Router:
+
+    """
+    Answers minimum-action queries for a game
+
+    Only the distance of every city to its nearest research station is
+    kept on top of the drive distances. It is brought up to date with the
+    game's stations before each query: a new station only needs comparing
+    against, a removed one means the nearest stations are found again.
+    """
+
+    def __init__(self, gs):
+        self.gs = gs
+        self.distances = drive_distances(gs.board)
+        self.stations = 0
+        self.count = 0 # the number of research stations
+        self.nearest = [255] * len(gs.board) # drives to the nearest research station
+        self.sync()
+
+    def sync(self):
+        """
+        Catches up with the research stations of the game
+        """
+        stations = self.gs.stations
+        if stations == self.stations:
+            return
+
+        removed = self.stations & ~stations
+        if removed:
+            self.stations = 0
+            self.count = 0
+            self.nearest = [255] * len(self.gs.board)
+
+        added = stations & ~self.stations
+        while added:
+            city = (added & -added).bit_length() - 1
+            added &= added - 1
+            row = self.distances[city]
+            self.nearest = [min(d, row[i]) for i, d in enumerate(self.nearest)]
+            self.count += 1
+
+        self.stations = stations
+
+    def distance(self, a, b):
+        """
+        The fewest drives and shuttle flights to get from city a to city b
+        """
+        self.sync()
+        drive = self.distances[a][b]
+        if self.count < 2:
+            return drive
+        # drive to the nearest station, shuttle, then drive from the station
+        # nearest to b. Using the same station twice never beats driving.
+        return min(drive, self.nearest[a] + 1 + self.nearest[b])
+
+    def actions(self, a, b, hand=0):
+        """
+        The fewest actions to get from city a to city b, also using direct
+        and charter flights with the city cards of a hand bitmask. At most
+        two cards are worth using: a direct flight to start with and a
+        charter flight to finish.
+        """
+        best = self.distance(a, b)
+        if not hand:
+            return best
+
+        cards = []
+        while hand:
+            cards.append((hand & -hand).bit_length() - 1)
+            hand &= hand - 1
+
+        # (city, actions so far, card used to get there)
+        starts = [(a, 0, None)] + [(c, 1, c) for c in cards]
+        for start, cost, used in starts:
+            best = min(best, cost + self.distance(start, b))
+            for x in cards:
+                if x != used:
+                    best = min(best, cost + self.distance(start, x) + 1)
+        return best
+
+    def actions_to(self, player, name):
+        """
+        The fewest actions for a player to get to a city by name
+        """
+        return self.actions(player.loc, player.board.index[name], player.hand)
@@ -0,0 +1,382 @@
+"""
+A game server for remote agents and players
+
+pandemic serve --port 8765
+
+Every connection gets its own game, kept in memory by the server, and
+plays it with the commands of the terminal game one line at a time:
+
+  new 2 4                    start a game with 2 players at difficulty 4
+  drive chicago
+  direct_flight "new york"
+  treat_disease blue
+  share_knowledge give 2 atlanta
+  discover_cure blue atlanta chicago montreal "new york" washington
+  end_turn
+
+A line starting with '{' is a JSON command and gets a JSON answer:
+
+  {"cmd": "drive", "args": ["chicago"]}
+  {"message": "Player 1 is at chicago with 3 actions left.", "player": 1, ..., "ok": true}
+
+Other lines get a line back starting with 'ok' or 'error'. Agents can also
+play action numbers with 'act' and list the legal ones with 'legal', see
+actions.py.
+
+The server answers a command before it reads the next one from the same
+connection and waits for each answer to be sent, so a client that doesn't
+read its answers stops being read from instead of filling the server's
+memory. A connection that sends nothing for `idle` seconds is closed and
+its game evicted.
+
+`pandemic serve --load-test 2000` plays random games on that many
+connections at once against a server in the same process, and prints how
+many commands a second it answered.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shlex
+import time
+
+import actions
+import engine
+import game
+
+IDLE_SECONDS = 300
+MAX_SESSIONS = 10000
+MAX_LINE = 4096
+
+logger = logging.getLogger(__name__)
+
+# the commands and how many arguments they take, None for any number
+COMMANDS = {'new': (0, 3),
+            'drive': (1, 1),
+            'direct_flight': (1, 1),
+            'charter_flight': (1, 1),
+            'shuttle_flight': (1, 1),
+            'build_research_station': (0, 1),
+            'treat_disease': (0, 1),
+            'share_knowledge': (3, 3),
+            'discover_cure': (1, None),
+            'end_turn': (0, 0),
+            'act': (1, 1),
+            'legal': (0, 0),
+            'connections': (0, 1),
+            'whereami': (0, 0),
+            'state': (0, 0),
+            'quit': (0, 0)}
+
+class Session:
+
+    """
+    The game of one connection
+    """
+
+    def __init__(self, sid):
+        self.id = sid
+        self.env = None
+
+    def state(self):
+        """
+        The parts of the game an agent needs after every action
+        """
+        gs = self.env.gs
+        player = gs.current_player()
+        return {'player': gs.player_turn,
+                'location': player.location,
+                'actions_left': player.actions_left,
+                'cards': player.cards,
+                'outbreaks': gs.outbreaks,
+                'cures': [color for color in game.COLORS if gs.cures[color]],
+                'won': gs.won,
+                'lost': gs.lost}
+
+    def _game(self):
+        if self.env is None:
+            raise ValueError("There isn't a game yet, start one with 'new'")
+        return self.env.gs
+
+    def _play(self, action):
+        gs = self._game()
+        if gs.game_over():
+            raise ValueError("The game is over, start a new one with 'new'")
+        gs, _, done = self.env.step(action)
+        if done:
+            return 'You won!' if gs.won else 'You lost.'
+        player = gs.current_player()
+        return 'Player {0} is at {1} with {2} actions left.'.format(
+            gs.player_turn, player.location, player.actions_left)
+
+    def execute(self, name, args):
+        """
+        Runs a command, returns the answer as a dict with a message.
+        Commands that can't be run raise a ValueError.
+        """
+        if name not in COMMANDS:
+            raise ValueError("I don't know the command '{0}'".format(name))
+        least, most = COMMANDS[name]
+        if len(args) < least or most is not None and len(args) > most:
+            raise ValueError('{0} takes {1} arguments'.format(
+                name, least if least == most else 'at least {0}'.format(least)
+                if most is None else '{0} to {1}'.format(least, most)))
+
+        if name == 'new':
+            # everything is checked before the running game is replaced
+            players = int(args[0]) if args else 2
+            difficulty = int(args[1]) if len(args) > 1 else 4
+            seed = int(args[2]) if len(args) > 2 else None
+            if players not in (2, 3, 4) or difficulty not in (4, 5, 6):
+                raise ValueError('Games have 2 to 4 players and a difficulty of 4 to 6')
+            env = engine.PandemicEnv(players, difficulty)
+            gs = env.reset(seed)
+            self.env = env
+            answer = self.state()
+            answer['message'] = 'Player {0} goes first. Good luck!'.format(gs.player_turn)
+            return answer
+
+        if name == 'act':
+            gs = self._game()
+            index = int(args[0])
+            if not 0 <= index < actions.ACTION_COUNT or not actions.action_mask(gs) >> index & 1:
+                raise ValueError("Action {0} isn't legal now".format(index))
+            message = self._play(index)
+        elif name == 'legal':
+            gs = self._game()
+            legal = list(actions.bits(actions.action_mask(gs)))
+            return {'legal': legal, 'message': ' '.join(map(str, legal))}
+        elif name == 'connections':
+            gs = self._game()
+            city = args[0] if args else gs.current_player().location
+            if city not in gs.board.index:
+                raise ValueError("I can't find the city '{0}'. :(".format(city))
+            connections = [gs.board.names[n] for n in gs.board.neighbours[gs.board.index[city]]]
+            return {'connections': connections, 'message': ', '.join(connections)}
+        elif name == 'whereami':
+            location = self._game().current_player().location
+            return {'location': location, 'message': location}
+        elif name == 'state':
+            self._game()
+            answer = self.state()
+            answer['message'] = json.dumps(answer)
+            return answer
+        elif name == 'quit':
+            return {'message': 'Thanks for playing!'}
+        elif name == 'share_knowledge':
+            if int(args[1]) not in self._game().player:
+                raise ValueError("There isn't a player {0}".format(args[1]))
+            message = self._play((name, args[0], int(args[1]), args[2]))
+        elif name == 'discover_cure':
+            message = self._play((name, args[0], list(args[1:])))
+        else:
+            message = self._play((name,) + tuple(args))
+
+        answer = self.state()
+        answer['message'] = message
+        return answer
+
+    def handle(self, line):
+        """
+        Answers a line of a client, returns the bytes to send back and
+        whether to close the connection
+        """
+        framed = line.lstrip().startswith(b'{')
+        try:
+            if framed:
+                request = json.loads(line)
+                name = request.get('cmd') if isinstance(request, dict) else None
+                args = request.get('args', []) if isinstance(request, dict) else None
+                if not isinstance(name, str) or not isinstance(args, list):
+                    raise ValueError('A JSON command is an object with a cmd and a list of args')
+                args = [a if isinstance(a, str) else str(a) for a in args]
+            else:
+                words = shlex.split(line.decode())
+                name, args = (words[0], words[1:]) if words else ('', [])
+            answer = self.execute(name, args)
+        except (ValueError, KeyError) as msg:
+            # json and unicode decoding errors are ValueErrors too
+            if framed:
+                return json.dumps({'ok': False, 'message': str(msg)}).encode() + b'\n', False
+            return 'error {0}\n'.format(' '.join(str(msg).split())).encode(), False
+
+        if framed:
+            answer['ok'] = True
+            return json.dumps(answer).encode() + b'\n', name == 'quit'
+        return 'ok {0}\n'.format(answer['message']).encode(), name == 'quit'
+
+class Server:
+
+    """
+    Hosts the sessions of every connection
+    """
+
+    def __init__(self, idle=IDLE_SECONDS, max_sessions=MAX_SESSIONS):
+        self.idle = idle
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.next_id = 1
+        self.peak = 0
+        self.commands = 0
+        self.evicted = 0
+
+    async def handle(self, reader, writer):
+        """
+        Plays the game of one connection until it is closed, quits or idles
+        """
+        # keep little unsent data per connection, so drain waits on slow readers early
+        writer.transport.set_write_buffer_limits(high=MAX_LINE * 4)
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b'error The server is full, try again later\n')
+            await self._close(writer)
+            return
+
+        session = Session(self.next_id)
+        self.next_id += 1
+        self.sessions[session.id] = session
+        self.peak = max(self.peak, len(self.sessions))
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle)
+                except asyncio.TimeoutError:
+                    self.evicted += 1
+                    writer.write(b'error Closed after idling\n')
+                    break
+                except ValueError:
+                    # the line is longer than MAX_LINE
+                    writer.write('error Lines must be shorter than {0} bytes\n'
+                                 .format(MAX_LINE).encode())
+                    break
+                if not line:
+                    break
+
+                try:
+                    answer, stop = session.handle(line)
+                except Exception:
+                    # a bug in one command shouldn't cost the client its connection
+                    logger.exception('Session %s failed on %r', session.id, line)
+                    message = 'Something went wrong running that command'
+                    answer = (json.dumps({'ok': False, 'message': message}).encode() + b'\n'
+                              if line.lstrip().startswith(b'{') else
+                              'error {0}\n'.format(message).encode())
+                    stop = False
+                self.commands += 1
+                writer.write(answer)
+                await asyncio.wait_for(writer.drain(), self.idle)
+                if stop:
+                    break
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            del self.sessions[session.id]
+            await self._close(writer)
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def start(self, host='127.0.0.1', port=8765, backlog=1024):
+        """
+        Starts listening, returns the asyncio server
+        """
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE,
+                                          backlog=backlog)
+
+async def play_client(host, port, moves, seed, latencies):
+    """
+    Plays random legal actions over one connection until it has sent
+    `moves` commands, starting a new game whenever one ends
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=2**16)
+
+    async def ask(cmd, *args):
+        start = time.perf_counter()
+        writer.write(json.dumps({'cmd': cmd, 'args': args}).encode() + b'\n')
+        await writer.drain()
+        answer = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if not answer['ok']:
+            raise ValueError(answer['message'])
+        return answer
+
+    sent = 0
+    done = True
+    while sent < moves:
+        if done:
+            await ask('new', 2, 4, rng.randrange(2**32))
+            sent += 1
+        legal = (await ask('legal'))['legal']
+        answer = await ask('act', rng.choice(legal))
+        sent += 2
+        done = answer['won'] or answer['lost']
+    await ask('quit')
+    writer.close()
+    await writer.wait_closed()
+
+async def load_test(sessions, moves, seed=0, idle=IDLE_SECONDS):
+    """
+    Plays `sessions` connections at once against a server in this process,
+    returns a dict of what it measured
+    """
+    server = Server(idle=idle, max_sessions=max(sessions, MAX_SESSIONS))
+    listener = await server.start('127.0.0.1', 0, backlog=sessions)
+    host, port = listener.sockets[0].getsockname()[:2]
+    latencies = []
+
+    start = time.perf_counter()
+    async with listener:
+        await asyncio.gather(*(play_client(host, port, moves, engine.game_seed(seed, i), latencies)
+                               for i in range(sessions)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {'sessions': sessions,
+            'peak_sessions': server.peak,
+            'commands': server.commands,
+            'seconds': seconds,
+            'commands_per_sec': server.commands / seconds,
+            'latency_p50_ms': 1e3 * latencies[len(latencies) // 2],
+            'latency_p99_ms': 1e3 * latencies[len(latencies) * 99 // 100]}
+
+async def serve(host, port, idle, max_sessions):
+    server = Server(idle, max_sessions)
+    listener = await server.start(host, port)
+    print('Serving Pandemic on {0}:{1}'.format(host, port))
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve games of Pandemic over TCP.",
+                                     prog='pandemic serve')
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--idle", help="seconds before an idle connection is closed",
+                        type=float, default=IDLE_SECONDS)
+    parser.add_argument("--max-sessions", help="the most games kept at once",
+                        type=int, default=MAX_SESSIONS)
+    parser.add_argument("--load-test", metavar="SESSIONS", type=int,
+                        help="play random games on SESSIONS connections and report the load")
+    parser.add_argument("--moves", help="commands each load test connection sends",
+                        type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        report = asyncio.run(load_test(args.load_test, args.moves, idle=args.idle))
+        for k, v in report.items():
+            print('{0:>18} : {1:.6g}'.format(k, v) if isinstance(v, float) else
+                  '{0:>18} : {1}'.format(k, v))
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle, args.max_sessions))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
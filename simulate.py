@@ -0,0 +1,182 @@
+"""
+Headless tournaments played on a pool of worker processes
+
+pandemic simulate -n 10000 --players 2 3 4 --difficulty 4 5 6 --seed 1
+
+Games are cut into shards of SHARD_SIZE and each shard is played by a
+worker. Every game is seeded from the master seed and its position in the
+tournament, so the same seed gives the same results for any number of
+workers. Results are aggregated by role combination, player count and
+difficulty.
+"""
+
+import argparse
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+import profiling
+
+SHARD_SIZE = 250
+
+Shard = namedtuple('Shard', ['players', 'difficulty', 'seed', 'start', 'games'])
+
+class CellStats:
+
+    """
+    Totals for the games played by one role combination, player count and
+    difficulty
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.turns = 0
+        self.outbreaks = 0
+
+    def add(self, result):
+        self.games += 1
+        self.wins += result.won
+        self.turns += result.turns
+        self.outbreaks += result.outbreaks
+
+    def merge(self, other):
+        self.games += other.games
+        self.wins += other.wins
+        self.turns += other.turns
+        self.outbreaks += other.outbreaks
+
+    def win_rate(self):
+        return self.wins / self.games if self.games else 0.0
+
+def play_shard(shard, policy=engine.RandomPolicy, profile=False):
+    """
+    Plays a shard of games, returns (pid, games, seconds, stats, profile)
+    where stats maps (roles, players, difficulty) to CellStats, and profile
+    is the state of a profiling.Profiler when asked for or None
+    """
+    start = time.perf_counter()
+    stats = {}
+    agent = policy(seed=engine.game_seed(shard.seed, 'policy {0}'.format(shard.start)))
+    profiler = profiling.Profiler().start() if profile else None
+
+    for result in engine.run_batch(shard.games, agent, shard.players, shard.difficulty,
+                                   seed=shard.seed, start=shard.start):
+        key = (tuple(sorted(result.roles)), shard.players, shard.difficulty)
+        if key not in stats:
+            stats[key] = CellStats()
+        stats[key].add(result)
+
+    if profiler is not None:
+        profiler.stop()
+        profile = profiler.state()
+    else:
+        profile = None
+    return os.getpid(), shard.games, time.perf_counter() - start, stats, profile
+
+def make_shards(games, players, difficulties, seed, shard_size=SHARD_SIZE):
+    """
+    Splits the games of every player count and difficulty into shards
+    """
+    shards = []
+    for p in players:
+        for d in difficulties:
+            cell_seed = engine.game_seed(seed, 'players {0} difficulty {1}'.format(p, d))
+            for start in range(0, games, shard_size):
+                shards.append(Shard(p, d, cell_seed, start, min(shard_size, games - start)))
+    return shards
+
+def tournament(games, players=(2,), difficulties=(4,), seed=None, workers=None,
+               policy=engine.RandomPolicy, shard_size=SHARD_SIZE, profiler=None):
+    """
+    Plays games for every player count and difficulty, returns a dict with
+    the seed used, the stats per cell and (games, seconds) per worker.
+
+    A running profiling.Profiler times the games played in this process,
+    and takes in the timings of the workers.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    workers = workers or os.cpu_count()
+    shards = make_shards(games, players, difficulties, seed, shard_size)
+
+    start = time.perf_counter()
+    if workers == 1:
+        done = [play_shard(shard, policy) for shard in shards]
+    elif profiler is not None:
+        # the workers time themselves, forking them mustn't copy the wrappers
+        with profiler.paused(), ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(play_shard, shards, [policy] * len(shards),
+                                 [True] * len(shards)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(play_shard, shards, [policy] * len(shards)))
+    elapsed = time.perf_counter() - start
+
+    cells = {}
+    per_worker = {}
+    for pid, n, seconds, stats, profile in done:
+        if profile is not None:
+            profiler.merge(profile)
+        worker = per_worker.setdefault(pid, [0, 0.0])
+        worker[0] += n
+        worker[1] += seconds
+        for key, cell in stats.items():
+            if key not in cells:
+                cells[key] = CellStats()
+            cells[key].merge(cell)
+
+    return {'seed': seed,
+            'games': sum(shard.games for shard in shards),
+            'seconds': elapsed,
+            'cells': cells,
+            'workers': per_worker}
+
+def print_report(report):
+    """
+    Prints the win rates per cell and the speed of every worker
+    """
+    print('Seed {0}: {1} games in {2:.2f}s ({3:.0f} games/sec)\n'.format(
+        report['seed'], report['games'], report['seconds'],
+        report['games'] / report['seconds']))
+
+    print('{0:<72} {1:>7} {2:>7} {3:>7} {4:>9}'.format(
+        'roles', 'players', 'diff', 'games', 'win rate'))
+    for key in sorted(report['cells']):
+        roles, players, difficulty = key
+        cell = report['cells'][key]
+        print('{0:<72} {1:>7} {2:>7} {3:>7} {4:>9.3f}'.format(
+            ', '.join(roles), players, difficulty, cell.games, cell.win_rate()))
+
+    print('\n{0:>8} {1:>9} {2:>10}'.format('worker', 'games', 'games/sec'))
+    for pid, (games, seconds) in sorted(report['workers'].items()):
+        print('{0:>8} {1:>9} {2:>10.0f}'.format(pid, games, games / seconds))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays headless games of Pandemic on every core.",
+                                     prog='pandemic simulate')
+    parser.add_argument("-n", "--games", help="games per player count and difficulty",
+                        type=int, default=1000)
+    parser.add_argument("--players", help="the numbers of players",
+                        type=int, nargs='+', choices=[2, 3, 4], default=[2])
+    parser.add_argument("--difficulty", help="the numbers of epidemic cards",
+                        type=int, nargs='+', choices=[4, 5, 6], default=[4])
+    parser.add_argument("--seed", help="master seed, random if not given", type=int)
+    parser.add_argument("--workers", help="number of processes, defaults to every core",
+                        type=int)
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    workers = args.workers
+    if profiling.in_process(args):
+        # cProfile and tracemalloc only see this process
+        workers = 1
+    with profiling.session(args) as profiler:
+        print_report(tournament(args.games, args.players, args.difficulty, args.seed, workers,
+                                profiler=profiler))
+
+if __name__ == '__main__':
+    main()
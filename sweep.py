@@ -0,0 +1,395 @@
+"""
+Win rates swept over player counts, difficulties, role sets and agent
+parameters
+
+pandemic sweep --players 2 3 4 --difficulty 4 5 6 --roles all --checkpoint sweep.json
+
+A cell is a player count, a difficulty, a set of roles and the parameters
+of the agent (--param name=value,value,...). Every cell first plays
+--min-games games, and then the games are handed out a shard at a time to
+the cell whose win rate confidence interval is widest, until every interval
+is at most 2 * accuracy wide or has had --max-games. The shards are played
+on a pool of worker processes.
+
+Game i of every cell with the same player count and difficulty is dealt
+from the same seed, with the cell's roles given instead of dealt (see
+game.clean_setup), so the cells are compared on the same shuffles.
+
+With --checkpoint the results so far are written to a JSON file every
+--every seconds, when interrupted and at the end. Running the same sweep
+again carries on from it, replaying the shards that were being played when
+it was written.
+"""
+
+import argparse
+import ast
+import contextlib
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import agents
+import engine
+import game
+import profiling
+import rollout
+from simulate import CellStats
+
+SHARD_SIZE = 50
+
+# the agents a sweep can play, made with a seed and the parameters of a cell
+POLICIES = {'random': engine.RandomPolicy,
+            'greedy': agents.GreedyPolicy,
+            'cure': agents.CurePolicy}
+
+Cell = namedtuple('Cell', ['players', 'difficulty', 'roles', 'params'])
+
+def make_cells(players, difficulties, roles='dealt', grid=None):
+    """
+    Returns every cell of the player counts, difficulties and agent
+    parameters. roles is 'all' for a cell per set of roles, or 'dealt' to
+    deal them at random. grid maps parameter names to lists of values.
+    """
+    if roles not in ('all', 'dealt'):
+        raise ValueError("roles must be 'all' or 'dealt', not {0}".format(roles))
+    grid = grid or {}
+    params = [tuple(zip(grid, values)) for values in itertools.product(*grid.values())]
+    cells = []
+    for p in players:
+        role_sets = itertools.combinations(game.ROLES, p) if roles == 'all' else [None]
+        for role_set, d, param in itertools.product(role_sets, difficulties, params):
+            cells.append(Cell(p, d, role_set, param))
+    return cells
+
+def play_cell(cell, policy, seed, start, games, profile=False):
+    """
+    Plays games start to start + games of a cell, returns (cell, start,
+    CellStats, profile) where profile is the state of a profiling.Profiler
+    when asked for or None
+    """
+    cell_seed = engine.game_seed(seed, 'players {0} difficulty {1}'.format(cell.players,
+                                                                           cell.difficulty))
+    agent = POLICIES[policy](seed=engine.game_seed(cell_seed, 'policy {0} {1}'.format(start,
+                                                                                    cell)),
+                             **dict(cell.params))
+    profiler = profiling.Profiler().start() if profile else None
+    stats = CellStats()
+    for result in engine.run_batch(games, agent, cell.players, cell.difficulty,
+                                   seed=cell_seed, start=start, roles=cell.roles):
+        stats.add(result)
+
+    if profiler is not None:
+        profiler.stop()
+        profile = profiler.state()
+    else:
+        profile = None
+    return cell, start, stats, profile
+
+class Sweep:
+
+    """
+    The state of a sweep: the stats of every cell, the next game each one
+    hands out and the shards to play again after resuming
+    """
+
+    def __init__(self, cells, policy='random', seed=None, accuracy=0.02, confidence=0.95,
+                 min_games=100, max_games=10000, shard_size=SHARD_SIZE):
+        if policy not in POLICIES:
+            raise ValueError("I don't know the policy '{0}'".format(policy))
+        if not 0 < confidence < 1:
+            raise ValueError('The confidence must be between 0 and 1')
+        if shard_size < 1 or min_games > max_games:
+            raise ValueError('Shards need a game, and max_games must be at least min_games')
+        for params in {cell.params for cell in cells}:
+            try:
+                POLICIES[policy](seed=0, **dict(params))
+            except TypeError as msg:
+                raise ValueError("The {0} policy can't take {1}: {2}".format(
+                    policy, dict(params), msg))
+        self.policy = policy
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.accuracy = accuracy
+        self.confidence = confidence
+        self.z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        self.min_games = min_games
+        self.max_games = max_games
+        self.shard_size = shard_size
+        self.stats = {cell: CellStats() for cell in cells}
+        self.next = dict.fromkeys(cells, 0)
+        self.redo = []
+        self.seconds = 0.0
+
+    """
+    Scheduling
+    """
+
+    def interval(self, cell):
+        return rollout.interval(self.stats[cell].wins, self.stats[cell].games, self.z)
+
+    def spread(self, cell):
+        """
+        Half the width of the interval a cell will have once the games
+        handed out to it are played, if its win rate stays the same
+        """
+        stats = self.stats[cell]
+        wins = stats.wins * self.next[cell] / stats.games if stats.games else 0
+        low, high = rollout.interval(wins, self.next[cell], self.z)
+        return (high - low) / 2
+
+    def next_shard(self):
+        """
+        Returns the (cell, start, games) to play next, None once every cell
+        has had enough games handed out
+        """
+        if self.redo:
+            return self.redo.pop()
+        short = [cell for cell, n in self.next.items() if n < self.min_games]
+        if short:
+            cell = min(short, key=self.next.get)
+        else:
+            wide = [(self.spread(cell), cell) for cell, n in self.next.items()
+                    if n < self.max_games]
+            wide = [(spread, cell) for spread, cell in wide if spread > self.accuracy]
+            if not wide:
+                return None
+            cell = max(wide, key=lambda pair: pair[0])[1]
+        start = self.next[cell]
+        limit = self.max_games if start >= self.min_games else self.min_games
+        games = min(self.shard_size, limit - start)
+        self.next[cell] += games
+        return cell, start, games
+
+    def add(self, cell, start, stats):
+        self.stats[cell].merge(stats)
+
+    def run(self, workers=None, checkpoint=None, every=60.0, profiler=None):
+        """
+        Plays shards until every cell is done, on `workers` processes or in
+        this one if workers is 1. Saves to the checkpoint path as it goes.
+
+        A running profiling.Profiler times the games played in this process,
+        and takes in the timings of the workers.
+        """
+        workers = workers or os.cpu_count()
+        seconds = self.seconds
+        start = last = time.perf_counter()
+        pending = {}
+
+        def save():
+            self.seconds = seconds + time.perf_counter() - start
+            self.save(checkpoint, pending.values())
+
+        try:
+            if workers == 1:
+                shard = self.next_shard()
+                while shard is not None:
+                    pending[None] = shard
+                    self.add(*play_cell(shard[0], self.policy, self.seed, *shard[1:])[:3])
+                    del pending[None]
+                    if checkpoint and time.perf_counter() - last >= every:
+                        save()
+                        last = time.perf_counter()
+                    shard = self.next_shard()
+            else:
+                # the workers time themselves, forking them mustn't copy the wrappers
+                paused = profiler.paused() if profiler is not None else contextlib.nullcontext()
+                with paused, ProcessPoolExecutor(max_workers=workers) as pool:
+                    while True:
+                        # keep every worker busy with one shard waiting behind it
+                        while len(pending) < 2 * workers:
+                            shard = self.next_shard()
+                            if shard is None:
+                                break
+                            future = pool.submit(play_cell, shard[0], self.policy, self.seed,
+                                                 *shard[1:], profile=profiler is not None)
+                            pending[future] = shard
+                        if not pending:
+                            break
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            del pending[future]
+                            cell, start_game, stats, profile = future.result()
+                            if profile is not None:
+                                profiler.merge(profile)
+                            self.add(cell, start_game, stats)
+                        if checkpoint and time.perf_counter() - last >= every:
+                            save()
+                            last = time.perf_counter()
+        finally:
+            self.seconds = seconds + time.perf_counter() - start
+            if checkpoint:
+                save()
+
+    """
+    Checkpoints
+    """
+
+    def state(self, pending=()):
+        """
+        The sweep as plain data for JSON, with the pending shards to be
+        played again
+        """
+        index = {cell: i for i, cell in enumerate(self.stats)}
+        return {'policy': self.policy,
+                'seed': self.seed,
+                'shard_size': self.shard_size,
+                'seconds': self.seconds,
+                'cells': [{'players': cell.players,
+                           'difficulty': cell.difficulty,
+                           'roles': cell.roles,
+                           'params': cell.params,
+                           'next': self.next[cell],
+                           'games': stats.games,
+                           'wins': stats.wins,
+                           'turns': stats.turns,
+                           'outbreaks': stats.outbreaks}
+                          for cell, stats in self.stats.items()],
+                'redo': [[index[cell], start, games]
+                         for cell, start, games in itertools.chain(self.redo, pending)]}
+
+    def save(self, path, pending=()):
+        """
+        Writes the sweep to path, replacing it in one go so an interrupted
+        save leaves the last checkpoint
+        """
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.state(pending), f)
+        os.replace(path + '.tmp', path)
+
+    def restore(self, state):
+        """
+        Carries on from the state of a checkpoint of the same sweep
+        """
+        cells = [Cell(c['players'], c['difficulty'],
+                      tuple(c['roles']) if c['roles'] is not None else None,
+                      tuple(tuple(param) for param in c['params']))
+                 for c in state['cells']]
+        if set(cells) != set(self.stats) or state['policy'] != self.policy \
+           or state['seed'] != self.seed or state['shard_size'] != self.shard_size:
+            raise ValueError('The checkpoint is of a different sweep, with seed {0}'.format(
+                state['seed']))
+        for cell, c in zip(cells, state['cells']):
+            stats = self.stats[cell] = CellStats()
+            stats.games, stats.wins, stats.turns, stats.outbreaks = \
+                c['games'], c['wins'], c['turns'], c['outbreaks']
+            self.next[cell] = c['next']
+        self.redo = [(cells[i], start, games) for i, start, games in state['redo']]
+        self.seconds = state['seconds']
+
+    """
+    Results
+    """
+
+    def print_report(self):
+        """
+        Prints a table of the cells, the highest win rate first for each
+        player count and difficulty
+        """
+        games = sum(stats.games for stats in self.stats.values())
+        print('Seed {0}: {1} games in {2} cells, {3:.2f}s of sweeping\n'.format(
+            self.seed, games, len(self.stats), self.seconds))
+        print('{0:>7} {1:>4} {2:<58} {3:<16} {4:>7} {5:>8} {6:>15} {7:>6} {8:>9}'.format(
+            'players', 'diff', 'roles', 'params', 'games', 'win rate',
+            '{0:.0%} interval'.format(self.confidence), 'turns', 'outbreaks'))
+        order = sorted(self.stats, key=lambda cell: (cell.players, cell.difficulty,
+                                                     -self.stats[cell].win_rate(),
+                                                     cell.roles or (), cell.params))
+        for cell in order:
+            stats = self.stats[cell]
+            low, high = self.interval(cell)
+            print('{0:>7} {1:>4} {2:<58} {3:<16} {4:>7} {5:>8.3f} {6:>7.3f}-{7:<7.3f} '
+                  '{8:>6.1f} {9:>9.2f}'.format(
+                      cell.players, cell.difficulty,
+                      ', '.join(cell.roles) if cell.roles else 'dealt',
+                      ' '.join('{0}={1}'.format(k, v) for k, v in cell.params) or '-',
+                      stats.games, stats.win_rate(), low, high,
+                      stats.turns / stats.games if stats.games else 0.0,
+                      stats.outbreaks / stats.games if stats.games else 0.0))
+
+def parse_param(text):
+    """
+    Turns 'name=value,value,...' into (name, [values]), values being
+    Python literals or else strings
+    """
+    name, sep, values = text.partition('=')
+    if not sep or not name or not values:
+        raise argparse.ArgumentTypeError("Parameters are given as name=value,value,...")
+
+    def literal(value):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return name, [literal(value) for value in values.split(',')]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="""Sweeps the win rate of Pandemic over
+                                     player counts, difficulties, roles and agent parameters.""",
+                                     prog='pandemic sweep')
+    parser.add_argument("--players", help="the numbers of players",
+                        type=int, nargs='+', choices=[2, 3, 4], default=[2, 3, 4])
+    parser.add_argument("--difficulty", help="the numbers of epidemic cards",
+                        type=int, nargs='+', choices=[4, 5, 6], default=[4, 5, 6])
+    parser.add_argument("--roles", help="a cell per set of roles, or roles dealt at random",
+                        choices=['all', 'dealt'], default='dealt')
+    parser.add_argument("--policy", help="the agent playing the games",
+                        choices=sorted(POLICIES), default='random')
+    parser.add_argument("--param", help="an agent parameter and the values to sweep",
+                        metavar="NAME=VALUES", type=parse_param, action='append', default=[])
+    parser.add_argument("--accuracy", help="the half width of interval to reach in every cell",
+                        type=float, default=0.02)
+    parser.add_argument("--confidence", help="the confidence of the intervals",
+                        type=float, default=0.95)
+    parser.add_argument("--min-games", help="games every cell plays first",
+                        type=int, default=100)
+    parser.add_argument("--max-games", help="the most games a cell plays",
+                        type=int, default=10000)
+    parser.add_argument("--shard-size", help="games handed out at a time",
+                        type=int, default=SHARD_SIZE)
+    parser.add_argument("--seed", help="master seed, random if not given", type=int)
+    parser.add_argument("--workers", help="number of processes, defaults to every core",
+                        type=int)
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="save the sweep to PATH as it goes, and carry on from it")
+    parser.add_argument("--every", help="seconds between checkpoints",
+                        type=float, default=60.0)
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    state = None
+    seed = args.seed
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        with open(args.checkpoint) as f:
+            state = json.load(f)
+        seed = state['seed'] if seed is None else seed
+
+    try:
+        cells = make_cells(args.players, args.difficulty, args.roles, dict(args.param))
+        sweep = Sweep(cells, args.policy, seed, args.accuracy, args.confidence,
+                      args.min_games, args.max_games, args.shard_size)
+        if state is not None:
+            sweep.restore(state)
+    except ValueError as msg:
+        parser.error(msg)
+    if state is not None:
+        print('Carrying on from {0}, {1} games played\n'.format(
+            args.checkpoint, sum(c['games'] for c in state['cells'])))
+
+    workers = args.workers
+    if profiling.in_process(args):
+        # cProfile and tracemalloc only see this process
+        workers = 1
+    with profiling.session(args) as profiler:
+        try:
+            sweep.run(workers, args.checkpoint, args.every, profiler=profiler)
+        except KeyboardInterrupt:
+            print('\nStopped, run it again to carry on' if args.checkpoint else '\nStopped')
+        sweep.print_report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+import actions
+import engine
+
+def playable(gs, index):
+    """
+    Whether an action number can be played, found by playing it on a fork
+    """
+    try:
+        engine.apply_action(gs.fork(), index)
+    except (ValueError, KeyError):
+        return False
+    return True
+
+@pytest.mark.parametrize('players', [2, 3, 4])
+def test_mask_matches_playing_every_action(players):
+    rng = random.Random(players)
+    env = engine.PandemicEnv(players, 4)
+    positions = 0
+    for seed in range(3):
+        gs = env.reset(seed)
+        done = False
+        while not done:
+            mask = actions.action_mask(gs)
+            for index in range(actions.ACTION_COUNT):
+                assert bool(mask >> index & 1) == playable(gs, index), \
+                    (seed, index, actions.decode(gs, index))
+            positions += 1
+            gs, _, done = env.step(rng.choice(list(actions.bits(mask))))
+    assert positions > 50
+
+def test_decode_and_encode_round_trip():
+    env = engine.PandemicEnv(4, 4)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(3)
+    for _ in range(40):
+        for index in actions.bits(actions.action_mask(gs)):
+            assert actions.encode(gs, actions.decode(gs, index)) == index
+        gs, _, done = env.step(policy(gs))
+        if done:
+            break
+
+def test_treating_without_a_color_is_the_city_color():
+    gs = engine.PandemicEnv(2, 4).reset(1)
+    treat = actions.TREAT + gs.board.colors[gs.current_player().loc]
+    assert actions.encode(gs, ('treat_disease',)) == treat
+    assert actions.encode(gs, ('treat_disease', '')) == treat
+    assert actions.encode(gs, ('treat_disease', 'blue')) == actions.TREAT + 1
@@ -0,0 +1,62 @@
+import pytest
+
+import actions
+import agents
+import engine
+import game
+import observation
+
+@pytest.mark.parametrize('agent', [agents.GreedyPolicy, agents.CurePolicy])
+@pytest.mark.parametrize('explore', [0.0, 0.3])
+def test_agents_play_legal_moves(agent, explore):
+    policy = agent(seed=1, explore=explore)
+    envs = [engine.PandemicEnv(2, 4) for _ in range(8)]
+    for seed, env in enumerate(envs):
+        env.reset(seed)
+    while envs:
+        playing = []
+        for env, move in zip(envs, policy.act([env.gs for env in envs])):
+            assert actions.action_mask(env.gs) >> move & 1
+            _, _, done = env.step(move)
+            if not done:
+                playing.append(env)
+        envs = playing
+
+def test_decide_works_without_act():
+    gs = engine.PandemicEnv(2, 4).reset(3)
+    for agent in (agents.GreedyPolicy(), agents.CurePolicy()):
+        assert actions.action_mask(gs) >> agent.decide(gs) & 1
+        assert agent(gs) == agent.decide(gs)
+
+def test_play_batch_is_seeded():
+    first = list(agents.play_batch(20, agents.CurePolicy(seed=0), batch=8, seed=2))
+    again = list(agents.play_batch(20, agents.CurePolicy(seed=0), batch=8, seed=2))
+    assert len(first) == 20
+    assert sorted(first) == sorted(again)
+    assert sum(result.cures for result in first)
+
+def test_play_batch_with_a_plain_policy():
+    results = list(agents.play_batch(5, engine.RandomPolicy(seed=0), batch=2, seed=2))
+    assert len(results) == 5
+
+@pytest.mark.parametrize('agent', [agents.GreedyPolicy, agents.CurePolicy])
+def test_decide_batch_makes_the_moves_of_decide(agent):
+    numpy = pytest.importorskip('numpy')
+    policy = agent(seed=0)
+    envs = [engine.PandemicEnv(2 + seed % 3, 4) for seed in range(32)]
+    for seed, env in enumerate(envs):
+        env.reset(seed)
+    while envs:
+        states = [env.gs for env in envs]
+        rows = numpy.frombuffer(observation.Encoder(len(states)).encode_batch(states),
+                                numpy.uint8).reshape(-1, observation.SIZE)
+        moves = policy.act(states, rows)
+        assert moves == [policy.decide(gs) for gs in states]
+        envs = [env for env, move in zip(envs, moves) if not env.step(move)[2]]
+
+def test_hops_stay_put_for_unreachable_cities():
+    board = game.Board([game.CityInfo('a', 'blue', 1, ('b',)),
+                        game.CityInfo('b', 'blue', 1, ('a',)),
+                        game.CityInfo('c', 'red', 1, ())])
+    assert agents.hops(board) == (bytes([0, 1, 0]), bytes([0, 1, 1]), bytes([2, 2, 2]))
+    assert agents.rings(board)[2] == (0b100,)
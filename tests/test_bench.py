@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import actions
+import agents
+import engine
+import game
+import observation
+import record
+import replay
+import risk
+import rollout
+
+@pytest.fixture
+def midgame():
+    """
+    The position of bench.py's benchmarks, 40 random moves into a game
+    """
+    env = engine.PandemicEnv(2, 4)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    for _ in range(40):
+        gs, _, _ = env.step(policy(gs))
+    return gs
+
+def test_games(benchmark):
+    results = benchmark(lambda: list(engine.run_batch(20, engine.RandomPolicy(seed=0), seed=0)))
+    assert len(results) == 20
+
+@pytest.mark.parametrize('players', [2, 4])
+def test_setup(benchmark, players):
+    gs = benchmark(lambda: game.clean_setup(players, 4, game.GameState(quiet=True, seed=0,
+                                                                        fast=True)))
+    assert len(gs.player) == players
+
+def test_action_mask(benchmark, midgame):
+    assert benchmark(actions.action_mask, midgame)
+
+@pytest.mark.parametrize('clone', ['fork', 'snapshot'])
+def test_clone(benchmark, midgame, clone):
+    if clone == 'fork':
+        benchmark(midgame.fork)
+    else:
+        benchmark(lambda: midgame.restore(midgame.snapshot()))
+
+def test_rehash(benchmark, midgame):
+    expected = midgame.hash
+    assert benchmark(midgame.rehash) == expected
+
+def test_outbreak_cascade(benchmark):
+    # as in bench.bench_outbreak, black gets a supply that can't run out
+    gs = game.GameState(quiet=True)
+    gs.outbreak_limit = 1000
+    gs.cubes_in_storage['black'] = 10**6
+    for city in range(len(gs.board)):
+        gs.set_cubes(city, game.COLOR_INDEX['black'], 3)
+    start = gs.snapshot()
+    benchmark.pedantic(gs.outbreak, args=('cairo', 'black'),
+                       setup=lambda: gs.restore(start), rounds=200)
+    assert gs.outbreaks == len(gs.board)
+
+def test_encode_batch(benchmark, midgame):
+    states = [midgame.fork() for _ in range(256)]
+    encoder = observation.Encoder(len(states))
+    assert len(benchmark(encoder.encode_batch, states)) == len(states) * observation.SIZE
+
+@pytest.mark.parametrize('agent', [agents.GreedyPolicy, agents.CurePolicy])
+def test_agent_decisions(benchmark, midgame, agent):
+    states = [midgame.fork() for _ in range(64)]
+    assert len(benchmark(agent(seed=0).act, states)) == len(states)
+
+def test_card_odds(benchmark, midgame):
+    odds = benchmark(risk.card_odds, midgame)
+    assert len(odds.drawn) == len(midgame.board)
+
+def test_rollouts(benchmark):
+    gs = engine.PandemicEnv(2, 4).reset(seed=0)
+    estimate = benchmark(rollout.evaluate, gs, accuracy=0.0, batch=20, max_rollouts=20, seed=0)
+    assert estimate.rollouts == 20
+
+def test_record(benchmark, tmp_path):
+    path = str(tmp_path / 'games.pdr')
+
+    def write():
+        with record.Writer(path) as writer:
+            for _ in record.record_batch(writer, 10, engine.RandomPolicy(seed=0), seed=0):
+                pass
+
+    benchmark(write)
+    assert os.path.getsize(path)
+
+@pytest.mark.parametrize('fast', [True, False])
+def test_replay(benchmark, fast):
+    env = engine.PandemicEnv(2, 4)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(seed=0)
+    moves = []
+    done = False
+    while not done:
+        action = policy(gs)
+        moves.append(actions.encode(gs, action))
+        gs, _, done = env.step(action)
+
+    replayed = benchmark(lambda: replay.Replay(gs.seed, moves, 2, 4, fast=fast).seek(len(moves)))
+    assert replayed.hash == gs.hash
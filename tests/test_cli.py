@@ -0,0 +1,34 @@
+import io
+import sys
+
+import cli
+
+def test_script_from_stdin_leaves_it_open(monkeypatch, capsys):
+    stdin = io.StringIO('drive chicago\nwhereami\n')
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    cli.main(['2', '4', '--seed', '1', '--script', '-', '--render', 'none'])
+    assert not stdin.closed
+    assert capsys.readouterr().out
+
+def test_script_from_a_file_is_closed(tmp_path, monkeypatch):
+    path = tmp_path / 'moves.txt'
+    path.write_text('whereami\n')
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        opened.append(f)
+        return f
+    monkeypatch.setattr('builtins.open', tracking_open)
+    cli.main(['2', '4', '--seed', '1', '--script', str(path), '--render', 'none'])
+    scripts = [f for f in opened if f.name == str(path)]
+    assert scripts and all(f.closed for f in scripts)
+
+def test_script_reports_unknown_colors_and_goes_on(monkeypatch, capsys):
+    script = 'treat_disease purple\ndiscover_cure purple atlanta, chicago\nwhereami\n'
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(script))
+    cli.main(['2', '4', '--seed', '1', '--script', '-', '--render', 'none'])
+    out = capsys.readouterr().out
+    assert out.count("There isn't a purple disease") == 2
+    assert out.rstrip().endswith('atlanta')
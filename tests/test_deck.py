@@ -0,0 +1,105 @@
+import random
+
+import engine
+import game
+import zobrist
+
+BOARD = game.load_board()
+CARDS = list(BOARD.infection_ids)
+
+def infection_deck(*piles):
+    return game.Deck.from_segments([list(pile) for pile in piles], zobrist.INFECTION_DECK_KEYS,
+                                   BOARD.infection_ids)
+
+def test_draws_from_the_top_and_the_bottom():
+    deck = infection_deck(CARDS[:2], CARDS[2:5])
+    assert list(deck) == CARDS[:5]
+    assert deck.segments == [3, 2]
+    assert deck.hash == deck.rehash()
+
+    assert deck.draw() == CARDS[0]
+    assert deck.draw_bottom() == CARDS[4]
+    assert list(deck) == CARDS[1:4]
+    assert deck.segments == [2, 1]
+    assert deck.base == 1
+    assert deck.hash == deck.rehash()
+
+    # emptied segments go
+    assert deck.draw() == CARDS[1]
+    assert deck.segments == [2]
+    assert [deck.draw_bottom(), deck.draw_bottom()] == [CARDS[3], CARDS[2]]
+    assert len(deck) == 0 and deck.segments == [] and deck.hash == 0
+
+def test_segment_cards_count_from_the_top():
+    deck = infection_deck(CARDS[:2], CARDS[2:5], CARDS[5:6])
+    assert [list(deck.segment_cards(i)) for i in range(3)] == [CARDS[:2], CARDS[2:5], CARDS[5:6]]
+
+def test_put_on_top_makes_a_segment():
+    deck = infection_deck(CARDS[:3])
+    deck.draw_bottom()
+    deck.put_on_top(CARDS[10:14])
+    assert list(deck) == CARDS[10:14] + CARDS[:2]
+    assert deck.segments == [2, 4]
+    assert list(deck.segment_cards(0)) == CARDS[10:14]
+    assert deck.hash == deck.rehash()
+
+    deck.put_on_top([])
+    assert deck.segments == [2, 4]
+    assert [deck.draw() for _ in range(5)] == CARDS[10:14] + CARDS[:1]
+    assert deck.segments == [1]
+
+def test_discard_piles_ignore_order():
+    pile = game.Deck(keys=zobrist.INFECTION_DISCARD_KEYS, ids=BOARD.infection_ids,
+                     ordered=False)
+    other = game.Deck(keys=zobrist.INFECTION_DISCARD_KEYS, ids=BOARD.infection_ids,
+                      ordered=False)
+    for card in CARDS[:4]:
+        pile.put_on_top((card,))
+    other.put_on_top(CARDS[3::-1])
+    assert pile.hash == other.hash == pile.rehash()
+    assert pile.segments == []
+    assert pile.take_all() == CARDS[3::-1]
+    assert len(pile) == 0 and pile.hash == 0
+
+def test_shuffle_segments_keeps_their_cards():
+    deck = infection_deck(CARDS[:8], CARDS[8:20], CARDS[20:])
+    deck.shuffle_segments(random.Random(0))
+    assert list(deck) != CARDS
+    for i, pile in enumerate([CARDS[:8], CARDS[8:20], CARDS[20:]]):
+        assert sorted(deck.segment_cards(i)) == sorted(pile)
+    assert deck.hash == deck.rehash()
+
+def test_state_and_copy_restore_the_deck():
+    deck = infection_deck(CARDS[:4], CARDS[4:10])
+    deck.draw_bottom()
+    state = deck.state()
+    clone = deck.copy()
+
+    deck.draw()
+    deck.put_on_top(CARDS[20:23])
+    assert clone.state() == state
+
+    deck.set_state(state)
+    assert deck.state() == clone.state()
+    assert list(deck) == CARDS[:9]
+    assert deck.hash == deck.rehash()
+
+def test_epidemics_intensify_onto_the_infection_deck():
+    gs = engine.PandemicEnv(2, 4).reset(0)
+    deck = gs.infection_deck
+    bottom = list(deck)[-1]
+    discard = set(gs.infection_discard_deck)
+    segments = deck.segments[:]
+    snapshot = gs.snapshot()
+
+    gs.epidemic()
+    assert deck.segments == [segments[0] - 1] + segments[1:] + [len(discard) + 1]
+    assert set(deck.segment_cards(0)) == discard | {bottom}
+    assert len(gs.infection_discard_deck) == 0
+    assert gs.hash == gs.rehash()
+
+    gs.restore(snapshot)
+    assert deck.segments == segments
+    assert set(gs.infection_discard_deck) == discard
+    assert list(deck)[-1] == bottom
+    assert gs.hash == gs.rehash()
@@ -0,0 +1,119 @@
+import pytest
+
+import actions
+import agents
+import engine
+import game
+
+def test_setup_needs_a_fresh_state():
+    gs = game.clean_setup(4, 6, game.GameState(quiet=True, seed=1, fast=True))
+    snapshot = gs.snapshot()
+    with pytest.raises(ValueError):
+        game.clean_setup(2, 4, gs)
+    assert gs.snapshot() == snapshot
+    assert len(gs.player) == 4
+
+def test_setup_deals_the_game():
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=1, fast=True))
+    assert len(gs.player) == 2
+    assert all(len(p.cards) == 4 for p in gs.player.values())
+    assert len(gs.infection_discard_deck) == 9
+    assert len(gs.infection_deck) == len(gs.board) - 9
+    assert sum(gs.cubes) == 18
+
+def recount(gs):
+    """
+    Checks the aggregates the setters keep against a count of the board
+    """
+    cities = range(len(gs.board))
+    for c, color in enumerate(game.COLORS):
+        on_board = sum(gs.cubes[city * 4 + c] for city in cities)
+        assert gs.cubes_in_storage[color] == game.CUBES_PER_COLOR - on_board
+        assert gs.cubes_on_board(color) == on_board
+        assert gs.infected[c] == sum(1 << city for city in cities if gs.cubes[city * 4 + c])
+        assert gs.ready[c] == sum(1 << city for city in cities
+                                  if gs.cubes[city * 4 + c] >= game.MAX_CUBES)
+        if gs.cures[color]:
+            assert gs.cures[color] == (2 if not on_board else 1)
+    assert gs.research_stations == bin(gs.stations).count('1')
+
+@pytest.mark.parametrize('policy', [engine.RandomPolicy, agents.CurePolicy])
+def test_aggregates_match_a_recount(policy):
+    env = engine.PandemicEnv(2, 4)
+    for seed in range(20):
+        gs = env.reset(seed)
+        recount(gs)
+        play = policy(seed=seed)
+        done = False
+        while not done:
+            gs, _, done = env.step(play(gs))
+            recount(gs)
+            recount(gs.fork())
+
+def eradicated(color):
+    """
+    A game with a color cured and none of its cubes on the board
+    """
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=4, fast=True))
+    c = game.COLOR_INDEX[color]
+    for city in actions.bits(gs.infected[c]):
+        gs.set_cubes(city, c, 0)
+    gs.set_cure(color, 1)
+    assert gs.cures[color] == 2
+    return gs
+
+def test_eradicated_colors_are_not_placed():
+    gs = eradicated('blue')
+    snapshot = gs.snapshot()
+    chicago = gs.board.index['chicago']
+    events = []
+    gs.subscribe(events.append)
+    gs.infect_city('chicago', 'blue', 3)
+    gs.outbreak('chicago', 'blue')
+    gs.epidemic('chicago', 'blue')
+    assert [kind for kind, _, _, _ in events] == [game.EPIDEMIC_CITY]
+    assert gs.cubes[chicago * 4 + game.COLOR_INDEX['blue']] == 0
+    assert gs.cures['blue'] == 2 and gs.outbreaks == 0
+    assert gs.cubes_in_storage['blue'] == game.CUBES_PER_COLOR
+    assert gs.snapshot()[0] == snapshot[0]
+    recount(gs)
+    assert gs.hash == gs.rehash()
+
+def test_cured_colors_are_still_placed():
+    gs = eradicated('blue')
+    gs.set_cubes(gs.board.index['atlanta'], game.COLOR_INDEX['blue'], 1)
+    assert gs.cures['blue'] == 1
+    gs.infect_city('chicago', 'blue', 2)
+    assert gs.cubes[gs.board.index['chicago'] * 4 + game.COLOR_INDEX['blue']] == 2
+    recount(gs)
+
+def six_stations():
+    """
+    A game with 6 research stations whose current player holds the card
+    of the city they are in, which has no station
+    """
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=2, fast=True))
+    for name in ('chicago', 'paris', 'cairo', 'tokyo', 'lima'):
+        gs.set_research_station(gs.board.index[name])
+    player = gs.current_player()
+    player.move_to(gs.board.index['miami'])
+    if 'miami' not in player.cards:
+        player.add_card('miami')
+    assert gs.research_stations == 6
+    return gs, player
+
+@pytest.mark.parametrize('move_from', ['essen', 'nowhere', ''])
+def test_building_a_seventh_station_needs_one_to_move(move_from):
+    gs, player = six_stations()
+    snapshot = gs.snapshot()
+    with pytest.raises(ValueError):
+        player.build_research_station(move_from)
+    assert gs.snapshot() == snapshot
+
+def test_building_moves_a_station():
+    gs, player = six_stations()
+    player.build_research_station('paris')
+    assert gs.research_stations == 6
+    assert gs.stations >> gs.board.index['miami'] & 1
+    assert not gs.stations >> gs.board.index['paris'] & 1
+    recount(gs)
@@ -0,0 +1,106 @@
+import pytest
+
+import engine
+import game
+import observation
+
+def field(row, name):
+    offset, shape = observation.FIELDS[name]
+    size = 1
+    for n in shape:
+        size *= n
+    return list(row[offset:offset + size])
+
+@pytest.fixture
+def gs():
+    env = engine.PandemicEnv(3, 5)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(4)
+    for _ in range(12):
+        gs, _, _ = env.step(policy(gs))
+    return gs
+
+def test_fields_fill_the_row():
+    offset = 0
+    for name, (at, shape) in observation.FIELDS.items():
+        assert at == offset
+        size = 1
+        for n in shape:
+            size *= n
+        offset += size
+    assert offset == observation.SIZE
+
+def test_row_length(gs):
+    assert len(observation.encode(gs)) == observation.SIZE
+    encoder = observation.Encoder(3)
+    assert len(encoder.encode_batch([gs, gs])) == 2 * observation.SIZE
+    with pytest.raises(ValueError):
+        encoder.encode_batch([gs] * 4)
+
+def test_cubes_and_stations(gs):
+    paris = gs.board.index['paris']
+    gs.set_cubes(paris, game.COLOR_INDEX['yellow'], 2)
+    gs.set_research_station(paris)
+    row = observation.encode(gs)
+
+    assert field(row, 'cubes') == list(gs.cubes)
+    assert row[observation.CUBES_AT + paris * 4 + game.COLOR_INDEX['yellow']] == 2
+    stations = field(row, 'stations')
+    assert stations == [gs.stations >> city & 1 for city in range(len(gs.board))]
+    assert stations[paris] == stations[gs.board.index['atlanta']] == 1
+
+def test_pawns_and_hands(gs):
+    player = gs.player[2]
+    player.cards = ['tokyo', 'airlift', 'cairo']
+    row = observation.encode(gs)
+
+    pawns = field(row, 'pawns')
+    hands = field(row, 'hands')
+    for p in range(observation.PLAYERS):
+        at = p * observation.CITIES
+        hand = hands[p * observation.HAND_CARDS:(p + 1) * observation.HAND_CARDS]
+        if p + 1 not in gs.player:
+            assert not any(pawns[at:at + observation.CITIES]) and not any(hand)
+            continue
+        assert pawns[at:at + observation.CITIES].index(1) == gs.player[p + 1].loc
+        assert sum(pawns[at:at + observation.CITIES]) == 1
+        held = [gs.board.card_ids[card] for card in gs.player[p + 1].cards]
+        assert [i for i, b in enumerate(hand) if b] == sorted(held)
+
+    hand = hands[observation.HAND_CARDS:2 * observation.HAND_CARDS]
+    assert [i for i, b in enumerate(hand) if b] == sorted(
+        gs.board.card_ids[card] for card in ['tokyo', 'airlift', 'cairo'])
+
+def test_cures_turn_and_counters(gs):
+    gs.set_cure('black', 1)
+    row = observation.encode(gs)
+
+    cures = field(row, 'cures')
+    for c, color in enumerate(game.COLORS):
+        one_hot = [0] * observation.CURE_STATES
+        one_hot[gs.cures[color]] = 1
+        assert cures[c * observation.CURE_STATES:(c + 1) * observation.CURE_STATES] == one_hot
+    turn = field(row, 'turn')
+    assert turn.index(1) == gs.player_turn - 1 and sum(turn) == 1
+    assert field(row, 'counters') == [gs.outbreaks, gs.infection_rate_position,
+                                      gs.infection_rate, gs.current_player().actions_key(),
+                                      len(gs.player_deck), gs.epidemic_cards_left]
+    discard = field(row, 'infection_discard')
+    assert [i for i, b in enumerate(discard) if b] == sorted(
+        gs.board.infection_ids[card] for card in gs.infection_discard_deck)
+
+def test_encoding_is_deterministic(gs):
+    row = observation.encode(gs)
+    assert observation.encode(gs.fork()) == row
+
+    again = engine.PandemicEnv(3, 5)
+    policy = engine.RandomPolicy(seed=0)
+    same = again.reset(4)
+    for _ in range(12):
+        same, _, _ = again.step(policy(same))
+    assert observation.encode(same) == row
+
+    # whatever the rows were before
+    encoder = observation.Encoder(2)
+    encoder.encode_batch([engine.PandemicEnv(2, 4).reset(9)] * 2)
+    assert bytes(encoder.encode_batch([same, gs])) == bytes(row) * 2
@@ -0,0 +1,92 @@
+import random
+
+import game
+
+def recursive_outbreak(board, cubes, start, c):
+    """
+    The chain reaction of an outbreak resolved by recursion, as the rules
+    describe it. Returns the cubes after it and the number of outbreaks.
+    """
+    cubes = list(cubes)
+    outbroken = set()
+
+    def outbreak(city):
+        outbroken.add(city)
+        for n in board.neighbours[city]:
+            if n in outbroken:
+                continue
+            if cubes[n * 4 + c] == game.MAX_CUBES:
+                outbreak(n)
+            else:
+                cubes[n * 4 + c] += 1
+
+    outbreak(start)
+    return cubes, len(outbroken)
+
+def chain_board(rng, board):
+    """
+    A fresh game with a walk of cities on the edge of outbreaking from a
+    random start, and a few cities with fewer cubes around it, all of one
+    color. Returns the game, the start and the color.
+    """
+    gs = game.GameState(quiet=True, seed=rng.randrange(2**32), fast=True)
+    gs.outbreak_limit = 1000
+    c = rng.randrange(len(game.COLORS))
+    start = city = rng.randrange(len(board))
+    gs.set_cubes(start, c, game.MAX_CUBES)
+    for _ in range(rng.randrange(1, 5)):
+        city = rng.choice(board.neighbours[city])
+        gs.set_cubes(city, c, game.MAX_CUBES)
+    for _ in range(rng.randrange(4)):
+        city = rng.choice(board.neighbours[city])
+        if not gs.cubes[city * 4 + c]:
+            gs.set_cubes(city, c, rng.randrange(1, game.MAX_CUBES))
+    # a state that isn't set up has no hash yet, clean_setup works it out last
+    gs.rehash()
+    return gs, start, c
+
+def test_waves_match_recursion():
+    rng = random.Random(2)
+    board = game.load_board()
+    chains = 0
+    for _ in range(500):
+        gs, start, c = chain_board(rng, board)
+        expected, outbreaks = recursive_outbreak(board, gs.cubes, start, c)
+        gs.infect_city(board.names[start], game.COLORS[c])
+        if gs.lost:
+            # ran out of cubes part way, which the recursion doesn't model
+            continue
+        assert list(gs.cubes) == expected
+        assert gs.outbreaks == outbreaks
+        assert gs.hash == gs.rehash()
+        chains += outbreaks > 1
+    assert chains > 100
+
+def test_chain_stops_at_the_outbreak_limit():
+    rng = random.Random(5)
+    board = game.load_board()
+    gs, start, c = chain_board(rng, board)
+    while recursive_outbreak(board, gs.cubes, start, c)[1] < 2:
+        gs, start, c = chain_board(rng, board)
+    gs.outbreak_limit = 1
+    gs.infect_city(board.names[start], game.COLORS[c])
+    assert gs.lost and gs.outbreaks == 1
+
+def test_subscribers_get_every_outbreak_and_infection():
+    rng = random.Random(3)
+    board = game.load_board()
+    for _ in range(50):
+        gs, start, c = chain_board(rng, board)
+        before = list(gs.cubes)
+        events = []
+        gs.subscribe(events.append)
+        gs.infect_city(board.names[start], game.COLORS[c])
+        outbreaks = [city for kind, city, _, _ in events if kind == game.OUTBREAK]
+        assert outbreaks[0] == start and len(outbreaks) == gs.outbreaks
+        added = {}
+        for kind, city, color, cubes in events:
+            if kind == game.INFECTION:
+                assert color == c
+                added[city * 4 + c] = added.get(city * 4 + c, 0) + cubes
+        assert added == {slot: n - before[slot] for slot, n in enumerate(gs.cubes)
+                         if n != before[slot]}
@@ -0,0 +1,128 @@
+import pytest
+
+import actions
+import agents
+import engine
+import game
+import record
+import replay
+
+def play_recorded(writer, policy, seed):
+    """
+    Records a game, returning the snapshot after every move
+    """
+    env = engine.PandemicEnv(2, 4)
+    gs = env.reset(seed)
+    writer.begin(gs)
+    snapshots = [gs.snapshot()]
+    done = False
+    while not done:
+        action = policy(gs)
+        writer.action(action)
+        gs, _, done = env.step(action)
+        snapshots.append(gs.snapshot())
+    writer.end(env.turns)
+    return snapshots
+
+@pytest.mark.parametrize('fast', [True, False])
+def test_round_trip(tmp_path, fast):
+    path = str(tmp_path / 'games.pdr')
+    policies = [engine.RandomPolicy(seed=0), agents.CurePolicy(seed=0)]
+    with record.Writer(path) as writer:
+        played = [play_recorded(writer, policies[i % 2], engine.game_seed(5, i))
+                  for i in range(6)]
+
+    with record.Reader(path) as reader:
+        assert len(reader) == len(played)
+        for rec, snapshots in zip(reader, played):
+            moves = [index for _, index in rec.actions()]
+            assert len(moves) == len(snapshots) - 1
+            replayer = rec.replayer(every=7) if fast else \
+                replay.Replay(rec.seed, moves, rec.players, rec.difficulty, every=7)
+            assert replayer.seek(len(replayer)).snapshot() == snapshots[-1]
+            # forward, back past a snapshot, and forward again
+            for target in (len(moves) // 2, 3, 0, len(moves) - 1, 8):
+                assert replayer.seek(target).snapshot() == snapshots[target]
+
+def test_cures_are_recorded(tmp_path):
+    path = str(tmp_path / 'games.pdr')
+    with record.Writer(path) as writer:
+        for i in range(10):
+            play_recorded(writer, agents.CurePolicy(seed=i), engine.game_seed(1, i))
+    with record.Reader(path) as reader:
+        cures = [index for rec in reader for _, index in rec.actions()
+                 if actions.CURE <= index < actions.GIVE]
+    assert cures
+
+def cure_ready():
+    """
+    A game whose current player is on a research station with 6 blue cards
+    """
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=3, fast=True))
+    player = gs.current_player()
+    assert gs.stations >> player.loc & 1
+    blue = [n for n in actions.bits(gs.board.color_masks[game.COLOR_INDEX['blue']])]
+    for city in blue[:6]:
+        if not player.hand >> city & 1:
+            player.add_card(gs.board.names[city])
+    return gs, [gs.board.names[city] for city in blue[:6]]
+
+def test_canonical_cure_is_numbered():
+    gs, blue = cure_ready()
+    cure = actions.CURE + game.COLOR_INDEX['blue']
+    assert actions.encode(gs, ('discover_cure', 'blue', blue)) == cure
+    assert actions.encode(gs, ('discover_cure', 'blue', blue[:5])) == cure
+
+def test_other_cures_are_not_numbered(tmp_path):
+    gs, blue = cure_ready()
+    with pytest.raises(ValueError):
+        actions.encode(gs, ('discover_cure', 'blue', blue[1:]))
+    with pytest.raises(ValueError):
+        actions.encode(gs, ('discover_cure', 'blue', blue[4::-1]))
+
+    with record.Writer(str(tmp_path / 'games.pdr')) as writer:
+        writer.begin(gs)
+        with pytest.raises(ValueError):
+            writer.action(('discover_cure', 'blue', blue[1:]))
+
+def test_fixed_roles_replay(tmp_path):
+    path = str(tmp_path / 'games.pdr')
+    roles = ('scientist', 'medic')
+    env = engine.PandemicEnv(2, 4, roles=roles)
+    finals = []
+    with record.Writer(path) as writer:
+        for i in range(4):
+            gs = env.reset(engine.game_seed(2, i))
+            writer.begin(gs)
+            done = False
+            policy = engine.RandomPolicy(seed=i)
+            while not done:
+                action = policy(gs)
+                writer.action(action)
+                gs, _, done = env.step(action)
+            writer.end(env.turns)
+            finals.append(gs.snapshot())
+        results = list(record.record_batch(writer, 2, engine.RandomPolicy(seed=0), seed=3,
+                                           roles=roles))
+    assert all(result.roles == roles for result in results)
+
+    with record.Reader(path) as reader:
+        assert len(reader) == 6
+        for rec in reader:
+            assert tuple(rec.roles) == roles
+        for rec, final in zip(reader, finals):
+            assert rec.replay().snapshot() == final
+
+def test_moving_a_station_is_not_numbered(tmp_path):
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=2, fast=True))
+    assert actions.encode(gs, ('build_research_station', 'paris')) == actions.BUILD
+    for name in ('chicago', 'paris', 'cairo', 'tokyo', 'lima'):
+        gs.set_research_station(gs.board.index[name])
+    assert actions.encode(gs, ('build_research_station',)) == actions.BUILD
+    with pytest.raises(ValueError):
+        actions.encode(gs, ('build_research_station', 'paris'))
+
+    with record.Writer(str(tmp_path / 'games.pdr')) as writer:
+        writer.begin(gs)
+        with pytest.raises(ValueError):
+            writer.action(('build_research_station', 'paris'))
@@ -0,0 +1,51 @@
+import pytest
+
+import actions
+import agents
+import engine
+import game
+import replay
+
+def play_high_cures(seed):
+    """
+    Plays a game with CurePolicy, except that a cure discards the highest
+    numbered cards of its color when there are more than it needs. Returns
+    the moves as tuples, the snapshot after every move, and whether any cure
+    was made with those cards.
+    """
+    env = engine.PandemicEnv(2, 4)
+    gs = env.reset(seed)
+    policy = agents.CurePolicy(seed=seed)
+    moves = []
+    snapshots = [gs.snapshot()]
+    high = False
+    done = False
+    while not done:
+        action = actions.decode(gs, policy(gs))
+        if action[0] == 'discover_cure':
+            c = game.COLOR_INDEX[action[1]]
+            cards = gs.current_player().hand & gs.board.color_masks[c]
+            if bin(cards).count('1') > actions.CURE_CARDS:
+                action = ('discover_cure', action[1],
+                          [gs.board.names[i] for i in actions.bits(cards)][::-1])
+                high = True
+        moves.append(action)
+        gs, _, done = env.step(action)
+        snapshots.append(gs.snapshot())
+    return moves, snapshots, high
+
+@pytest.fixture(scope='module')
+def high_cure_game():
+    for seed in range(500):
+        moves, snapshots, high = play_high_cures(seed)
+        if high:
+            return seed, moves, snapshots
+    pytest.fail('No game cured with more cards than it needed')
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_tuple_cure_with_other_cards(high_cure_game, fast):
+    seed, moves, snapshots = high_cure_game
+    replayer = replay.Replay(seed, moves, every=10, fast=fast)
+    assert replayer.seek(len(moves)).snapshot() == snapshots[-1]
+    for target in (len(moves) // 2, 0, len(moves) - 3, len(moves)):
+        assert replayer.seek(target).snapshot() == snapshots[target]
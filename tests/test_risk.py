@@ -0,0 +1,77 @@
+import itertools
+import random
+
+import pytest
+
+import actions
+import game
+import risk
+
+def orders(piles):
+    """
+    Every order of a deck whose piles are shuffled on their own, first pile
+    on top
+    """
+    for parts in itertools.product(*(itertools.permutations(pile) for pile in piles)):
+        yield [card for part in parts for card in part]
+
+def random_piles(rng, cards):
+    piles = []
+    while cards:
+        size = rng.randrange(1, min(len(cards), 4) + 1)
+        piles.append(cards[:size])
+        cards = cards[size:]
+    return piles
+
+@pytest.mark.parametrize('seed', range(20))
+def test_epidemic_odds_match_enumeration(seed):
+    rng = random.Random(seed)
+    piles = []
+    for _ in range(rng.randrange(1, 4)):
+        size = rng.randrange(1, 4)
+        pile = ['card {0} {1}'.format(len(piles), i) for i in range(size)]
+        for i in rng.sample(range(size), rng.randrange(min(size, 2) + 1)):
+            pile[i] = game.EPIDEMIC
+        piles.append(pile)
+    draws = rng.randrange(1, 4)
+
+    counts = [0] * (draws + 1)
+    total = 0
+    for order in orders(piles):
+        counts[order[:draws].count(game.EPIDEMIC)] += 1
+        total += 1
+    odds = risk.epidemic_odds(game.Deck.from_segments(piles), draws)
+    assert odds == pytest.approx([count / total for count in counts])
+
+@pytest.mark.parametrize('seed', range(20))
+def test_draw_odds_match_enumeration(seed):
+    rng = random.Random(seed)
+    piles = random_piles(rng, ['city {0}'.format(i) for i in range(rng.randrange(1, 8))])
+    draws = rng.randrange(0, 9)
+
+    drawn = dict.fromkeys([card for pile in piles for card in pile], 0)
+    total = 0
+    for order in orders(piles):
+        for card in order[:draws]:
+            drawn[card] += 1
+        total += 1
+    odds = risk.draw_odds(piles, draws)
+    assert {card: odds.get(card, 0.0) for card in drawn} == \
+        pytest.approx({card: count / total for card, count in drawn.items()})
+
+def test_eradicated_colors_have_no_risk():
+    gs = game.clean_setup(2, 4, game.GameState(quiet=True, seed=4, fast=True))
+    blue = game.COLOR_INDEX['blue']
+    cities = [city for city in range(len(gs.board)) if gs.board.colors[city] == blue]
+    before = risk.InfectionRisk(gs)
+    assert sum(before.infection(city) for city in cities) > 0
+
+    for city in actions.bits(gs.infected[blue]):
+        gs.set_cubes(city, blue, 0)
+    gs.set_cure('blue', 1)
+    assert gs.cures['blue'] == 2
+    odds = risk.InfectionRisk(gs)
+    infections = odds.infections()
+    outbreaks = odds.outbreaks()
+    assert all(infections[city] == 0 and outbreaks[city] == 0 for city in cities)
+    assert sum(infections) > 0
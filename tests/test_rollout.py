@@ -0,0 +1,61 @@
+import statistics
+
+import pytest
+
+import engine
+import rollout
+
+Z95 = statistics.NormalDist().inv_cdf(0.975)
+
+@pytest.mark.parametrize('wins,n,low,high', [(5, 10, 0.236593, 0.763407),
+                                             (0, 10, 0.0, 0.277533),
+                                             (10, 10, 0.722467, 1.0),
+                                             (1, 100, 0.001767, 0.054486)])
+def test_wilson_interval(wins, n, low, high):
+    assert rollout.interval(wins, n, Z95) == pytest.approx((low, high), abs=1e-6)
+
+def test_wilson_interval_without_rollouts():
+    assert rollout.interval(0, 0, Z95) == (0.0, 1.0)
+
+@pytest.mark.parametrize('n', [1, 7, 20, 1000])
+def test_wilson_interval_ends_at_no_wins_and_all_wins(n):
+    assert rollout.interval(0, n, Z95)[0] == 0.0
+    assert rollout.interval(n, n, Z95)[1] == 1.0
+    high = rollout.interval(0, n, Z95)[1]
+    assert 0.0 < high == pytest.approx(1 - rollout.interval(n, n, Z95)[0])
+
+def test_wilson_interval_narrows():
+    wide = rollout.interval(30, 100, Z95)
+    narrow = rollout.interval(300, 1000, Z95)
+    assert wide[0] < narrow[0] < 0.3 < narrow[1] < wide[1]
+    assert rollout.interval(30, 100, 2.575829)[1] > wide[1]
+
+@pytest.fixture
+def gs():
+    env = engine.PandemicEnv(2, 4)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(5)
+    for _ in range(8):
+        gs, _, _ = env.step(policy(gs))
+    return gs
+
+def test_rollouts_are_seeded(gs):
+    before = gs.hash
+    first = rollout.evaluate(gs, accuracy=0.0, batch=8, max_rollouts=20, seed=3)
+    again = rollout.evaluate(gs, accuracy=0.0, batch=8, max_rollouts=20, seed=3)
+    assert first == again
+    assert first.rollouts == 20
+    assert first.win_rate == first.wins / 20
+    assert (first.low, first.high) == rollout.interval(first.wins, 20, Z95)
+    assert gs.hash == before == gs.rehash()
+
+    assert rollout.rollout(gs, engine.RandomPolicy(seed=1), seed=7) \
+        == rollout.rollout(gs, engine.RandomPolicy(seed=1), seed=7)
+
+def test_evaluate_stops_once_accurate_enough(gs):
+    estimate = rollout.evaluate(gs, accuracy=0.5, batch=4, max_rollouts=100, seed=0)
+    assert estimate.rollouts == 4
+
+def test_confidence_must_be_a_probability(gs):
+    with pytest.raises(ValueError):
+        rollout.evaluate(gs, confidence=1.0)
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+
+import agents
+import game
+import routing
+
+UNREACHABLE = 255
+
+@pytest.fixture
+def board():
+    """
+    The cities a to f in a line, and g on its own
+    """
+    connections = ['b', 'ac', 'bd', 'ce', 'df', 'e', '']
+    return game.Board(game.CityInfo(name, 'blue', 1, tuple(links))
+                      for name, links in zip('abcdefg', connections))
+
+def test_drive_distances(board):
+    rows = routing.drive_distances(board)
+    assert rows[0] == bytes([0, 1, 2, 3, 4, 5, UNREACHABLE])
+    assert rows[3] == bytes([3, 2, 1, 0, 1, 2, UNREACHABLE])
+    assert rows[6] == bytes([UNREACHABLE] * 6 + [0])
+    assert routing.drive_distances(board) is rows
+
+def test_drive_distances_of_the_board():
+    board = game.load_board()
+    rows = routing.drive_distances(board)
+    for city in range(len(board)):
+        assert rows[city][city] == 0
+        for other in range(len(board)):
+            assert rows[city][other] == rows[other][city] != UNREACHABLE
+            assert (rows[city][other] == 1) == bool(board.adjacency[city] >> other & 1)
+
+def test_hops_follow_a_shortest_way(board):
+    distances = routing.drive_distances(board)
+    table = agents.hops(board)
+    for start in range(len(board)):
+        for target in range(len(board)):
+            city, drives = start, 0
+            while city != target and distances[city][target] != UNREACHABLE:
+                assert table[city][target] in board.neighbours[city]
+                city = table[city][target]
+                drives += 1
+            if distances[start][target] == UNREACHABLE:
+                assert table[start][target] == start
+            else:
+                assert drives == distances[start][target]
+
+def router(board, *stations):
+    return routing.Router(SimpleNamespace(board=board, stations=board.mask(stations)))
+
+def test_router_shuttles_between_stations(board):
+    index = board.index
+    routes = router(board, 'a')
+    assert routes.distance(index['a'], index['f']) == 5
+    assert routes.distance(index['c'], index['c']) == 0
+
+    routes.gs.stations = board.mask('af')
+    assert routes.distance(index['a'], index['f']) == 1
+    assert routes.distance(index['b'], index['e']) == 3
+    assert routes.distance(index['b'], index['f']) == 2
+    assert routes.distance(index['a'], index['g']) == UNREACHABLE
+
+    # taking a station away finds the nearest stations again
+    routes.gs.stations = board.mask('a')
+    assert routes.distance(index['b'], index['f']) == 4
+
+def test_router_flies_with_cards(board):
+    index = board.index
+    routes = router(board, 'a')
+    a, e, g = index['a'], index['e'], index['g']
+    assert routes.actions(a, e) == 4
+    assert routes.actions(a, e, board.mask('c')) == 3 # direct flight to c
+    assert routes.actions(a, e, board.mask('e')) == 1
+    assert routes.actions(a, g, board.mask('a')) == 1 # charter flight from a
+    assert routes.actions(a, g) == UNREACHABLE
+    assert routes.actions(a, a, board.mask('a')) == 0
+
+    player = SimpleNamespace(loc=a, hand=board.mask('c'), board=board)
+    assert routes.actions_to(player, 'e') == 3
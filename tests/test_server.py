@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import server
+
+def test_bad_new_keeps_the_running_game():
+    session = server.Session(1)
+    session.execute('new', ['2', '4', '7'])
+    location = session.execute('whereami', [])['location']
+
+    answer, stop = session.handle(b'new 2 4 abc\n')
+    assert answer.startswith(b'error') and not stop
+    assert session.execute('whereami', [])['location'] == location
+    assert session.handle(b'legal\n')[0].startswith(b'ok')
+
+def test_bad_new_before_any_game():
+    session = server.Session(1)
+    assert session.handle(b'new 2 4 abc\n')[0].startswith(b'error')
+    assert session.handle(b'whereami\n')[0].startswith(b'error')
+
+async def talk(lines):
+    listener = await server.Server(idle=5).start('127.0.0.1', 0)
+    host, port = listener.sockets[0].getsockname()[:2]
+    async with listener:
+        reader, writer = await asyncio.open_connection(host, port)
+        answers = []
+        for line in lines:
+            writer.write(line)
+            await writer.drain()
+            answers.append(await reader.readline())
+        writer.close()
+        await writer.wait_closed()
+    return answers
+
+def test_connection_survives_a_bad_new():
+    answers = asyncio.run(talk([b'new 2 4 3\n', b'new 2 4 abc\n', b'whereami\n',
+                                b'{"cmd": "legal"}\n']))
+    assert answers[0].startswith(b'ok')
+    assert answers[1].startswith(b'error')
+    assert answers[2].startswith(b'ok')
+    assert json.loads(answers[3])['ok']
+
+def test_unexpected_errors_are_answered(monkeypatch):
+    def broken(self, name, args):
+        raise RuntimeError('bug')
+    monkeypatch.setattr(server.Session, 'execute', broken)
+    answers = asyncio.run(talk([b'whereami\n', b'{"cmd": "whereami"}\n']))
+    assert answers[0].startswith(b'error')
+    assert json.loads(answers[1])['ok'] is False
@@ -0,0 +1,13 @@
+import profiling
+import sweep
+
+def test_profiled_sweep_matches_an_unprofiled_one():
+    cells = sweep.make_cells([2], [4])
+    plain = sweep.Sweep(cells, seed=1, min_games=40, max_games=40, shard_size=20)
+    plain.run(workers=1)
+    profiled = sweep.Sweep(cells, seed=1, min_games=40, max_games=40, shard_size=20)
+    with profiling.Profiler() as profiler:
+        profiled.run(workers=2, profiler=profiler)
+
+    assert profiled.state()['cells'] == plain.state()['cells']
+    assert profiler.calls['setup'] == 40
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+import actions
+import engine
+
+@pytest.mark.parametrize('players,difficulty', [(2, 4), (3, 5), (4, 6)])
+def test_incremental_hash_matches_rehash(players, difficulty):
+    rng = random.Random(players)
+    env = engine.PandemicEnv(players, difficulty)
+    for seed in range(15):
+        gs = env.reset(seed)
+        assert gs.hash == gs.rehash()
+        done = False
+        while not done:
+            gs, _, done = env.step(rng.choice(list(actions.bits(actions.action_mask(gs)))))
+            assert gs.hash == gs.rehash()
+
+def test_fork_and_restore_keep_the_hash():
+    env = engine.PandemicEnv(2, 4)
+    policy = engine.RandomPolicy(seed=0)
+    gs = env.reset(1)
+    for _ in range(30):
+        gs, _, _ = env.step(policy(gs))
+    snapshot = gs.snapshot()
+    fork = gs.fork()
+    assert fork.hash == fork.rehash() == gs.hash
+
+    h = gs.hash
+    for _ in range(10):
+        gs, _, done = env.step(policy(gs))
+        if done:
+            break
+    gs.restore(snapshot)
+    assert gs.hash == gs.rehash() == h
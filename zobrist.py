@@ -0,0 +1,121 @@
+"""
+Zobrist keys for hashing games, and a transposition table for search
+
+Everything that changes during a game has a random 64 bit key for each
+value it can take, and the hash of a game is the XOR of the keys of its
+current values. GameState keeps `hash` up to date as it changes by XORing
+out the key of the old value and XORing in the key of the new one, see
+GameState.rehash for what goes into it.
+
+Decks are hashed by card and position counted from the bottom, so drawing
+from the top only changes the key of the card drawn.
+"""
+
+import random
+import sys
+from array import array
+from collections import OrderedDict
+
+CITIES = 48
+COLORS = 4
+PLAYERS = 4
+ACTIONS = 4
+CARDS = 64 # city, event and epidemic cards, see Board.card_ids
+DECK = 64 # positions in a deck
+OUTBREAKS = 64
+RATES = 8
+
+_random = random.Random(0x70A5)
+
+def _keys(*shape):
+    """
+    Returns nested lists of random 64 bit keys
+    """
+    # made in one go from random bytes, as this runs in every process
+    count = 1
+    for n in shape:
+        count *= n
+    keys = array('Q', _random.randbytes(8 * count))
+    if sys.byteorder == 'big':
+        keys.byteswap()
+    keys = keys.tolist()
+    for n in reversed(shape[1:]):
+        keys = [keys[i:i + n] for i in range(0, len(keys), n)]
+    return keys
+
+CUBE_KEYS = _keys(CITIES * COLORS, 4) # by cube slot, see GameState.cubes
+STATION_KEYS = _keys(CITIES)
+CURE_KEYS = _keys(COLORS, 3)
+OUTBREAK_KEYS = _keys(OUTBREAKS)
+RATE_KEYS = _keys(RATES) # by infection rate position
+# players are numbered from 1
+TURN_KEYS = _keys(PLAYERS + 1)
+ACTION_KEYS = _keys(PLAYERS + 1, ACTIONS + 1)
+PAWN_KEYS = _keys(PLAYERS + 1, CITIES)
+HAND_KEYS = _keys(PLAYERS + 1, CARDS)
+PLAYER_DECK_KEYS = _keys(CARDS, DECK)
+PLAYER_DISCARD_KEYS = _keys(CARDS)
+INFECTION_DECK_KEYS = _keys(CITIES, DECK)
+INFECTION_DISCARD_KEYS = _keys(CITIES)
+
+class TranspositionTable:
+
+    """
+    A bounded table of search results by game hash
+
+    With 'lru' eviction the least recently used entry makes room for a new
+    one. With 'depth' eviction every hash has one slot (hash % capacity),
+    and an entry is only replaced by one searched at least as deep.
+    """
+
+    def __init__(self, capacity=1 << 20, eviction='lru'):
+        if eviction not in ('lru', 'depth'):
+            raise ValueError("Eviction must be either 'lru' or 'depth'")
+        self.capacity = capacity
+        self.eviction = eviction
+        self.entries = OrderedDict() if eviction == 'lru' else {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, depth=0):
+        """
+        Returns the value stored for a hash searched at least depth deep,
+        or None
+        """
+        if self.eviction == 'lru':
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        else:
+            entry = self.entries.get(key % self.capacity)
+            if entry is not None and entry[0] != key:
+                entry = None
+
+        if entry is None or entry[1] < depth:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[2]
+
+    def store(self, key, value, depth=0):
+        """
+        Stores the value of a hash searched depth deep
+        """
+        if self.eviction == 'lru':
+            self.entries[key] = (key, depth, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        else:
+            slot = key % self.capacity
+            entry = self.entries.get(slot)
+            if entry is None or entry[0] == key or entry[1] <= depth:
+                self.entries[slot] = (key, depth, value)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0